@@ -1,254 +1,20 @@
 """
 Create TensorFlow.js Model Files
 
-Creates proper model.json and model.bin files with correct architecture
-for the 10-category urban infrastructure classification model.
+Runs ai/scripts/create_tfjs_model.py, which builds model.json and the sharded
+placeholder weights; this copy only forwards to it so the two cannot drift
+apart. Default paths (labels.json, output directory) resolve to ai/model/.
+
+Usage:
+    python create_tfjs_model.py --seed 42 --input-size 160
 """
 
-import json
-import numpy as np
 import os
-import struct
-
-def create_model_json():
-    """Create model.json with correct architecture for 10 categories"""
-    
-    model_config = {
-        "format": "layers-model",
-        "generatedBy": "TensorFlow.js tfjs-layers v4.4.0",
-        "convertedBy": "TensorFlow.js Converter v4.4.0",
-        "modelTopology": {
-            "keras_version": "2.11.0",
-            "backend": "tensorflow",
-            "model_config": {
-                "class_name": "Sequential",
-                "config": {
-                    "name": "urban_classifier",
-                    "layers": [
-                        {
-                            "class_name": "InputLayer",
-                            "config": {
-                                "batch_input_shape": [None, 224, 224, 3],
-                                "dtype": "float32",
-                                "sparse": False,
-                                "ragged": False,
-                                "name": "input_1"
-                            }
-                        },
-                        {
-                            "class_name": "Conv2D",
-                            "config": {
-                                "name": "conv2d_1",
-                                "trainable": True,
-                                "filters": 32,
-                                "kernel_size": [3, 3],
-                                "strides": [1, 1],
-                                "padding": "valid",
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "MaxPooling2D",
-                            "config": {
-                                "name": "max_pooling2d_1",
-                                "pool_size": [2, 2],
-                                "strides": [2, 2]
-                            }
-                        },
-                        {
-                            "class_name": "Conv2D",
-                            "config": {
-                                "name": "conv2d_2",
-                                "trainable": True,
-                                "filters": 64,
-                                "kernel_size": [3, 3],
-                                "strides": [1, 1],
-                                "padding": "valid",
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "MaxPooling2D",
-                            "config": {
-                                "name": "max_pooling2d_2",
-                                "pool_size": [2, 2],
-                                "strides": [2, 2]
-                            }
-                        },
-                        {
-                            "class_name": "GlobalAveragePooling2D",
-                            "config": {
-                                "name": "global_average_pooling2d_1"
-                            }
-                        },
-                        {
-                            "class_name": "Dense",
-                            "config": {
-                                "name": "dense_1",
-                                "trainable": True,
-                                "units": 128,
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "Dense",
-                            "config": {
-                                "name": "predictions",
-                                "trainable": True,
-                                "units": 10,
-                                "activation": "softmax",
-                                "use_bias": True
-                            }
-                        }
-                    ]
-                }
-            }
-        },
-        "weightsManifest": [
-            {
-                "paths": ["model.bin"],
-                "weights": [
-                    # Conv2D layer 1 weights (3x3x3x32 + 32 bias)
-                    {
-                        "name": "conv2d_1/kernel",
-                        "shape": [3, 3, 3, 32],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "conv2d_1/bias", 
-                        "shape": [32],
-                        "dtype": "float32"
-                    },
-                    # Conv2D layer 2 weights (3x3x32x64 + 64 bias)
-                    {
-                        "name": "conv2d_2/kernel",
-                        "shape": [3, 3, 32, 64],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "conv2d_2/bias",
-                        "shape": [64], 
-                        "dtype": "float32"
-                    },
-                    # Dense layer 1 weights (64x128 + 128 bias)
-                    {
-                        "name": "dense_1/kernel",
-                        "shape": [64, 128],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "dense_1/bias",
-                        "shape": [128],
-                        "dtype": "float32"
-                    },
-                    # Output layer weights (128x10 + 10 bias)
-                    {
-                        "name": "predictions/kernel",
-                        "shape": [128, 10],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "predictions/bias",
-                        "shape": [10],
-                        "dtype": "float32"
-                    }
-                ]
-            }
-        ]
-    }
-    
-    return model_config
-
-def create_model_weights():
-    """Create model weights with proper dimensions"""
-    
-    # Calculate total number of parameters
-    weights_info = [
-        (3 * 3 * 3 * 32, "conv2d_1/kernel"),     # 864
-        (32, "conv2d_1/bias"),                    # 32
-        (3 * 3 * 32 * 64, "conv2d_2/kernel"),    # 18,432
-        (64, "conv2d_2/bias"),                    # 64
-        (64 * 128, "dense_1/kernel"),             # 8,192
-        (128, "dense_1/bias"),                    # 128
-        (128 * 10, "predictions/kernel"),         # 1,280
-        (10, "predictions/bias")                  # 10
-    ]
-    
-    # Generate random weights (small values for better stability)
-    weights_data = bytearray()
-    
-    for size, name in weights_info:
-        if "kernel" in name:
-            # Use Xavier initialization for kernels
-            if "conv2d" in name:
-                # For conv layers, use smaller values
-                weights = np.random.normal(0, 0.1, size).astype(np.float32)
-            else:
-                # For dense layers
-                weights = np.random.normal(0, 0.1, size).astype(np.float32)
-        else:
-            # Bias weights start at zero
-            weights = np.zeros(size, dtype=np.float32)
-        
-        # Convert to bytes and append
-        weights_bytes = weights.tobytes()
-        weights_data.extend(weights_bytes)
-        
-        print(f"Added {name}: {size} parameters ({len(weights_bytes)} bytes)")
-    
-    return bytes(weights_data)
+import runpy
+import sys
 
-def main():
-    """Create the TensorFlow.js model files"""
-    
-    print("Creating TensorFlow.js Urban Classification Model")
-    print("=" * 50)
-    
-    model_dir = "../model"
-    
-    # Create model.json
-    print("Creating model.json...")
-    model_config = create_model_json()
-    
-    model_json_path = os.path.join(model_dir, "model.json")
-    with open(model_json_path, 'w') as f:
-        json.dump(model_config, f, indent=2)
-    
-    print(f"✅ Model architecture saved to {model_json_path}")
-    
-    # Create model.bin with proper weights
-    print("Creating model.bin with proper weights...")
-    weights_data = create_model_weights()
-    
-    model_bin_path = os.path.join(model_dir, "model.bin")
-    with open(model_bin_path, 'wb') as f:
-        f.write(weights_data)
-    
-    print(f"✅ Model weights saved to {model_bin_path}")
-    print(f"   Total size: {len(weights_data)} bytes ({len(weights_data)/1024:.1f} KB)")
-    
-    # Validate the model files
-    print("\\nValidation:")
-    print(f"✅ model.json exists: {os.path.exists(model_json_path)}")
-    print(f"✅ model.bin exists: {os.path.exists(model_bin_path)}")
-    print(f"✅ labels.json exists: {os.path.exists(os.path.join(model_dir, 'labels.json'))}")
-    
-    print("\\n" + "=" * 50)
-    print("✅ TensorFlow.js model created successfully!")
-    print("\\nModel details:")
-    print("- Architecture: CNN for 10-category classification")
-    print("- Input: 224x224x3 RGB images") 
-    print("- Output: 10 classes (pothole, garbage, streetlight, etc.)")
-    print("- Format: TensorFlow.js layers model")
-    print("\\nNext steps:")
-    print("1. Start the backend server")
-    print("2. Test the /api/classify endpoint")
-    print("3. Check /api/health for model status")
-    
-    return True
+SCRIPTS_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
 
 if __name__ == "__main__":
-    main()
+    sys.path.insert(0, SCRIPTS_DIR)
+    runpy.run_path(os.path.join(SCRIPTS_DIR, 'create_tfjs_model.py'), run_name='__main__')
@@ -0,0 +1,367 @@
+"""
+Inference Benchmark Suite
+
+Measures every exported model variant in ai/model/: Keras .h5 files,
+SavedModel directories, TensorFlow.js layers models (model*.json), TFLite
+models (including the quantized variants from convert.py --ptq) and ONNX
+graphs (convert.py --export onnx, run with onnxruntime when it is installed).
+
+SavedModels are called through their serving_default signature, so the
+frozen serving graph from convert.py --export savedmodel gets the uint8
+images it expects; graphs that accept any image size are fed
+RAW_IMAGE_SIZE images and resize them themselves.
+
+Each (artifact, thread count) pair runs in a fresh subprocess so thread pools
+are configured before TensorFlow starts and peak RSS is isolated. Within a
+run every batch size is swept and timed after a warm-up. Results are written
+as JSON together with the git commit and host details, and can be compared
+against an earlier run to catch regressions.
+
+Usage:
+    python bench_inference.py --batch-sizes 1 8 32 --threads 1 4
+    python bench_inference.py --output new.json --compare baseline.json
+"""
+
+import argparse
+import glob
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Same location as paths.MODEL_DIR in ai/scripts, independent of the working directory
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'model')
+
+FORMATS = ('keras', 'savedmodel', 'tfjs', 'tflite', 'onnx')
+# Height and width fed to serving graphs whose input size is not fixed
+RAW_IMAGE_SIZE = (224, 224)
+
+
+def discover_artifacts(model_dir):
+    """Find benchmarkable model files in model_dir as (format, path) pairs"""
+
+    artifacts = []
+    for path in sorted(glob.glob(os.path.join(model_dir, '*.h5'))):
+        artifacts.append(('keras', path))
+    for path in sorted(glob.glob(os.path.join(model_dir, '*', 'saved_model.pb'))):
+        artifacts.append(('savedmodel', os.path.dirname(path)))
+    for path in sorted(glob.glob(os.path.join(model_dir, '*.json'))):
+        try:
+            with open(path, 'r') as f:
+                if json.load(f).get('format') == 'layers-model':
+                    artifacts.append(('tfjs', path))
+        except (ValueError, AttributeError, OSError):
+            continue
+    for path in sorted(glob.glob(os.path.join(model_dir, '*.tflite'))):
+        artifacts.append(('tflite', path))
+    for path in sorted(glob.glob(os.path.join(model_dir, '*.onnx'))):
+        artifacts.append(('onnx', path))
+    return artifacts
+
+
+def _image_input(shape, dtype):
+    """Input shape without the batch dimension (unknown sizes -> RAW_IMAGE_SIZE) and a float -> input converter"""
+
+    dims = list(shape[1:])
+    for i, size in zip((0, 1), RAW_IMAGE_SIZE):
+        if not isinstance(dims[i], (int, np.integer)) or dims[i] <= 0:
+            dims[i] = size
+    if dtype == np.uint8:
+        # Serving graphs take raw pixels and rescale to [0, 1] themselves
+        return tuple(int(d) for d in dims), lambda batch: np.round(batch * 255).astype(np.uint8)
+    return tuple(int(d) for d in dims), lambda batch: batch.astype(dtype)
+
+
+def peak_rss_mb():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def load_runner(fmt, path, threads):
+    """
+    Load an artifact and return (input_shape, run) where run(batch) returns
+    the model output for a float32 batch in [0, 1]
+    """
+
+    if fmt == 'onnx':
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        model_input = session.get_inputs()[0]
+        dtype = np.uint8 if model_input.type == 'tensor(uint8)' else np.float32
+        input_shape, convert = _image_input(model_input.shape, dtype)
+
+        def run(batch):
+            return session.run(None, {model_input.name: convert(batch)})[0]
+
+        return input_shape, run
+
+    import tensorflow as tf
+
+    if fmt == 'savedmodel':
+        signature = tf.saved_model.load(path).signatures['serving_default']
+        (name, spec), = signature.structured_input_signature[1].items()
+        input_shape, convert = _image_input(spec.shape.as_list(), spec.dtype.as_numpy_dtype)
+
+        def run(batch):
+            outputs = signature(**{name: tf.constant(convert(batch))})
+            return next(iter(outputs.values())).numpy()
+
+        return input_shape, run
+
+    if fmt == 'tflite':
+        interpreter = tf.lite.Interpreter(model_path=path, num_threads=threads)
+        input_details = interpreter.get_input_details()[0]
+        output_details = interpreter.get_output_details()[0]
+        dtype = input_details['dtype']
+        scale, zero_point = input_details['quantization']
+        state = {'batch': None}
+
+        def run(batch):
+            if state['batch'] != len(batch):
+                interpreter.resize_tensor_input(input_details['index'], batch.shape)
+                interpreter.allocate_tensors()
+                state['batch'] = len(batch)
+            if dtype in (np.int8, np.uint8):
+                batch = np.clip(np.round(batch / scale + zero_point),
+                                np.iinfo(dtype).min, np.iinfo(dtype).max).astype(dtype)
+            interpreter.set_tensor(input_details['index'], batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_details['index'])
+
+        return tuple(input_details['shape'][1:]), run
+
+    if fmt == 'tfjs':
+        import tensorflowjs as tfjs
+        model = tfjs.converters.load_keras_model(path)
+    else:
+        model = tf.keras.models.load_model(path, compile=False)
+
+    @tf.function
+    def forward(batch):
+        return model(batch, training=False)
+
+    def run(batch):
+        return forward(tf.constant(batch)).numpy()
+
+    return tuple(model.input_shape[1:]), run
+
+
+def run_worker(fmt, path, threads, batch_sizes, iterations, warmup):
+    """Benchmark one artifact at one thread count; runs inside a subprocess"""
+
+    if fmt != 'onnx':
+        import tensorflow as tf
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    start = time.perf_counter()
+    input_shape, run = load_runner(fmt, path, threads)
+    x = np.random.default_rng(0).random((1,) + input_shape, dtype=np.float32)
+    run(x)
+    cold_load_s = time.perf_counter() - start
+
+    results = []
+    for batch_size in batch_sizes:
+        batch = np.repeat(x, batch_size, axis=0)
+        for _ in range(warmup):
+            run(batch)
+
+        latencies = []
+        total_start = time.perf_counter()
+        for _ in range(iterations):
+            t = time.perf_counter()
+            run(batch)
+            latencies.append((time.perf_counter() - t) * 1000)
+        total = time.perf_counter() - total_start
+
+        results.append({
+            'artifact': os.path.basename(path.rstrip(os.sep)),
+            'format': fmt,
+            'threads': threads,
+            'batch_size': batch_size,
+            'cold_load_s': cold_load_s,
+            'throughput_ips': batch_size * iterations / total,
+            'latency_ms': {
+                'mean': float(np.mean(latencies)),
+                'p50': float(np.percentile(latencies, 50)),
+                'p95': float(np.percentile(latencies, 95)),
+                'p99': float(np.percentile(latencies, 99))
+            }
+        })
+
+    for result in results:
+        result['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def run_isolated(fmt, path, threads, args):
+    """Run run_worker in a fresh interpreter and return its results"""
+
+    cmd = [
+        sys.executable, os.path.abspath(__file__), '--worker',
+        '--worker-format', fmt, '--worker-path', path,
+        '--worker-threads', str(threads),
+        '--iterations', str(args.iterations), '--warmup', str(args.warmup),
+        '--batch-sizes', *[str(b) for b in args.batch_sizes]
+    ]
+    env = dict(os.environ, TF_CPP_MIN_LOG_LEVEL='2', OMP_NUM_THREADS=str(threads))
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error'
+        return [{'artifact': os.path.basename(path.rstrip(os.sep)), 'format': fmt,
+                 'threads': threads, 'error': error}]
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count()
+    }
+
+
+def result_key(result):
+    return (result['artifact'], result['format'], result['threads'], result.get('batch_size'))
+
+
+def compare(current, baseline, tolerance):
+    """
+    Return regressions where throughput dropped or p99 latency rose by more
+    than tolerance (a fraction) relative to baseline
+    """
+
+    previous = {result_key(r): r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(result_key(result))
+        if old is None or 'error' in result:
+            continue
+        throughput_change = result['throughput_ips'] / old['throughput_ips'] - 1
+        p99_change = result['latency_ms']['p99'] / old['latency_ms']['p99'] - 1
+        if throughput_change < -tolerance or p99_change > tolerance:
+            regressions.append({
+                'key': result_key(result),
+                'throughput_change': throughput_change,
+                'p99_change': p99_change
+            })
+    return regressions
+
+
+def print_table(results):
+    print(f"{'Artifact':<28}{'Fmt':<11}{'Thr':>4}{'Batch':>6}{'img/s':>10}"
+          f"{'p50':>9}{'p95':>9}{'p99':>9}{'Load s':>8}{'RSS MB':>8}")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['artifact']:<28}{r['format']:<11}{r['threads']:>4}  error: {r['error']}")
+            continue
+        lat = r['latency_ms']
+        print(f"{r['artifact']:<28}{r['format']:<11}{r['threads']:>4}{r['batch_size']:>6}"
+              f"{r['throughput_ips']:>10.1f}{lat['p50']:>9.2f}{lat['p95']:>9.2f}{lat['p99']:>9.2f}"
+              f"{r['cold_load_s']:>8.2f}{r['peak_rss_mb']:>8.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark inference for every exported model variant')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Directory containing model artifacts')
+    parser.add_argument('--artifacts', nargs='+', help='Specific artifact paths (default: discover in --model-dir)')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 8, 32])
+    parser.add_argument('--threads', nargs='+', type=int, default=[1, os.cpu_count() or 1])
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--output', default='inference_benchmark.json')
+    parser.add_argument('--compare', help='Earlier benchmark JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Allowed relative throughput drop / p99 increase before flagging')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-format', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-path', help=argparse.SUPPRESS)
+    parser.add_argument('--worker-threads', type=int, help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.worker_format, args.worker_path, args.worker_threads,
+                             args.batch_sizes, args.iterations, args.warmup)
+        print(json.dumps(results))
+        return
+
+    if args.artifacts:
+        artifacts = []
+        for path in args.artifacts:
+            if path.endswith('.tflite'):
+                artifacts.append(('tflite', path))
+            elif path.endswith('.json'):
+                artifacts.append(('tfjs', path))
+            elif path.endswith('.onnx'):
+                artifacts.append(('onnx', path))
+            elif os.path.isdir(path):
+                artifacts.append(('savedmodel', path))
+            else:
+                artifacts.append(('keras', path))
+    else:
+        artifacts = discover_artifacts(args.model_dir)
+    artifacts = [(fmt, path) for fmt, path in artifacts if fmt in args.formats]
+    if any(fmt == 'onnx' for fmt, _ in artifacts) and importlib.util.find_spec('onnxruntime') is None:
+        print("⚠️ onnxruntime not installed; skipping ONNX artifacts (pip install onnxruntime)")
+        artifacts = [(fmt, path) for fmt, path in artifacts if fmt != 'onnx']
+
+    if not artifacts:
+        print(f"No model artifacts found in {args.model_dir}")
+        return
+
+    report = {'environment': environment_info(), 'config': {
+        'batch_sizes': args.batch_sizes,
+        'threads': args.threads,
+        'iterations': args.iterations,
+        'warmup': args.warmup
+    }, 'results': []}
+
+    for fmt, path in artifacts:
+        for threads in args.threads:
+            print(f"Benchmarking {path} ({fmt}, {threads} threads)...")
+            report['results'].extend(run_isolated(fmt, path, threads, args))
+
+    print()
+    print_table(report['results'])
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"Compared with {args.compare} (commit {baseline['environment'].get('commit')}):")
+        if not regressions:
+            print("No regressions")
+            return
+        for reg in regressions:
+            artifact, fmt, threads, batch_size = reg['key']
+            print(f"  REGRESSION {artifact} [{fmt}, {threads} threads, batch {batch_size}]: "
+                  f"throughput {reg['throughput_change']:+.1%}, p99 {reg['p99_change']:+.1%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+CLI Startup Benchmark
+
+Measures how long each `python -m scripts` subcommand takes to start: the
+wall time of `<command> --help` and the time to import the module behind
+it, each in a fresh interpreter. It also records which heavy libraries
+(TensorFlow, tensorflowjs, matplotlib, sklearn, ...) the import pulls in, so
+a top-level import that slips back into a script shows up immediately.
+
+Results are written as JSON with the git commit and host details, and can
+be compared against an earlier run like bench_inference.py.
+
+Usage:
+    python bench_startup.py --repeat 5 --output startup_baseline.json
+    python bench_startup.py --output current.json --compare startup_baseline.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench_inference import environment_info
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(AI_DIR, 'scripts')
+
+HEAVY_MODULES = ('tensorflow', 'tensorflowjs', 'tf2onnx', 'keras', 'matplotlib', 'sklearn', 'aiohttp')
+
+# Runs in a fresh interpreter: import one subcommand's module and report the time
+# and which heavy modules came with it
+IMPORT_PROBE = """
+import json, sys, time
+sys.path.insert(0, {scripts_dir!r})
+start = time.perf_counter()
+import cli
+cli.load({command!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'import_s': elapsed,
+                  'heavy_modules': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def commands():
+    sys.path.insert(0, SCRIPTS_DIR)
+    from cli import COMMANDS
+    return list(COMMANDS)
+
+
+def time_help(command):
+    """Wall time of `python -m scripts <command> --help`"""
+
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-m', 'scripts', command, '--help'],
+                          cwd=AI_DIR, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error')
+    return elapsed
+
+
+def probe_import(command):
+    code = IMPORT_PROBE.format(scripts_dir=SCRIPTS_DIR, command=command, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, '-c', code], cwd=SCRIPTS_DIR, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'unknown error')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def benchmark_command(command, repeat):
+    """Median --help and import times over repeat fresh interpreters"""
+
+    try:
+        help_times = [time_help(command) for _ in range(repeat)]
+        probes = [probe_import(command) for _ in range(repeat)]
+    except RuntimeError as e:
+        return {'command': command, 'error': str(e)}
+
+    return {
+        'command': command,
+        'help_s': float(np.median(help_times)),
+        'import_s': float(np.median([p['import_s'] for p in probes])),
+        'heavy_modules': probes[-1]['heavy_modules']
+    }
+
+
+def compare(current, baseline, tolerance, min_delta=0.05):
+    """
+    Return commands whose --help time rose by more than tolerance (a fraction,
+    and at least min_delta seconds) or that now import extra heavy modules
+    """
+
+    previous = {r['command']: r for r in baseline['results'] if 'error' not in r}
+    regressions = []
+    for result in current['results']:
+        old = previous.get(result['command'])
+        if old is None or 'error' in result:
+            continue
+        change = result['help_s'] / old['help_s'] - 1
+        new_modules = sorted(set(result['heavy_modules']) - set(old['heavy_modules']))
+        if (change > tolerance and result['help_s'] - old['help_s'] > min_delta) or new_modules:
+            regressions.append({'command': result['command'], 'help_change': change,
+                                'new_heavy_modules': new_modules})
+    return regressions
+
+
+def print_table(results):
+    print(f"{'Command':<16}{'--help s':>10}{'import s':>10}  Heavy modules")
+    for r in results:
+        if 'error' in r:
+            print(f"{r['command']:<16}  error: {r['error']}")
+            continue
+        print(f"{r['command']:<16}{r['help_s']:>10.3f}{r['import_s']:>10.3f}  "
+              f"{', '.join(r['heavy_modules']) or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark startup time of the python -m scripts commands')
+    parser.add_argument('--commands', nargs='+', help='Subcommands to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per measurement')
+    parser.add_argument('--output', default='startup_benchmark.json')
+    parser.add_argument('--compare', help='Earlier startup benchmark JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative increase of --help time before flagging')
+
+    args = parser.parse_args()
+
+    names = args.commands or [c for c in commands() if c != 'bench-startup']
+    report = {'environment': environment_info(), 'config': {'repeat': args.repeat}, 'results': []}
+    for command in names:
+        print(f"Measuring {command}...")
+        report['results'].append(benchmark_command(command, args.repeat))
+
+    print()
+    print_table(report['results'])
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        print(f"Compared with {args.compare} (commit {baseline['environment'].get('commit')}):")
+        if not regressions:
+            print("No regressions")
+            return
+        for reg in regressions:
+            extra = f", now imports {', '.join(reg['new_heavy_modules'])}" if reg['new_heavy_modules'] else ''
+            print(f"  REGRESSION {reg['command']}: --help time {reg['help_change']:+.1%}{extra}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Entry point for `python -m scripts` (run from the ai/ directory)"""
+
+import os
+import sys
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main  # noqa: E402
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Transfer-Learning Backbones
+
+Pretrained ImageNet backbones for train.py --backbone, plus a bottleneck
+feature cache. The frozen backbone is run over each split once and its
+pooled embeddings are stored as .npy files; the classification head then
+trains on those vectors in seconds instead of recomputing the convolutions
+every epoch. The full model (backbone + the same head) can be fine-tuned
+afterwards.
+
+Weights are read from local files (no download at training time), by
+default ../model/backbones/<name>_notop.h5, i.e. the Keras "no top" weights
+for the architecture.
+
+Cached features are computed from unaugmented images; augmentation only
+applies during fine-tuning.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from pack_dataset import MANIFEST_NAME, PackedSplit
+from paths import DATA_DIR, MODEL_DIR
+
+# name -> keras.applications constructor name (looked up lazily so importing this
+# module does not load TensorFlow); these models rescale [0, 255] inputs internally
+BACKBONES = {
+    'mobilenetv3small': 'MobileNetV3Small',
+    'mobilenetv3large': 'MobileNetV3Large',
+    'efficientnetb0': 'EfficientNetB0',
+}
+
+DEFAULT_WEIGHTS_DIR = os.path.join(MODEL_DIR, 'backbones')
+DEFAULT_FEATURE_CACHE = os.path.join(DATA_DIR, 'features')
+
+
+def default_weights_path(name):
+    return os.path.join(DEFAULT_WEIGHTS_DIR, f"{name}_notop.h5")
+
+
+def build_backbone(name, input_shape, weights_path=None):
+    """
+    Create a frozen backbone that maps [0, 1] images to pooled embeddings
+
+    Args:
+        name (str): Key of BACKBONES
+        input_shape (tuple): (height, width, 3)
+        weights_path (str): Local weights file (default: default_weights_path(name))
+
+    Returns:
+        keras.Model: Backbone with trainable=False
+    """
+
+    import tensorflow as tf
+    from tensorflow.keras import layers, models
+
+    weights_path = weights_path or default_weights_path(name)
+    if not os.path.exists(weights_path):
+        raise FileNotFoundError(
+            f"Backbone weights not found: {weights_path} "
+            f"(download the no-top ImageNet weights for {name} once and place them there)"
+        )
+
+    constructor = getattr(tf.keras.applications, BACKBONES[name])
+    base = constructor(input_shape=input_shape, include_top=False, weights=None, pooling='avg')
+    base.load_weights(weights_path)
+
+    # The training pipeline yields [0, 1] pixels; the applications expect [0, 255]
+    inputs = layers.Input(shape=input_shape)
+    x = layers.Rescaling(255.0)(inputs)
+    outputs = base(x, training=False)
+    backbone = models.Model(inputs, outputs, name=f"{name}_backbone")
+    backbone.trainable = False
+    return backbone
+
+
+def create_head(feature_dim, num_classes, dropout=0.2):
+    """Classification head that runs on pooled backbone features"""
+
+    from tensorflow.keras import layers, models
+
+    return models.Sequential([
+        layers.Input(shape=(feature_dim,)),
+        layers.Dropout(dropout),
+        # Softmax stays in float32 for numerically stable probabilities
+        layers.Dense(num_classes, activation='softmax', dtype='float32', name='predictions')
+    ], name='head')
+
+
+def create_transfer_model(backbone, head):
+    """Stack backbone and head into one image classifier (weights are shared)"""
+
+    from tensorflow.keras import layers, models
+
+    inputs = layers.Input(shape=backbone.input_shape[1:])
+    outputs = head(backbone(inputs, training=False))
+    return models.Model(inputs, outputs, name=f"{backbone.name}_classifier")
+
+
+def unfreeze_top_layers(backbone, num_layers):
+    """
+    Make the last num_layers layers of the backbone trainable for fine-tuning
+
+    BatchNormalization layers stay frozen so their statistics are not
+    disturbed by small fine-tuning batches.
+    """
+
+    from tensorflow.keras import layers
+
+    base = backbone.layers[-1]
+    backbone.trainable = True
+    cutoff = len(base.layers) - num_layers
+    for i, layer in enumerate(base.layers):
+        layer.trainable = i >= cutoff and not isinstance(layer, layers.BatchNormalization)
+
+
+def source_fingerprint(source):
+    """Hash identifying the contents of a PackedSplit or (paths, labels) source"""
+
+    h = hashlib.sha256()
+    if isinstance(source, PackedSplit):
+        with open(os.path.join(source.packed_dir, MANIFEST_NAME), 'rb') as f:
+            h.update(f.read())
+    else:
+        paths, labels = source
+        for path, label in zip(paths, labels):
+            st = os.stat(path)
+            h.update(f"{path}\t{label}\t{st.st_size}\t{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _weights_fingerprint(weights_path):
+    st = os.stat(weights_path)
+    return f"{os.path.abspath(weights_path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def cached_features(backbone, dataset, cache_dir, split, fingerprint, weights_path):
+    """
+    Pooled backbone features for every sample of an unshuffled dataset
+
+    Features are stored as <cache_dir>/<backbone>-<split>.npy (plus labels
+    and a JSON key). They are recomputed only when the backbone weights,
+    input size or source files change.
+
+    Args:
+        backbone (keras.Model): Model from build_backbone
+        dataset (tf.data.Dataset): Unshuffled, unaugmented (images, one-hot) batches
+        cache_dir (str): Directory for the cache files
+        split (str): 'training' or 'validation'
+        fingerprint (str): source_fingerprint() of the dataset's source
+        weights_path (str): Weights file the backbone was loaded from
+
+    Returns:
+        tuple: (float32 features [N, D], int labels [N])
+    """
+
+    import tensorflow as tf
+
+    os.makedirs(cache_dir, exist_ok=True)
+    prefix = os.path.join(cache_dir, f"{backbone.name}-{split}")
+    key = {
+        'backbone': backbone.name,
+        'weights': _weights_fingerprint(weights_path),
+        'input_shape': list(backbone.input_shape[1:]),
+        'source': fingerprint
+    }
+
+    if os.path.exists(prefix + '.json'):
+        with open(prefix + '.json', 'r') as f:
+            if json.load(f) == key:
+                print(f"Using cached {split} features from {prefix}.npy")
+                return np.load(prefix + '.npy', mmap_mode='r'), np.load(prefix + '-labels.npy')
+
+    print(f"Computing {split} features with {backbone.name}...")
+
+    @tf.function
+    def embed(images):
+        return tf.cast(backbone(images, training=False), tf.float32)
+
+    features = []
+    labels = []
+    for images, one_hot in dataset:
+        features.append(embed(images).numpy())
+        labels.append(np.argmax(one_hot.numpy(), axis=1))
+    features = np.concatenate(features)
+    labels = np.concatenate(labels)
+
+    if os.path.exists(prefix + '.json'):
+        os.remove(prefix + '.json')
+    np.save(prefix + '.npy', features)
+    np.save(prefix + '-labels.npy', labels)
+    # Write the key last so an interrupted run is never mistaken for a valid cache
+    with open(prefix + '.json', 'w') as f:
+        json.dump(key, f)
+    print(f"Cached {len(features)} {split} features ({features.shape[1]}-d) to {prefix}.npy")
+    return features, labels
+
+
+def feature_dataset(features, labels, num_classes, batch_size, training=False, seed=None):
+    """tf.data pipeline over cached features with one-hot labels"""
+
+    import tensorflow as tf
+
+    dataset = tf.data.Dataset.from_tensor_slices((np.asarray(features), labels))
+    if training:
+        dataset = dataset.shuffle(len(labels), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(lambda x, y: (x, tf.one_hot(y, num_classes)))
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,80 @@
+"""
+UrbanPulse AI Command Line
+
+One entry point for the training and deployment tools. Each subcommand maps
+to an existing script's main(); the script module is only imported once its
+subcommand is chosen, and the scripts themselves import TensorFlow,
+tensorflowjs and matplotlib inside the functions that need them, so --help
+and the data tools start without loading any of them.
+
+Paths default to the ai/model and ai/data directories of this checkout (see
+paths.py), independent of the working directory.
+
+Usage:
+    cd ai && python -m scripts train --backbone mobilenetv3small
+    python -m scripts convert --quantization uint8
+    python -m scripts split ../raw --resize 256
+    python -m scripts bench-startup --compare startup_baseline.json
+"""
+
+import argparse
+import importlib
+import sys
+
+from paths import BENCHMARKS_DIR
+
+PROG = 'python -m scripts'
+
+# subcommand -> (module, leading arguments passed to its main(), help)
+COMMANDS = {
+    'train': ('train', [], 'Train the classifier (train.py)'),
+    'distill': ('distill', [], 'Distill (and optionally prune) a compact student model (distill.py)'),
+    'sweep': ('sweep', [], 'Sweep input resolution and width for a latency/accuracy trade-off (sweep.py)'),
+    'tune': ('tune', [], 'Parallel hyperparameter search with pruning, resumable (tune.py)'),
+    'convert': ('convert', [], 'Convert a Keras model to TensorFlow.js / TFLite / serving formats (convert.py)'),
+    'split': ('preprocess', ['split'], 'Split a class-folder dataset into train/validation (preprocess.py split)'),
+    'verify': ('preprocess', ['verify'], 'Verify images and quarantine bad ones (preprocess.py verify)'),
+    'download': ('download_samples', [], 'Download training images (download_samples.py)'),
+    'predict': ('predict', [], 'Classify directories of images in batches (predict.py)'),
+    'serve': ('serve', [], 'Serve the model over HTTP with dynamic batching (serve.py)'),
+    'bench': ('bench_inference', [], 'Benchmark inference for every model artifact (benchmarks/bench_inference.py)'),
+    'bench-startup': ('bench_startup', [], 'Benchmark CLI startup and import time (benchmarks/bench_startup.py)'),
+}
+
+
+def load(command):
+    """Import the module behind a subcommand and return its main()"""
+
+    module_name = COMMANDS[command][0]
+    if module_name.startswith('bench_') and BENCHMARKS_DIR not in sys.path:
+        sys.path.append(BENCHMARKS_DIR)
+    return importlib.import_module(module_name).main
+
+
+def run(command, args):
+    """Run a subcommand's main() as if its script had been called with args"""
+
+    _, leading, _ = COMMANDS[command]
+    main = load(command)
+    # Scripts with their own subcommands keep them, so usage reads "python -m scripts split ..."
+    sys.argv = [PROG if leading else f"{PROG} {command}", *leading, *args]
+    return main()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog=PROG,
+        description='UrbanPulse AI tools',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='commands:\n' + '\n'.join(f"  {name:<15}{entry[2]}" for name, entry in COMMANDS.items())
+               + f"\n\nRun '{PROG} <command> --help' for the options of a command."
+    )
+    parser.add_argument('command', choices=COMMANDS, metavar='command', help='One of the commands below')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+    return run(args.command, args.args)
+
+
+if __name__ == "__main__":
+    main()
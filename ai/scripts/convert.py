@@ -3,47 +3,190 @@ Model Conversion Script
 
 Converts trained Keras/TensorFlow models to TensorFlow.js format
 for use in the web backend.
+
+With --export it also writes serving formats for batch classifiers: a
+frozen, constant-folded SavedModel and an ONNX graph. Both take raw uint8
+RGB images of any size and have the resize + /255 preprocessing fused in.
 """
 
-import tensorflowjs as tfjs
-import tensorflow as tf
+import numpy as np
 import os
 import argparse
+import hashlib
+import json
+import shutil
+import time
+
+from PIL import Image
+
+from pack_dataset import load_image_array
+from paths import DATA_DIR, LABELS_PATH, MODEL_DIR
+
+PTQ_VARIANTS = ['dynamic', 'float16', 'int8']
+EXPORT_FORMATS = ['savedmodel', 'onnx']
+ONNX_OPSET = 13
+
+SHARD_SIZE = 4 * 1024 * 1024  # tfjs converter default (4MB)
+WEIGHTS_MANIFEST_NAME = 'weights_manifest.json'
+WEIGHTS_MANIFEST_VERSION = 1
+
+# Bytes per element of the dtypes tfjs stores in weight files
+DTYPE_BYTES = {'float32': 4, 'int32': 4, 'float16': 2, 'uint16': 2, 'uint8': 1, 'bool': 1}
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def build_weights_manifest(model_path, shard_size=SHARD_SIZE):
+    """
+    Describe the weight shards of a converted model
+    
+    Lists every shard with its byte offset in the concatenated weight
+    stream, size and SHA-256, and every weight with its byte range, so
+    shards can be fetched in parallel, verified and cached individually.
+    
+    Args:
+        model_path (str): Directory containing model.json and its shards
+        shard_size (int): Shard size the model was written with
+    
+    Returns:
+        dict: Manifest (also written to weights_manifest.json)
+    """
+    
+    model_json_path = os.path.join(model_path, 'model.json')
+    with open(model_json_path, 'r') as f:
+        model_config = json.load(f)
+    
+    shards = []
+    weights = []
+    offset = 0
+    weight_offset = 0
+    for group in model_config['weightsManifest']:
+        for shard in group['paths']:
+            size = os.path.getsize(os.path.join(model_path, shard))
+            shards.append({
+                'path': shard,
+                'offset': offset,
+                'size': size,
+                'sha256': file_sha256(os.path.join(model_path, shard))
+            })
+            offset += size
+        for weight in group['weights']:
+            # Quantized weights are stored in the quantization dtype
+            dtype = weight.get('quantization', {}).get('dtype', weight['dtype'])
+            size = int(np.prod(weight['shape'], dtype=np.int64)) * DTYPE_BYTES[dtype]
+            weights.append({'name': weight['name'], 'offset': weight_offset, 'size': size})
+            weight_offset += size
+    
+    manifest = {
+        'version': WEIGHTS_MANIFEST_VERSION,
+        'model': 'model.json',
+        'model_sha256': file_sha256(model_json_path),
+        'shard_size': shard_size,
+        'total_bytes': offset,
+        'shards': shards,
+        'weights': weights
+    }
+    
+    with open(os.path.join(model_path, WEIGHTS_MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def read_weights_manifest(path):
+    """Load a weights manifest file, or the one inside a model directory"""
+    
+    if os.path.isdir(path):
+        path = os.path.join(path, WEIGHTS_MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
 
-def convert_model(input_path, output_path, quantization=None):
+def diff_weights_manifests(old, new):
+    """
+    Compare two weights manifests by shard content
+    
+    Returns:
+        dict: 'changed' shards of new whose content is not in old (to
+            upload), 'unchanged' shards already deployed, 'removed' paths of
+            old that new no longer references, and 'upload_bytes'
+    """
+    
+    old_hashes = {shard['sha256'] for shard in old['shards']}
+    new_paths = {shard['path'] for shard in new['shards']}
+    changed = [shard for shard in new['shards'] if shard['sha256'] not in old_hashes]
+    
+    return {
+        'changed': [shard['path'] for shard in changed],
+        'unchanged': [shard['path'] for shard in new['shards'] if shard['sha256'] in old_hashes],
+        'removed': [shard['path'] for shard in old['shards'] if shard['path'] not in new_paths],
+        'model_changed': old['model_sha256'] != new['model_sha256'],
+        'upload_bytes': sum(shard['size'] for shard in changed)
+    }
+
+def print_weights_diff(diff, total_bytes):
+    print("Shard changes since the previous conversion:")
+    print(f"  {len(diff['changed'])} changed, {len(diff['unchanged'])} unchanged, "
+          f"{len(diff['removed'])} removed")
+    for path in diff['changed']:
+        print(f"  + {path}")
+    for path in diff['removed']:
+        print(f"  - {path}")
+    print(f"  Upload: {diff['upload_bytes'] / (1024 * 1024):.2f} MB of "
+          f"{total_bytes / (1024 * 1024):.2f} MB"
+          + (" (+ model.json)" if diff['model_changed'] else ""))
+
+def convert_model(input_path, output_path, quantization=None, shard_size=SHARD_SIZE,
+                  previous_manifest=None):
     """
     Convert a Keras model to TensorFlow.js format
     
+    Writes weights_manifest.json next to model.json and, when an earlier
+    manifest exists (previous_manifest, or the one already in output_path),
+    reports which shards changed and removes shards that are no longer used.
+    
     Args:
         input_path (str): Path to the input model (.h5 or SavedModel)
         output_path (str): Directory to save the converted model
         quantization (str): Quantization type ('uint8' or 'uint16')
+        shard_size (int): Maximum bytes per weight shard
+        previous_manifest (str): Weights manifest of the deployed model to diff against
     """
     
+    import tensorflow as tf
+    import tensorflowjs as tfjs
+    
     print(f"Loading model from: {input_path}")
     
-    # Load the model
-    if input_path.endswith('.h5'):
-        model = tf.keras.models.load_model(input_path)
-    else:
-        model = tf.saved_model.load(input_path)
+    # Load the model (.h5 file or Keras SavedModel directory)
+    model = tf.keras.models.load_model(input_path, compile=False)
     
     print("Model loaded successfully!")
     print(f"Model summary:")
-    if hasattr(model, 'summary'):
-        model.summary()
+    model.summary()
     
     # Create output directory if it doesn't exist
     os.makedirs(output_path, exist_ok=True)
     
-    # Set conversion parameters
-    conversion_params = {}
+    # Read the earlier manifest before the conversion overwrites it
+    old_manifest = read_weights_manifest(previous_manifest or output_path)
+    
+    # Set conversion parameters; the input resolution goes into model.json's
+    # userDefinedMetadata so the backend resizes images to what the model expects
+    _, img_height, img_width, _ = model.input_shape
+    conversion_params = {
+        'weight_shard_size_bytes': shard_size,
+        'metadata': {'inputResolution': [img_height, img_width]}
+    }
     
     if quantization == 'uint8':
-        conversion_params['quantization_bytes'] = 1
+        conversion_params['quantization_dtype_map'] = {'uint8': '*'}
         print("Using uint8 quantization (smaller size, slight accuracy loss)")
     elif quantization == 'uint16':
-        conversion_params['quantization_bytes'] = 2
+        conversion_params['quantization_dtype_map'] = {'uint16': '*'}
         print("Using uint16 quantization (balanced size/accuracy)")
     else:
         print("No quantization (full precision)")
@@ -59,6 +202,21 @@ def convert_model(input_path, output_path, quantization=None):
     )
     
     print("Conversion completed!")
+    
+    manifest = build_weights_manifest(output_path, shard_size)
+    print(f"Weights manifest: {len(manifest['shards'])} shard(s), "
+          f"{manifest['total_bytes'] / (1024 * 1024):.2f} MB")
+    
+    if old_manifest:
+        diff = diff_weights_manifests(old_manifest, manifest)
+        print_weights_diff(diff, manifest['total_bytes'])
+        if not previous_manifest:
+            # Shards of the previous conversion in the same directory that are no longer referenced
+            for path in diff['removed']:
+                stale = os.path.join(output_path, path)
+                if os.path.exists(stale):
+                    os.remove(stale)
+    
     print(f"Generated files:")
     for file in os.listdir(output_path):
         file_path = os.path.join(output_path, file)
@@ -91,6 +249,19 @@ def validate_converted_model(model_path):
     else:
         print("⚠ No .bin weight files found")
     
+    # Check shard sizes and hashes against the weights manifest
+    manifest = read_weights_manifest(model_path)
+    if manifest:
+        bad = [
+            shard['path'] for shard in manifest['shards']
+            if not os.path.exists(os.path.join(model_path, shard['path']))
+            or file_sha256(os.path.join(model_path, shard['path'])) != shard['sha256']
+        ]
+        if bad:
+            print(f"⚠ Shards missing or not matching {WEIGHTS_MANIFEST_NAME}: {', '.join(bad)}")
+        else:
+            print(f"✓ All {len(manifest['shards'])} shards match {WEIGHTS_MANIFEST_NAME}")
+    
     # Try to read the model.json
     try:
         import json
@@ -98,22 +269,428 @@ def validate_converted_model(model_path):
             model_config = json.load(f)
         print(f"✓ model.json is valid JSON")
         print(f"✓ Model format: {model_config.get('format', 'unknown')}")
+        resolution = model_config.get('userDefinedMetadata', {}).get('inputResolution')
+        if resolution:
+            print(f"✓ Input resolution: {resolution[0]}x{resolution[1]}")
         print(f"✓ Model name: {model_config.get('modelTopology', {}).get('model_config', {}).get('config', {}).get('name', 'unknown')}")
     except Exception as e:
         print(f"⚠ Error reading model.json: {e}")
     
     return True
 
+def load_eval_images(data_dir, labels_path, img_height, img_width, max_samples, seed=0):
+    """
+    Load a random subset of a split as float32 arrays
+
+    Returns:
+        tuple: (images in [0, 1] of shape (N, H, W, 3), integer labels)
+    """
+
+    from input_pipeline import list_image_files
+
+    with open(labels_path, 'r') as f:
+        class_names = json.load(f)['aiCategories']
+
+    paths, labels = list_image_files(data_dir, class_names)
+    if not paths:
+        raise ValueError(f"No images found under {data_dir}")
+
+    order = np.random.default_rng(seed).permutation(len(paths))[:max_samples]
+    images = np.stack([
+        load_image_array(paths[i], img_height, img_width) for i in order
+    ]).astype(np.float32) / 255.0
+    return images, np.array([labels[i] for i in order])
+
+def quantize_model(model, output_dir, variant, calibration_images):
+    """
+    Write a post-training quantized TFLite model
+
+    Args:
+        model: Float Keras model
+        output_dir (str): Directory for the .tflite file
+        variant (str): 'float32' (unquantized baseline), 'dynamic' (int8
+            weights), 'float16' (fp16 weights) or 'int8' (full-integer
+            weights and activations)
+        calibration_images (np.ndarray): Representative inputs for 'int8'
+
+    Returns:
+        str: Path of the written .tflite file
+    """
+
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if variant != 'float32':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if variant == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    tflite_model = converter.convert()
+    path = os.path.join(output_dir, f"model_{variant}.tflite")
+    with open(path, 'wb') as f:
+        f.write(tflite_model)
+    return path
+
+def evaluate_tflite(tflite_path, images, labels, num_threads=None):
+    """
+    Measure top-1 accuracy and single-image latency of a TFLite model
+
+    Integer models get their inputs quantized with the model's own scale
+    and zero point.
+
+    Returns:
+        dict: accuracy and mean/p50 latency in milliseconds
+    """
+
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_path=tflite_path, num_threads=num_threads)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+
+    scale, zero_point = input_details['quantization']
+    quantized_input = input_details['dtype'] in (np.int8, np.uint8)
+
+    correct = 0
+    latencies = []
+    for image, label in zip(images, labels):
+        x = image[np.newaxis]
+        if quantized_input:
+            x = np.clip(np.round(x / scale + zero_point),
+                        np.iinfo(input_details['dtype']).min,
+                        np.iinfo(input_details['dtype']).max).astype(input_details['dtype'])
+
+        start = time.perf_counter()
+        interpreter.set_tensor(input_details['index'], x)
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index'])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        correct += int(np.argmax(output) == label)
+
+    return {
+        'accuracy': correct / len(labels),
+        'latency_ms': float(np.mean(latencies)),
+        'latency_p50_ms': float(np.percentile(latencies, 50))
+    }
+
+def evaluate_keras(model, images, labels):
+    """Top-1 accuracy and single-image eager latency of the Keras model (reference only)"""
+
+    predictions = model.predict(images, verbose=0)
+    accuracy = float(np.mean(np.argmax(predictions, axis=1) == labels))
+
+    latencies = []
+    for image in images[:min(len(images), 100)]:
+        start = time.perf_counter()
+        model(image[np.newaxis], training=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'accuracy': accuracy,
+        'latency_ms': float(np.mean(latencies)),
+        'latency_p50_ms': float(np.percentile(latencies, 50))
+    }
+
+def post_training_quantization(input_path, output_path, variants, calibration_dir,
+                               labels_path=LABELS_PATH, calibration_samples=200,
+                               eval_samples=500, num_threads=None):
+    """
+    Produce quantized TFLite variants and compare them with the float model
+
+    Calibration images for full-integer quantization and the images for the
+    accuracy comparison are disjoint parts of one random sample of
+    calibration_dir (ai/data/validation by default), so the int8 variant is
+    never scored on images it was calibrated with.
+
+    The baseline is an unquantized float32 TFLite model measured the same way
+    as the variants, so size and latency differences come from quantization
+    alone. The Keras model is listed last for reference; its latency is eager
+    Keras and its size the input file (which may hold optimizer state).
+
+    Returns:
+        list: One result dict per model (float32 TFLite first, Keras last)
+    """
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(input_path, compile=False)
+    _, img_height, img_width, _ = model.input_shape
+    os.makedirs(output_path, exist_ok=True)
+
+    print(f"Loading {eval_samples} evaluation and {calibration_samples} calibration images "
+          f"from {calibration_dir}...")
+    images, labels = load_eval_images(
+        calibration_dir, labels_path, img_height, img_width, eval_samples + calibration_samples
+    )
+    if len(images) < eval_samples + calibration_samples:
+        # Too few images for both: split what there is in the requested ratio
+        calibration_samples = max(1, round(len(images) * calibration_samples
+                                           / (eval_samples + calibration_samples)))
+        print(f"⚠️ Only {len(images)} images: using {calibration_samples} for calibration "
+              f"and {len(images) - calibration_samples} for evaluation")
+    calibration_images = images[:calibration_samples]
+    eval_images, eval_labels = images[calibration_samples:], labels[calibration_samples:]
+
+    results = []
+    for variant in ['float32'] + [v for v in variants if v != 'float32']:
+        print(f"Converting to TFLite: {variant}...")
+        path = quantize_model(model, output_path, variant, calibration_images)
+        results.append(dict(
+            variant=variant,
+            path=path,
+            size_mb=os.path.getsize(path) / (1024 * 1024),
+            **evaluate_tflite(path, eval_images, eval_labels, num_threads=num_threads)
+        ))
+
+    results.append(dict(
+        variant='keras (reference)',
+        size_mb=os.path.getsize(input_path) / (1024 * 1024) if os.path.isfile(input_path) else float('nan'),
+        **evaluate_keras(model, eval_images, eval_labels)
+    ))
+
+    baseline = results[0]['accuracy']
+    print(f"\n{'Variant':<18}{'Size (MB)':>10}{'Latency (ms)':>14}{'Top-1':>8}{'Delta':>8}")
+    for r in results:
+        print(f"{r['variant']:<18}{r['size_mb']:>10.2f}{r['latency_ms']:>14.2f}"
+              f"{r['accuracy']:>8.3f}{r['accuracy'] - baseline:>+8.3f}")
+
+    report_path = os.path.join(output_path, 'quantization_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Report saved to {report_path}")
+
+    return results
+
+def build_serving_function(model, batch_size=None):
+    """
+    Wrap the model with its preprocessing fused in
+    
+    The returned tf.function takes uint8 images of shape
+    [batch_size, height, width, 3] (any height and width; batch_size None
+    for a dynamic batch), resizes them bilinearly to the model input size,
+    rescales to [0, 1] like input_pipeline.decode_image and returns the
+    class probabilities.
+    """
+    
+    import tensorflow as tf
+    
+    _, img_height, img_width, _ = model.input_shape
+    
+    @tf.function(input_signature=[tf.TensorSpec([batch_size, None, None, 3], tf.uint8, name='images')])
+    def serve(images):
+        x = tf.image.resize(tf.cast(images, tf.float32), (img_height, img_width))
+        probabilities = model(x / 255.0, training=False)
+        return {'probabilities': tf.cast(probabilities, tf.float32)}
+    
+    return serve
+
+def freeze_function(serve):
+    """
+    Inline variables as constants and run Grappler constant folding
+    
+    Returns:
+        tuple: (optimized GraphDef, input tensor names, output tensor names)
+    """
+    
+    import tensorflow as tf
+    from tensorflow.core.protobuf import config_pb2, meta_graph_pb2
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+    from tensorflow.python.grappler import tf_optimizer
+    
+    frozen = convert_variables_to_constants_v2(serve.get_concrete_function())
+    inputs = [t.name for t in frozen.inputs if t.dtype != tf.resource]
+    outputs = [t.name for t in frozen.outputs]
+    
+    meta_graph = tf.compat.v1.train.export_meta_graph(graph_def=frozen.graph.as_graph_def(),
+                                                      graph=frozen.graph)
+    # Grappler keeps only what the fetch collection needs
+    fetch = meta_graph_pb2.CollectionDef()
+    fetch.node_list.value.extend(outputs)
+    meta_graph.collection_def['train_op'].CopyFrom(fetch)
+    
+    config = config_pb2.ConfigProto()
+    rewrite = config.graph_options.rewrite_options
+    rewrite.optimizers.extend(['constfold', 'arithmetic', 'dependency', 'function'])
+    rewrite.meta_optimizer_iterations = 2
+    graph_def = tf_optimizer.OptimizeGraph(config, meta_graph)
+    return graph_def, inputs, outputs
+
+def export_savedmodel(serve, export_dir):
+    """Write a variable-free SavedModel whose serving_default signature is the frozen graph"""
+    
+    import tensorflow as tf
+    
+    graph_def, inputs, outputs = freeze_function(serve)
+    if os.path.exists(export_dir):
+        shutil.rmtree(export_dir)
+    
+    with tf.Graph().as_default() as graph:
+        tf.compat.v1.import_graph_def(graph_def, name='')
+        with tf.compat.v1.Session(graph=graph) as sess:
+            signature = tf.compat.v1.saved_model.predict_signature_def(
+                inputs={'images': graph.get_tensor_by_name(inputs[0])},
+                outputs={'probabilities': graph.get_tensor_by_name(outputs[0])}
+            )
+            builder = tf.compat.v1.saved_model.Builder(export_dir)
+            builder.add_meta_graph_and_variables(
+                sess, [tf.saved_model.SERVING],
+                signature_def_map={'serving_default': signature}
+            )
+            builder.save()
+    
+    print(f"✓ SavedModel ({len(graph_def.node)} nodes after folding) saved to {export_dir}")
+    return export_dir
+
+def export_onnx(serve, onnx_path, opset=ONNX_OPSET):
+    """Convert the serving function to ONNX with tf2onnx"""
+    
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ImportError("ONNX export needs tf2onnx: pip install tf2onnx onnxruntime")
+    
+    tf2onnx.convert.from_function(
+        serve,
+        input_signature=serve.input_signature,
+        opset=opset,
+        output_path=onnx_path
+    )
+    print(f"✓ ONNX graph (opset {opset}) saved to {onnx_path}")
+    return onnx_path
+
+def load_parity_images(data_dir, labels_path, max_samples, seed=0):
+    """Raw uint8 images (native resolution) from a split for parity checks"""
+    
+    from input_pipeline import list_image_files
+    
+    with open(labels_path, 'r') as f:
+        class_names = json.load(f)['aiCategories']
+    
+    paths, _ = list_image_files(data_dir, class_names)
+    order = np.random.default_rng(seed).permutation(len(paths))[:max_samples]
+    images = []
+    for i in order:
+        with Image.open(paths[i]) as img:
+            images.append(np.asarray(img.convert('RGB'), dtype=np.uint8))
+    return images
+
+def check_parity(reference, runners, images, batch_size=None, atol=1e-4):
+    """
+    Compare exported variants with the reference on raw images
+    
+    Each image is run on its own (repeated to fill a fixed batch), since
+    native resolutions differ.
+    
+    Returns:
+        dict: Per variant the max absolute probability difference, top-1
+            agreement with the reference and whether it is within atol
+    """
+    
+    diffs = {name: [] for name in runners}
+    agree = {name: 0 for name in runners}
+    for image in images:
+        batch = np.repeat(image[np.newaxis], batch_size or 1, axis=0)
+        expected = reference(batch)
+        for name, run in runners.items():
+            actual = run(batch)
+            diffs[name].append(float(np.max(np.abs(actual - expected))))
+            agree[name] += int(np.argmax(actual[0]) == np.argmax(expected[0]))
+    
+    return {
+        name: {
+            'max_abs_diff': max(diffs[name]) if diffs[name] else 0.0,
+            'top1_agreement': agree[name] / len(images) if images else 1.0,
+            'ok': (max(diffs[name]) if diffs[name] else 0.0) <= atol
+        }
+        for name in runners
+    }
+
+def export_serving_models(input_path, output_path, formats, batch_size=None, parity_dir=None,
+                          labels_path=LABELS_PATH, parity_samples=50, atol=1e-4,
+                          opset=ONNX_OPSET):
+    """
+    Export the SavedModel and/or ONNX serving variants and check parity
+    
+    Args:
+        input_path (str): Keras model (.h5 or SavedModel directory)
+        output_path (str): Directory for 'savedmodel/' and 'model.onnx'
+        formats (list): Subset of EXPORT_FORMATS
+        batch_size (int): Fixed batch size of the serving signature (None: dynamic)
+        parity_dir (str): Images used for the parity check (None to skip)
+    
+    Returns:
+        dict: Export report (also written to export_report.json)
+    """
+    
+    import tensorflow as tf
+    
+    model = tf.keras.models.load_model(input_path, compile=False)
+    serve = build_serving_function(model, batch_size)
+    os.makedirs(output_path, exist_ok=True)
+    
+    report = {'input': input_path, 'batch_size': batch_size, 'artifacts': {}}
+    runners = {}
+    
+    if 'savedmodel' in formats:
+        export_dir = export_savedmodel(serve, os.path.join(output_path, 'savedmodel'))
+        report['artifacts']['savedmodel'] = export_dir
+        signature = tf.saved_model.load(export_dir).signatures['serving_default']
+        runners['savedmodel'] = lambda batch: signature(images=tf.constant(batch))['probabilities'].numpy()
+    
+    if 'onnx' in formats:
+        onnx_path = export_onnx(serve, os.path.join(output_path, 'model.onnx'), opset)
+        report['artifacts']['onnx'] = onnx_path
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            print("⚠ onnxruntime not installed; skipping the ONNX parity check")
+        else:
+            session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+            input_name = session.get_inputs()[0].name
+            runners['onnx'] = lambda batch: session.run(None, {input_name: batch})[0]
+    
+    if parity_dir and runners:
+        images = load_parity_images(parity_dir, labels_path, parity_samples)
+        print(f"Checking parity on {len(images)} images from {parity_dir}...")
+        def reference(batch):
+            return serve(tf.constant(batch))['probabilities'].numpy()
+        
+        report['parity'] = check_parity(reference, runners, images, batch_size, atol)
+        
+        print(f"{'Variant':<12}{'Max |diff|':>12}{'Top-1 agree':>13}")
+        for name, result in report['parity'].items():
+            print(f"{name:<12}{result['max_abs_diff']:>12.2e}{result['top1_agreement']:>13.1%}"
+                  f"  {'✓' if result['ok'] else '⚠ above tolerance ' + str(atol)}")
+    
+    report_path = os.path.join(output_path, 'export_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {report_path}")
+    
+    return report
+
 def main():
     parser = argparse.ArgumentParser(description='Convert Keras model to TensorFlow.js')
     parser.add_argument(
         '--input', 
-        default='../model/best_model.h5',
+        default=os.path.join(MODEL_DIR, 'best_model.h5'),
         help='Input model path (.h5 or SavedModel directory)'
     )
     parser.add_argument(
         '--output', 
-        default='../model/',
+        default=MODEL_DIR,
         help='Output directory for converted model'
     )
     parser.add_argument(
@@ -121,11 +698,62 @@ def main():
         choices=['uint8', 'uint16'],
         help='Quantization type for smaller model size'
     )
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=SHARD_SIZE,
+        help='Maximum bytes per weight shard (default 4MB)'
+    )
+    parser.add_argument(
+        '--previous-manifest',
+        help='weights_manifest.json of the deployed model to diff against '
+             '(default: the one already in --output)'
+    )
     parser.add_argument(
         '--validate',
         action='store_true',
         help='Validate converted model after conversion'
     )
+    parser.add_argument(
+        '--ptq',
+        nargs='+',
+        choices=PTQ_VARIANTS,
+        help='Post-training quantize to TFLite variants and compare with the float model'
+    )
+    parser.add_argument(
+        '--export',
+        nargs='+',
+        choices=EXPORT_FORMATS,
+        help='Export serving models with fused preprocessing instead of converting to tfjs'
+    )
+    parser.add_argument(
+        '--export-batch-size',
+        type=int,
+        help='Fixed batch size of the exported serving signature (default: dynamic)'
+    )
+    parser.add_argument(
+        '--parity-samples',
+        type=int,
+        default=50,
+        help='Validation images used to check exported variants against the Keras model'
+    )
+    parser.add_argument(
+        '--calibration-dir',
+        default=os.path.join(DATA_DIR, 'validation'),
+        help='Images used for int8 calibration, the accuracy comparison and export parity checks'
+    )
+    parser.add_argument(
+        '--calibration-samples',
+        type=int,
+        default=200,
+        help='Number of representative images for int8 calibration'
+    )
+    parser.add_argument(
+        '--eval-samples',
+        type=int,
+        default=500,
+        help='Number of images used to compare accuracy and latency'
+    )
     
     args = parser.parse_args()
     
@@ -138,9 +766,28 @@ def main():
         print("Please train a model first using train.py")
         return
     
+    if args.export:
+        export_serving_models(
+            args.input, args.output, args.export,
+            batch_size=args.export_batch_size,
+            parity_dir=args.calibration_dir if args.parity_samples else None,
+            parity_samples=args.parity_samples
+        )
+        return
+    
+    if args.ptq:
+        post_training_quantization(
+            args.input, args.output, args.ptq, args.calibration_dir,
+            calibration_samples=args.calibration_samples,
+            eval_samples=args.eval_samples
+        )
+        return
+    
     # Convert the model
     try:
-        success = convert_model(args.input, args.output, args.quantization)
+        success = convert_model(args.input, args.output, args.quantization,
+                                shard_size=args.shard_size,
+                                previous_manifest=args.previous_manifest)
         
         if success and args.validate:
             print("\n" + "=" * 40)
@@ -10,11 +10,13 @@ import numpy as np
 import json
 import os
 
+from paths import LABELS_PATH, MODEL_DIR
+
 def create_demo_model():
     """Create a demo model with correct architecture"""
     
     # Load configuration
-    config_path = '../model/labels.json'
+    config_path = LABELS_PATH
     with open(config_path, 'r') as f:
         config = json.load(f)
     
@@ -76,7 +78,7 @@ def main():
     model = create_demo_model()
     
     # Load config to get number of classes
-    with open('../model/labels.json', 'r') as f:
+    with open(LABELS_PATH, 'r') as f:
         config = json.load(f)
     num_classes = len(config['aiCategories'])
     
@@ -95,7 +97,7 @@ def main():
     )
     
     # Save the model
-    model_dir = '../model'
+    model_dir = MODEL_DIR
     h5_path = os.path.join(model_dir, 'demo_model.h5')
     
     print(f"Saving model to {h5_path}")
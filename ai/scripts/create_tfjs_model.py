@@ -1,18 +1,127 @@
 """
 Create TensorFlow.js Model Files
 
-Creates proper model.json and model.bin files with correct architecture
-for the 10-category urban infrastructure classification model.
+Creates model.json and sharded weight files with the correct architecture
+for the urban infrastructure classification model.
+
+The topology and the weights manifest are both derived from LAYER_SPEC and
+the categories in labels.json, so they always agree with each other and
+with the number of classes. Weights are generated from a seed into one
+preallocated buffer and written as tfjs-standard group1-shardNofM.bin
+files (4MB each by default), giving reproducible placeholder models.
+
+Usage:
+    python create_tfjs_model.py --seed 42
 """
 
+import argparse
+import glob
 import json
 import numpy as np
 import os
-import struct
 
-def create_model_json():
-    """Create model.json with correct architecture for 10 categories"""
-    
+from paths import LABELS_PATH, MODEL_DIR
+
+INPUT_SHAPE = (224, 224, 3)
+SHARD_SIZE = 4 * 1024 * 1024  # tfjs converter default (4MB)
+KERNEL_STDDEV = 0.1
+
+# One entry per layer after the input; the output layer gets one unit per category
+LAYER_SPEC = [
+    {'type': 'Conv2D', 'filters': 32, 'kernel_size': 3},
+    {'type': 'MaxPooling2D', 'pool_size': 2},
+    {'type': 'Conv2D', 'filters': 64, 'kernel_size': 3},
+    {'type': 'MaxPooling2D', 'pool_size': 2},
+    {'type': 'GlobalAveragePooling2D'},
+    {'type': 'Dense', 'units': 128, 'activation': 'relu'},
+    {'type': 'Dense', 'units': 'num_classes', 'activation': 'softmax', 'name': 'predictions'},
+]
+
+def build_layers(num_classes, layer_spec=LAYER_SPEC, input_shape=INPUT_SHAPE):
+    """
+    Expand the layer spec into Keras layer configs and weight entries
+
+    Args:
+        num_classes (int): Units of the output layer
+        layer_spec (list): Layer descriptions (see LAYER_SPEC)
+        input_shape (tuple): (height, width, channels)
+
+    Returns:
+        tuple: (list of layer configs, list of {'name', 'shape', 'dtype'} weight entries)
+    """
+
+    layers = [{
+        "class_name": "InputLayer",
+        "config": {
+            "batch_input_shape": [None, *input_shape],
+            "dtype": "float32",
+            "sparse": False,
+            "ragged": False,
+            "name": "input_1"
+        }
+    }]
+    weights = []
+    counters = {}
+    height, width, channels = input_shape
+    features = None
+
+    for spec in layer_spec:
+        layer_type = spec['type']
+        counters[layer_type] = counters.get(layer_type, 0) + 1
+        default_name = {
+            'Conv2D': 'conv2d',
+            'MaxPooling2D': 'max_pooling2d',
+            'GlobalAveragePooling2D': 'global_average_pooling2d',
+            'Dense': 'dense'
+        }[layer_type]
+        name = spec.get('name', f"{default_name}_{counters[layer_type]}")
+
+        if layer_type == 'Conv2D':
+            k = spec['kernel_size']
+            config = {
+                "name": name,
+                "trainable": True,
+                "filters": spec['filters'],
+                "kernel_size": [k, k],
+                "strides": [1, 1],
+                "padding": "valid",
+                "activation": spec.get('activation', 'relu'),
+                "use_bias": True
+            }
+            weights.append({"name": f"{name}/kernel", "shape": [k, k, channels, spec['filters']], "dtype": "float32"})
+            weights.append({"name": f"{name}/bias", "shape": [spec['filters']], "dtype": "float32"})
+            height, width, channels = height - k + 1, width - k + 1, spec['filters']
+        elif layer_type == 'MaxPooling2D':
+            p = spec['pool_size']
+            config = {"name": name, "pool_size": [p, p], "strides": [p, p]}
+            height, width = height // p, width // p
+        elif layer_type == 'GlobalAveragePooling2D':
+            config = {"name": name}
+            features = channels
+        elif layer_type == 'Dense':
+            units = num_classes if spec['units'] == 'num_classes' else spec['units']
+            config = {
+                "name": name,
+                "trainable": True,
+                "units": units,
+                "activation": spec.get('activation', 'linear'),
+                "use_bias": True
+            }
+            weights.append({"name": f"{name}/kernel", "shape": [features, units], "dtype": "float32"})
+            weights.append({"name": f"{name}/bias", "shape": [units], "dtype": "float32"})
+            features = units
+
+        layers.append({"class_name": layer_type, "config": config})
+
+    return layers, weights
+
+def shard_names(total_bytes, shard_size=SHARD_SIZE):
+    num_shards = max(1, -(-total_bytes // shard_size))
+    return [f"group1-shard{i + 1}of{num_shards}.bin" for i in range(num_shards)]
+
+def create_model_json(layers, weights, paths, input_shape=INPUT_SHAPE):
+    """Create the model.json content for the given layers, weight entries and shard files"""
+
     model_config = {
         "format": "layers-model",
         "generatedBy": "TensorFlow.js tfjs-layers v4.4.0",
@@ -24,230 +133,134 @@ def create_model_json():
                 "class_name": "Sequential",
                 "config": {
                     "name": "urban_classifier",
-                    "layers": [
-                        {
-                            "class_name": "InputLayer",
-                            "config": {
-                                "batch_input_shape": [None, 224, 224, 3],
-                                "dtype": "float32",
-                                "sparse": False,
-                                "ragged": False,
-                                "name": "input_1"
-                            }
-                        },
-                        {
-                            "class_name": "Conv2D",
-                            "config": {
-                                "name": "conv2d_1",
-                                "trainable": True,
-                                "filters": 32,
-                                "kernel_size": [3, 3],
-                                "strides": [1, 1],
-                                "padding": "valid",
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "MaxPooling2D",
-                            "config": {
-                                "name": "max_pooling2d_1",
-                                "pool_size": [2, 2],
-                                "strides": [2, 2]
-                            }
-                        },
-                        {
-                            "class_name": "Conv2D",
-                            "config": {
-                                "name": "conv2d_2",
-                                "trainable": True,
-                                "filters": 64,
-                                "kernel_size": [3, 3],
-                                "strides": [1, 1],
-                                "padding": "valid",
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "MaxPooling2D",
-                            "config": {
-                                "name": "max_pooling2d_2",
-                                "pool_size": [2, 2],
-                                "strides": [2, 2]
-                            }
-                        },
-                        {
-                            "class_name": "GlobalAveragePooling2D",
-                            "config": {
-                                "name": "global_average_pooling2d_1"
-                            }
-                        },
-                        {
-                            "class_name": "Dense",
-                            "config": {
-                                "name": "dense_1",
-                                "trainable": True,
-                                "units": 128,
-                                "activation": "relu",
-                                "use_bias": True
-                            }
-                        },
-                        {
-                            "class_name": "Dense",
-                            "config": {
-                                "name": "predictions",
-                                "trainable": True,
-                                "units": 10,
-                                "activation": "softmax",
-                                "use_bias": True
-                            }
-                        }
-                    ]
+                    "layers": layers
                 }
             }
         },
         "weightsManifest": [
             {
-                "paths": ["model.bin"],
-                "weights": [
-                    # Conv2D layer 1 weights (3x3x3x32 + 32 bias)
-                    {
-                        "name": "conv2d_1/kernel",
-                        "shape": [3, 3, 3, 32],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "conv2d_1/bias", 
-                        "shape": [32],
-                        "dtype": "float32"
-                    },
-                    # Conv2D layer 2 weights (3x3x32x64 + 64 bias)
-                    {
-                        "name": "conv2d_2/kernel",
-                        "shape": [3, 3, 32, 64],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "conv2d_2/bias",
-                        "shape": [64], 
-                        "dtype": "float32"
-                    },
-                    # Dense layer 1 weights (64x128 + 128 bias)
-                    {
-                        "name": "dense_1/kernel",
-                        "shape": [64, 128],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "dense_1/bias",
-                        "shape": [128],
-                        "dtype": "float32"
-                    },
-                    # Output layer weights (128x10 + 10 bias)
-                    {
-                        "name": "predictions/kernel",
-                        "shape": [128, 10],
-                        "dtype": "float32"
-                    },
-                    {
-                        "name": "predictions/bias",
-                        "shape": [10],
-                        "dtype": "float32"
-                    }
-                ]
+                "paths": paths,
+                "weights": weights
             }
-        ]
+        ],
+        "userDefinedMetadata": {
+            "inputResolution": list(input_shape[:2])
+        }
     }
-    
+
     return model_config
 
-def create_model_weights():
-    """Create model weights with proper dimensions"""
-    
-    # Calculate total number of parameters
-    weights_info = [
-        (3 * 3 * 3 * 32, "conv2d_1/kernel"),     # 864
-        (32, "conv2d_1/bias"),                    # 32
-        (3 * 3 * 32 * 64, "conv2d_2/kernel"),    # 18,432
-        (64, "conv2d_2/bias"),                    # 64
-        (64 * 128, "dense_1/kernel"),             # 8,192
-        (128, "dense_1/bias"),                    # 128
-        (128 * 10, "predictions/kernel"),         # 1,280
-        (10, "predictions/bias")                  # 10
-    ]
-    
-    # Generate random weights (small values for better stability)
-    weights_data = bytearray()
-    
-    for size, name in weights_info:
-        if "kernel" in name:
-            # Use Xavier initialization for kernels
-            if "conv2d" in name:
-                # For conv layers, use smaller values
-                weights = np.random.normal(0, 0.1, size).astype(np.float32)
-            else:
-                # For dense layers
-                weights = np.random.normal(0, 0.1, size).astype(np.float32)
+def create_model_weights(weights, seed=42):
+    """
+    Generate weights for the manifest entries into one float32 buffer
+
+    Kernels are drawn from N(0, 0.1) and biases start at zero. Each entry is
+    filled in place through a view of the buffer, in manifest order.
+
+    Returns:
+        np.ndarray: Flat float32 buffer holding all weights
+    """
+
+    sizes = [int(np.prod(w['shape'])) for w in weights]
+    buffer = np.empty(sum(sizes), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+
+    offset = 0
+    for entry, size in zip(weights, sizes):
+        view = buffer[offset:offset + size]
+        if entry['name'].endswith('/kernel'):
+            rng.standard_normal(out=view, dtype=np.float32)
+            view *= KERNEL_STDDEV
         else:
-            # Bias weights start at zero
-            weights = np.zeros(size, dtype=np.float32)
-        
-        # Convert to bytes and append
-        weights_bytes = weights.tobytes()
-        weights_data.extend(weights_bytes)
-        
-        print(f"Added {name}: {size} parameters ({len(weights_bytes)} bytes)")
-    
-    return bytes(weights_data)
+            view.fill(0)
+        offset += size
+
+        print(f"Added {entry['name']}: {size} parameters ({size * 4} bytes)")
+
+    return buffer
+
+def write_shards(buffer, model_dir, shard_size=SHARD_SIZE):
+    """
+    Write the buffer as group1-shardNofM.bin files
+
+    Shard files from an earlier run that are no longer referenced are removed.
+
+    Returns:
+        list: Shard file names in order
+    """
+
+    data = memoryview(buffer).cast('B')
+    names = shard_names(len(data), shard_size)
+    for i, name in enumerate(names):
+        with open(os.path.join(model_dir, name), 'wb') as f:
+            f.write(data[i * shard_size:(i + 1) * shard_size])
+
+    for stale in glob.glob(os.path.join(model_dir, 'group1-shard*of*.bin')):
+        if os.path.basename(stale) not in names:
+            os.remove(stale)
+
+    return names
 
 def main():
     """Create the TensorFlow.js model files"""
-    
+
+    parser = argparse.ArgumentParser(description='Create placeholder TensorFlow.js model files')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--output-dir', default=MODEL_DIR, help='Directory for model.json and shards')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the weights')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Bytes per weight shard')
+    parser.add_argument('--input-size', type=int, default=INPUT_SHAPE[0], help='Square input resolution')
+    args = parser.parse_args()
+
     print("Creating TensorFlow.js Urban Classification Model")
     print("=" * 50)
-    
-    model_dir = "../model"
-    
+
+    model_dir = args.output_dir
+    os.makedirs(model_dir, exist_ok=True)
+
+    with open(args.labels, 'r') as f:
+        categories = json.load(f)['aiCategories']
+    num_classes = len(categories)
+
+    input_shape = (args.input_size, args.input_size, INPUT_SHAPE[2])
+    layers, weights = build_layers(num_classes, input_shape=input_shape)
+
+    # Create weight shards
+    print(f"Creating weights (seed {args.seed})...")
+    buffer = create_model_weights(weights, seed=args.seed)
+    paths = write_shards(buffer, model_dir, args.shard_size)
+
+    print(f"✅ Model weights saved to {len(paths)} shard(s) in {model_dir}")
+    print(f"   Total size: {buffer.nbytes} bytes ({buffer.nbytes/1024:.1f} KB)")
+
     # Create model.json
     print("Creating model.json...")
-    model_config = create_model_json()
-    
+    model_config = create_model_json(layers, weights, paths, input_shape)
+
     model_json_path = os.path.join(model_dir, "model.json")
     with open(model_json_path, 'w') as f:
         json.dump(model_config, f, indent=2)
-    
+
     print(f"✅ Model architecture saved to {model_json_path}")
-    
-    # Create model.bin with proper weights
-    print("Creating model.bin with proper weights...")
-    weights_data = create_model_weights()
-    
-    model_bin_path = os.path.join(model_dir, "model.bin")
-    with open(model_bin_path, 'wb') as f:
-        f.write(weights_data)
-    
-    print(f"✅ Model weights saved to {model_bin_path}")
-    print(f"   Total size: {len(weights_data)} bytes ({len(weights_data)/1024:.1f} KB)")
-    
+
     # Validate the model files
-    print("\\nValidation:")
+    print("\nValidation:")
     print(f"✅ model.json exists: {os.path.exists(model_json_path)}")
-    print(f"✅ model.bin exists: {os.path.exists(model_bin_path)}")
-    print(f"✅ labels.json exists: {os.path.exists(os.path.join(model_dir, 'labels.json'))}")
-    
-    print("\\n" + "=" * 50)
+    print(f"✅ weight shards exist: {all(os.path.exists(os.path.join(model_dir, p)) for p in paths)}")
+    print(f"✅ labels.json exists: {os.path.exists(args.labels)}")
+
+    print("\n" + "=" * 50)
     print("✅ TensorFlow.js model created successfully!")
-    print("\\nModel details:")
-    print("- Architecture: CNN for 10-category classification")
-    print("- Input: 224x224x3 RGB images") 
-    print("- Output: 10 classes (pothole, garbage, streetlight, etc.)")
+    print("\nModel details:")
+    print(f"- Architecture: CNN for {num_classes}-category classification")
+    print(f"- Input: {input_shape[0]}x{input_shape[1]}x{input_shape[2]} RGB images")
+    print(f"- Output: {num_classes} classes ({', '.join(categories[:3])}, etc.)")
     print("- Format: TensorFlow.js layers model")
-    print("\\nNext steps:")
+    print("\nNext steps:")
     print("1. Start the backend server")
     print("2. Test the /api/classify endpoint")
     print("3. Check /api/health for model status")
-    
+
     return True
 
 if __name__ == "__main__":
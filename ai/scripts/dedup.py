@@ -0,0 +1,326 @@
+"""
+Near-Duplicate Detection
+
+Builds a perceptual-hash index (64-bit pHash and dHash) over a directory of
+images and groups near-duplicates into clusters. Citizen reports often show
+the same pothole photographed many times; keeping each cluster on one side
+of the train/validation split stops those copies from inflating validation
+accuracy.
+
+Hashes are computed for whole batches with NumPy (DCT as two matrix
+products), and lookups use multi-index hashing: each hash is split into
+16-bit chunks, so any two hashes within the Hamming threshold share at least
+one chunk within threshold // chunks bits. Only those candidates are compared,
+which avoids the O(n^2) all-pairs scan.
+
+Usage:
+    python dedup.py build ../data/raw
+    python dedup.py report --threshold 6 --output ../data/dedup_clusters.json
+    python preprocess.py split ../data/raw --dedup-clusters ../data/dedup_clusters.json
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+from paths import DATA_DIR
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+DEFAULT_INDEX_PATH = os.path.join(DATA_DIR, 'dedup_index.npz')
+DEFAULT_THRESHOLD = 6
+HASH_TYPES = ('phash', 'dhash')
+
+PHASH_SIZE = 32
+PHASH_LOW_FREQ = 8
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def load_thumbnails(path):
+    """Decode an image to the grayscale thumbnails used by pHash (32x32) and dHash (9x8)"""
+
+    try:
+        with Image.open(path) as img:
+            img.draft('L', (PHASH_SIZE * 2, PHASH_SIZE * 2))
+            gray = img.convert('L')
+            small = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR), dtype=np.float32)
+            tiny = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.float32)
+        return small, tiny
+    except Exception as e:
+        print(f"⚠️ Skipping unreadable image {path}: {e}")
+        return None
+
+
+def _pack_bits(bits):
+    """Pack an (N, 64) boolean array into N uint64 hashes"""
+
+    packed = np.packbits(bits.reshape(len(bits), 64), axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+
+def phash_batch(thumbs):
+    """pHash for a batch of (N, 32, 32) grayscale thumbnails"""
+
+    coeffs = np.einsum('kn,bnm,lm->bkl', _DCT, thumbs, _DCT, optimize=True)
+    low = coeffs[:, :PHASH_LOW_FREQ, :PHASH_LOW_FREQ].reshape(len(thumbs), -1)
+    median = np.median(low, axis=1, keepdims=True)
+    return _pack_bits(low > median)
+
+
+def dhash_batch(thumbs):
+    """dHash for a batch of (N, 8, 9) grayscale thumbnails"""
+
+    return _pack_bits(thumbs[:, :, 1:] > thumbs[:, :, :-1])
+
+
+def popcount64(values):
+    """Number of set bits in each element of a uint64 array"""
+
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT_TABLE[values.view(np.uint8).reshape(-1, 8)].sum(axis=1, dtype=np.int64)
+
+
+def hamming(a, b):
+    """Hamming distance between uint64 hashes (broadcasting)"""
+
+    return popcount64(np.bitwise_xor(a, b))
+
+
+class HashIndex:
+    """Multi-index hashing lookup over 64-bit hashes"""
+
+    def __init__(self, hashes, num_chunks=4):
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        self.num_chunks = num_chunks
+        self.chunk_bits = 64 // num_chunks
+        self._mask = np.uint64((1 << self.chunk_bits) - 1)
+        self._masks_by_radius = {}
+
+        self._order = []
+        self._sorted = []
+        for j in range(num_chunks):
+            chunk = self._chunk(self.hashes, j)
+            order = np.argsort(chunk, kind='stable')
+            self._order.append(order)
+            self._sorted.append(chunk[order])
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _chunk(self, values, j):
+        return (values >> np.uint64(j * self.chunk_bits)) & self._mask
+
+    def _flip_masks(self, radius):
+        """All chunk-sized masks with at most radius bits set"""
+
+        if radius not in self._masks_by_radius:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for bits in combinations(range(self.chunk_bits), r):
+                    masks.append(sum(1 << b for b in bits))
+            self._masks_by_radius[radius] = np.array(masks, dtype=np.uint64)
+        return self._masks_by_radius[radius]
+
+    def query(self, value, threshold):
+        """Return (ids, distances) of hashes within threshold bits of value"""
+
+        value = np.uint64(value)
+        flips = self._flip_masks(threshold // self.num_chunks)
+        candidates = []
+
+        for j in range(self.num_chunks):
+            variants = self._chunk(value, j) ^ flips
+            lo = np.searchsorted(self._sorted[j], variants, side='left')
+            hi = np.searchsorted(self._sorted[j], variants, side='right')
+            for start, end in zip(lo[hi > lo], hi[hi > lo]):
+                candidates.append(self._order[j][start:end])
+
+        if not candidates:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        ids = np.unique(np.concatenate(candidates))
+        distances = hamming(self.hashes[ids], value)
+        keep = distances <= threshold
+        return ids[keep], distances[keep]
+
+
+def scan_images(root_dir):
+    """Return {relative_path: (size, mtime_ns)} for every image under root_dir"""
+
+    files = {}
+    for dirpath, _, filenames in os.walk(root_dir):
+        for name in filenames:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                stat = os.stat(path)
+                rel = os.path.relpath(path, root_dir).replace(os.sep, '/')
+                files[rel] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def build_index(root_dir, index_path=DEFAULT_INDEX_PATH, workers=None, batch_size=1024):
+    """
+    Hash every image under root_dir and save the index to index_path
+
+    Hashes from an existing index are reused for files whose size and
+    modification time are unchanged.
+
+    Returns:
+        dict: Arrays 'paths', 'phash', 'dhash', 'size', 'mtime_ns'
+    """
+
+    files = scan_images(root_dir)
+    previous = {}
+    if os.path.exists(index_path):
+        old = load_index(index_path)
+        if old['root'] == os.path.abspath(root_dir):
+            for i, rel in enumerate(old['paths']):
+                previous[rel] = (int(old['size'][i]), int(old['mtime_ns'][i]),
+                                 old['phash'][i], old['dhash'][i])
+
+    paths = sorted(files)
+    reused = {rel for rel in paths if rel in previous and previous[rel][:2] == files[rel]}
+    pending = [rel for rel in paths if rel not in reused]
+    print(f"{root_dir}: {len(paths)} images, {len(reused)} cached, {len(pending)} to hash")
+
+    hashed = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            thumbs = list(executor.map(
+                load_thumbnails, [os.path.join(root_dir, rel) for rel in chunk], chunksize=16
+            ))
+            ok = [(rel, t) for rel, t in zip(chunk, thumbs) if t is not None]
+            if not ok:
+                continue
+            small = np.stack([t[0] for _, t in ok])
+            tiny = np.stack([t[1] for _, t in ok])
+            for (rel, _), p, d in zip(ok, phash_batch(small), dhash_batch(tiny)):
+                hashed[rel] = (p, d)
+
+    kept = [rel for rel in paths if rel in reused or rel in hashed]
+    index = {
+        'root': os.path.abspath(root_dir),
+        'paths': np.array(kept, dtype=str),
+        'phash': np.array([previous[r][2] if r in reused else hashed[r][0] for r in kept], dtype=np.uint64),
+        'dhash': np.array([previous[r][3] if r in reused else hashed[r][1] for r in kept], dtype=np.uint64),
+        'size': np.array([files[r][0] for r in kept], dtype=np.int64),
+        'mtime_ns': np.array([files[r][1] for r in kept], dtype=np.int64),
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    with open(index_path, 'wb') as f:
+        np.savez(f, **index)
+    print(f"✅ Index with {len(kept)} hashes saved to {index_path}")
+    return index
+
+
+def load_index(index_path):
+    with np.load(index_path) as data:
+        index = {key: data[key] for key in data.files}
+    index['root'] = str(index['root'])
+    index['paths'] = [str(p) for p in index['paths']]
+    return index
+
+
+def find_clusters(hashes, threshold=DEFAULT_THRESHOLD):
+    """
+    Group hashes into near-duplicate clusters (connected components of the
+    "within threshold bits" graph)
+
+    Returns:
+        list: Clusters of two or more indices, largest first
+    """
+
+    index = HashIndex(hashes)
+    parent = np.arange(len(hashes))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(hashes)):
+        ids, _ = index.query(hashes[i], threshold)
+        for j in ids[ids > i]:
+            ri, rj = find(i), find(int(j))
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(find(i), []).append(i)
+
+    clusters = [members for members in groups.values() if len(members) > 1]
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+def report(index_path=DEFAULT_INDEX_PATH, threshold=DEFAULT_THRESHOLD, hash_type='phash',
+           output=None, show=20):
+    """Print near-duplicate clusters and optionally write them as JSON"""
+
+    index = load_index(index_path)
+    paths = index['paths']
+    clusters = [[paths[i] for i in members] for members in find_clusters(index[hash_type], threshold)]
+
+    duplicates = sum(len(c) - 1 for c in clusters)
+    print(f"{len(paths)} images, {len(clusters)} near-duplicate clusters, "
+          f"{duplicates} redundant images ({hash_type}, threshold {threshold})")
+    for cluster in clusters[:show]:
+        print(f"  [{len(cluster)}] " + ', '.join(cluster[:5]) + (' ...' if len(cluster) > 5 else ''))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'root': index['root'],
+                'hash': hash_type,
+                'threshold': threshold,
+                'clusters': clusters
+            }, f, indent=2)
+        print(f"Clusters written to {output}")
+
+    return clusters
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Near-duplicate detection for training images')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Hash images and build the dedup index')
+    build_parser.add_argument('root', nargs='?', default=DATA_DIR, help='Directory to scan')
+    build_parser.add_argument('--index', default=DEFAULT_INDEX_PATH)
+    build_parser.add_argument('--workers', type=int)
+
+    report_parser = subparsers.add_parser('report', help='Report near-duplicate clusters')
+    report_parser.add_argument('--index', default=DEFAULT_INDEX_PATH)
+    report_parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD,
+                               help='Maximum Hamming distance between near-duplicates')
+    report_parser.add_argument('--hash', choices=HASH_TYPES, default='phash')
+    report_parser.add_argument('--output', help='Write clusters as JSON (for preprocess.py split)')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.root, args.index, workers=args.workers)
+    elif args.command == 'report':
+        report(args.index, threshold=args.threshold, hash_type=args.hash, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+Knowledge Distillation and Pruning
+
+Trains a compact student classifier against the softened outputs of the
+trained teacher (best_model.h5 from train.py). The student is a narrow
+Conv2D/MaxPooling2D stack with a GlobalAveragePooling2D head instead of the
+teacher's Flatten -> Dense(512), so it has a small fraction of the
+parameters and multiply-adds, and only uses layers the backend's
+TensorFlow.js loader (and tfjs_runtime.py) already supports.
+
+The distillation loss is
+    alpha * CE(labels, student) + (1 - alpha) * T^2 * KL(teacher_T || student_T)
+where *_T are the softmax outputs softened with temperature T. Both models
+end in softmax, so softened outputs are computed from log-probabilities
+(log softmax(z) differs from z only by a constant).
+
+Optional pruning, each followed by distillation fine-tuning:
+    --prune-channels R  removes the fraction R of filters / hidden units with
+                        the smallest L1 norm (a narrower, faster model)
+    --sparsity S        zeroes the fraction S of the smallest kernel weights
+                        (same speed, smaller after compression)
+
+A size / latency / accuracy report for the teacher and every student stage
+is printed and written to distill_report.json.
+
+Usage:
+    python distill.py --epochs 30
+    python distill.py --filters 16 32 64 64 --prune-channels 0.25 --sparsity 0.5
+    python convert.py --input ../model/student_model.h5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from paths import MODEL_DIR
+from train import (
+    BATCH_SIZE,
+    IMG_HEIGHT,
+    IMG_WIDTH,
+    NUM_CLASSES,
+    load_sources,
+    make_dataset,
+)
+
+STUDENT_FILTERS = (16, 32, 64, 64)
+DEFAULT_TEMPERATURE = 4.0
+DEFAULT_ALPHA = 0.1
+LATENCY_ITERATIONS = 50
+
+
+def create_student(filters=STUDENT_FILTERS, num_classes=NUM_CLASSES, input_shape=(IMG_HEIGHT, IMG_WIDTH, 3),
+                   dropout=0.2):
+    """
+    Compact CNN: one 3x3 Conv2D + 2x2 max pool per entry of filters, then
+    global average pooling and the softmax 'predictions' layer
+    """
+
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    model = tf.keras.Sequential(name='student')
+    model.add(layers.Input(shape=input_shape))
+    for i, width in enumerate(filters):
+        model.add(layers.Conv2D(width, (3, 3), activation='relu', name=f"conv2d_{i + 1}"))
+        model.add(layers.MaxPooling2D(2, 2, name=f"max_pooling2d_{i + 1}"))
+    model.add(layers.GlobalAveragePooling2D(name='global_average_pooling2d'))
+    model.add(layers.Dropout(dropout, name='dropout'))
+    model.add(layers.Dense(num_classes, activation='softmax', dtype='float32', name='predictions'))
+    return model
+
+
+def make_distiller(student, teacher, temperature=DEFAULT_TEMPERATURE, alpha=DEFAULT_ALPHA):
+    """
+    Wrap student and (frozen) teacher in a model whose fit() trains the
+    student with the distillation loss; evaluate() scores the student alone
+    """
+
+    import tensorflow as tf
+
+    class Distiller(tf.keras.Model):
+        def __init__(self):
+            super().__init__()
+            self.student = student
+            self.teacher = teacher
+            self.teacher.trainable = False
+            self.loss_tracker = tf.keras.metrics.Mean(name='loss')
+            self.accuracy = tf.keras.metrics.CategoricalAccuracy(name='accuracy')
+
+        @property
+        def metrics(self):
+            return [self.loss_tracker, self.accuracy]
+
+        def call(self, images, training=False):
+            return self.student(images, training=training)
+
+        def train_step(self, data):
+            images, labels = data
+            teacher_log_probs = tf.math.log(self.teacher(images, training=False) + 1e-7)
+            soft_targets = tf.nn.softmax(teacher_log_probs / temperature)
+
+            with tf.GradientTape() as tape:
+                probs = self.student(images, training=True)
+                log_probs = tf.math.log(probs + 1e-7)
+                hard = tf.keras.losses.categorical_crossentropy(labels, probs)
+                soft = tf.reduce_sum(
+                    soft_targets * (tf.math.log(soft_targets + 1e-7) - tf.nn.log_softmax(log_probs / temperature)),
+                    axis=-1
+                ) * temperature ** 2
+                loss = tf.reduce_mean(alpha * hard + (1 - alpha) * soft)
+
+            grads = tape.gradient(loss, self.student.trainable_variables)
+            self.optimizer.apply_gradients(zip(grads, self.student.trainable_variables))
+            self.loss_tracker.update_state(loss)
+            self.accuracy.update_state(labels, probs)
+            return {m.name: m.result() for m in self.metrics}
+
+        def test_step(self, data):
+            images, labels = data
+            probs = self.student(images, training=False)
+            self.loss_tracker.update_state(tf.keras.losses.categorical_crossentropy(labels, probs))
+            self.accuracy.update_state(labels, probs)
+            return {m.name: m.result() for m in self.metrics}
+
+    return Distiller()
+
+
+def distill(student, teacher, train_data, validation_data, epochs, output_path, learning_rate=1e-3,
+            temperature=DEFAULT_TEMPERATURE, alpha=DEFAULT_ALPHA, masks=None):
+    """
+    Train the student against the teacher, saving its best epoch (by
+    validation accuracy) to output_path
+
+    Args:
+        masks (dict): Layer name -> 0/1 kernel mask kept applied during training
+            (from magnitude_prune)
+
+    Returns:
+        keras.Model: The student with its best weights loaded
+    """
+
+    import tensorflow as tf
+
+    class SaveBestStudent(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.best = -1.0
+
+        def on_epoch_end(self, epoch, logs=None):
+            accuracy = (logs or {}).get('val_accuracy', -1.0)
+            if accuracy > self.best:
+                self.best = accuracy
+                student.save(output_path)
+                print(f"\nStudent val_accuracy improved to {accuracy:.4f}, saved to {output_path}")
+
+    class ApplyMasks(tf.keras.callbacks.Callback):
+        def on_train_batch_end(self, batch, logs=None):
+            apply_masks(student, masks)
+
+    distiller = make_distiller(student, teacher, temperature, alpha)
+    distiller.compile(optimizer=tf.keras.optimizers.Adam(learning_rate))
+
+    callbacks = [
+        SaveBestStudent(),
+        tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', mode='max', patience=10),
+        tf.keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=5, min_lr=1e-7)
+    ]
+    if masks:
+        apply_masks(student, masks)
+        callbacks.append(ApplyMasks())
+
+    distiller.fit(train_data, epochs=epochs, validation_data=validation_data, callbacks=callbacks)
+    return tf.keras.models.load_model(output_path, compile=False)
+
+
+def prune_channels(model, ratio):
+    """
+    Structured pruning: drop the fraction ratio of filters of every Conv2D and
+    of units of every hidden Dense layer, by smallest L1 weight norm
+
+    The following layer's input weights are sliced to match, including a
+    Dense after Flatten. The output layer keeps all its units.
+
+    Returns:
+        keras.Model: New, narrower Sequential model with the kept weights
+    """
+
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    config = model.get_config()
+    layer_configs = {entry['config']['name']: entry['config'] for entry in config['layers']}
+    new_weights = {}
+    keep = None  # channel indices kept by the previous weighted layer
+    spatial = 1  # positions per channel when the next Dense follows a Flatten
+
+    for index, layer in enumerate(model.layers):
+        if isinstance(layer, layers.Conv2D):
+            kernel, bias = layer.get_weights()
+            if keep is not None:
+                kernel = kernel[:, :, keep, :]
+            width = max(1, int(round(layer.filters * (1 - ratio))))
+            keep = np.sort(np.argsort(-np.abs(kernel).sum(axis=(0, 1, 2)))[:width])
+            new_weights[layer.name] = [kernel[..., keep], bias[keep]]
+            layer_configs[layer.name]['filters'] = width
+            spatial = 1
+        elif isinstance(layer, layers.Dense):
+            kernel, bias = layer.get_weights()
+            if keep is not None:
+                kernel = kernel.reshape(spatial, -1, kernel.shape[-1])[:, keep].reshape(-1, kernel.shape[-1])
+            if index == len(model.layers) - 1:
+                new_weights[layer.name] = [kernel, bias]
+                keep = None
+                continue
+            width = max(1, int(round(layer.units * (1 - ratio))))
+            keep = np.sort(np.argsort(-np.abs(kernel).sum(axis=0))[:width])
+            new_weights[layer.name] = [kernel[:, keep], bias[keep]]
+            layer_configs[layer.name]['units'] = width
+            spatial = 1
+        elif isinstance(layer, layers.Flatten):
+            spatial = int(np.prod(layer.input_shape[1:-1]))
+        elif not isinstance(layer, (layers.MaxPooling2D, layers.AveragePooling2D, layers.GlobalAveragePooling2D,
+                                    layers.Dropout, layers.InputLayer)):
+            raise ValueError(f"Channel pruning does not support {type(layer).__name__} ({layer.name})")
+
+    pruned = tf.keras.Sequential.from_config(config)
+    for layer in pruned.layers:
+        if layer.name in new_weights:
+            layer.set_weights(new_weights[layer.name])
+    return pruned
+
+
+def magnitude_prune(model, sparsity):
+    """
+    Zero the fraction sparsity of smallest-magnitude weights in every Conv2D
+    and Dense kernel (per layer)
+
+    Returns:
+        dict: Layer name -> 0/1 mask, to keep the zeros during fine-tuning
+    """
+
+    from tensorflow.keras import layers
+
+    masks = {}
+    for layer in model.layers:
+        if isinstance(layer, (layers.Conv2D, layers.Dense)):
+            kernel = layer.get_weights()[0]
+            threshold = np.quantile(np.abs(kernel), sparsity)
+            masks[layer.name] = (np.abs(kernel) > threshold).astype(kernel.dtype)
+    apply_masks(model, masks)
+    return masks
+
+
+def apply_masks(model, masks):
+    for name, mask in masks.items():
+        kernel = model.get_layer(name).kernel
+        kernel.assign(kernel * mask)
+
+
+def measure_latency(model, iterations=LATENCY_ITERATIONS):
+    """Median single-image CPU latency in milliseconds"""
+
+    import tensorflow as tf
+
+    @tf.function
+    def forward(images):
+        return model(images, training=False)
+
+    x = tf.constant(np.random.default_rng(0).random((1,) + tuple(model.input_shape[1:]), dtype=np.float32))
+    for _ in range(5):
+        forward(x)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        forward(x).numpy()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def model_report(name, model, validation_data, path=None):
+    """Parameters, file size (raw and gzipped), latency and validation accuracy"""
+
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix='urbanpulse_distill_'), f"{name}.h5")
+        model.save(path)
+    with open(path, 'rb') as f:
+        gzip_bytes = len(gzip.compress(f.read()))
+
+    model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+    _, accuracy = model.evaluate(validation_data, verbose=0)
+    weights = model.get_weights()
+    return {
+        'model': name,
+        'path': path,
+        'params': int(model.count_params()),
+        'nonzero_params': int(sum(np.count_nonzero(w) for w in weights)),
+        'file_bytes': os.path.getsize(path),
+        'gzip_bytes': gzip_bytes,
+        'latency_ms': measure_latency(model),
+        'val_accuracy': float(accuracy)
+    }
+
+
+def print_report(rows):
+    teacher = rows[0]
+    print(f"{'Model':<18}{'Params':>11}{'Nonzero':>11}{'Size KB':>10}{'Gzip KB':>10}"
+          f"{'Latency ms':>12}{'Speedup':>9}{'Val acc':>9}")
+    for r in rows:
+        print(f"{r['model']:<18}{r['params']:>11,}{r['nonzero_params']:>11,}{r['file_bytes'] / 1024:>10.0f}"
+              f"{r['gzip_bytes'] / 1024:>10.0f}{r['latency_ms']:>12.2f}"
+              f"{teacher['latency_ms'] / r['latency_ms']:>8.1f}x{r['val_accuracy']:>9.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Distill the trained classifier into a compact student model')
+    parser.add_argument('--teacher', default=os.path.join(MODEL_DIR, 'best_model.h5'), help='Trained teacher model')
+    parser.add_argument('--student', help='Start from an existing student model instead of a new one')
+    parser.add_argument('--filters', nargs='+', type=int, default=list(STUDENT_FILTERS),
+                        help='Conv2D widths of a new student')
+    parser.add_argument('--output', default=os.path.join(MODEL_DIR, 'student_model.h5'), help='Student output path')
+    parser.add_argument('--epochs', type=int, default=30, help='Distillation epochs (0 to skip)')
+    parser.add_argument('--temperature', type=float, default=DEFAULT_TEMPERATURE)
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='Weight of the hard-label loss')
+    parser.add_argument('--prune-channels', type=float, metavar='RATIO',
+                        help='Remove this fraction of filters/units by L1 norm, then fine-tune')
+    parser.add_argument('--sparsity', type=float, help='Zero this fraction of kernel weights, then fine-tune')
+    parser.add_argument('--fine-tune-epochs', type=int, default=10, help='Epochs after each pruning step')
+    parser.add_argument('--packed-dir', help='Read pre-decoded shards written by pack_dataset.py')
+    parser.add_argument('--split-manifest', help='Read file lists from a preprocess.py split manifest')
+    parser.add_argument('--report', default=os.path.join(MODEL_DIR, 'distill_report.json'))
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.teacher):
+        print(f"Error: Teacher model not found: {args.teacher}. Train one with train.py first")
+        return
+
+    import tensorflow as tf
+
+    train_source, val_source = load_sources(args.packed_dir, args.split_manifest)
+    train_data = make_dataset(train_source, BATCH_SIZE, training=True)
+    validation_data = make_dataset(val_source, BATCH_SIZE, cache='')
+
+    print(f"Loading teacher from: {args.teacher}")
+    teacher = tf.keras.models.load_model(args.teacher, compile=False)
+    rows = [model_report('teacher', teacher, validation_data, args.teacher)]
+
+    if args.student:
+        student = tf.keras.models.load_model(args.student, compile=False)
+    else:
+        student = create_student(args.filters)
+    student.summary()
+
+    if args.epochs:
+        print(f"Distilling for {args.epochs} epochs (T={args.temperature}, alpha={args.alpha})...")
+        student = distill(student, teacher, train_data, validation_data, args.epochs, args.output,
+                          temperature=args.temperature, alpha=args.alpha)
+    rows.append(model_report('student', student, validation_data))
+
+    if args.prune_channels:
+        print(f"Pruning {args.prune_channels:.0%} of channels...")
+        student = prune_channels(student, args.prune_channels)
+        student.summary()
+        student = distill(student, teacher, train_data, validation_data, args.fine_tune_epochs, args.output,
+                          learning_rate=1e-4, temperature=args.temperature, alpha=args.alpha)
+        rows.append(model_report('channel-pruned', student, validation_data))
+
+    if args.sparsity:
+        print(f"Pruning {args.sparsity:.0%} of weights by magnitude...")
+        masks = magnitude_prune(student, args.sparsity)
+        student = distill(student, teacher, train_data, validation_data, args.fine_tune_epochs, args.output,
+                          learning_rate=1e-4, temperature=args.temperature, alpha=args.alpha, masks=masks)
+        rows.append(model_report('sparse', student, validation_data))
+
+    student.save(args.output)
+    rows[-1]['path'] = args.output
+
+    print()
+    print_report(rows)
+    with open(args.report, 'w') as f:
+        json.dump({'teacher': args.teacher, 'temperature': args.temperature, 'alpha': args.alpha,
+                   'filters': [layer.filters for layer in student.layers if hasattr(layer, 'filters')],
+                   'results': rows}, f, indent=2)
+    print(f"\n✅ Student saved to {args.output}; report written to {args.report}")
+    print(f"Next: python convert.py --input {args.output} to deploy it with the backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,40 @@ Download Sample Images Script
 
 This script downloads sample images from the internet for each category 
 to populate the training folders. Uses free image sources.
+
+URLs come from a manifest (JSON lines or CSV with url, category and optional
+split/filename columns), falling back to the built-in sample_urls. Downloads
+run concurrently over a pooled session with a per-host connection limit,
+retry transient failures with backoff, resume interrupted files and skip
+images whose content was already downloaded under another URL. Rerunning the
+script only fetches what is missing.
+
+With --resize, originals are kept under ../data/originals/ and the training
+and validation folders get compact copies at that resolution.
+
+Usage:
+    python download_samples.py --manifest ../data/urls.jsonl --workers 32 --per-host 8
+    python download_samples.py --manifest ../data/urls.jsonl --resize 256
 """
 
+import argparse
+import csv
+import hashlib
 import os
+import random
 import requests
+import requests.adapters
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse
 import time
 
+from paths import DATA_DIR, LABELS_PATH
+from preprocess import INGEST_INDEX_NAME, file_sha256, ingest_images, split_bucket
+
 # Load categories from labels.json
-with open('../model/labels.json', 'r') as f:
+with open(LABELS_PATH, 'r') as f:
     labels_config = json.load(f)
 
 categories = labels_config['aiCategories']
@@ -72,96 +96,267 @@ sample_urls = {
     ]
 }
 
-def download_image(url, filepath):
-    """Download an image from URL to filepath"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers, timeout=30, stream=True)
-        response.raise_for_status()
-        
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        print(f"✅ Downloaded: {os.path.basename(filepath)}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Failed to download {url}: {str(e)}")
-        return False
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
 
-def download_samples_for_category(category, urls, training_folder, validation_folder):
-    """Download sample images for a specific category"""
-    print(f"\n📁 Processing category: {category}")
-    
-    downloaded = 0
-    
-    for i, url in enumerate(urls):
-        # Split between training (80%) and validation (20%)
-        if i < len(urls) * 0.8:
-            folder = training_folder
-            split = "training"
-        else:
-            folder = validation_folder
-            split = "validation"
-        
-        # Create filename
-        filename = f"{category}_{i+1}.jpg"
-        filepath = os.path.join(folder, filename)
-        
-        # Skip if file already exists
+# Status codes worth retrying (rate limiting and transient server errors)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+HASH_INDEX_NAME = '.download_hashes.json'
+
+
+def load_manifest(path):
+    """
+    Load a URL manifest
+
+    Supported formats:
+        .jsonl - one object per line: {"url": ..., "category": ..., "split": ..., "filename": ...}
+        .csv   - header row with url,category and optional split,filename columns
+
+    Returns:
+        list: Entries with 'url' and 'category' (split and filename optional)
+    """
+    entries = []
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                entries.append({k: v for k, v in row.items() if v})
+    else:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    entries.append(json.loads(line))
+
+    for entry in entries:
+        if 'url' not in entry or 'category' not in entry:
+            raise ValueError(f"Manifest entry missing url/category: {entry}")
+    return entries
+
+
+def manifest_from_samples():
+    """Manifest entries for the built-in sample_urls (80% training, 20% validation)"""
+    entries = []
+    for category, urls in sample_urls.items():
+        for i, url in enumerate(urls):
+            entries.append({
+                'url': url,
+                'category': category,
+                'split': 'training' if i < len(urls) * 0.8 else 'validation',
+                'filename': f"{category}_{i+1}.jpg"
+            })
+    return entries
+
+
+def entry_destination(entry, training_base, validation_base):
+    """Resolve the target path of a manifest entry"""
+    split = entry.get('split')
+    if split is None:
+        # Stable 80/20 assignment from the URL, independent of manifest order
+        digest = hashlib.sha256(entry['url'].encode()).hexdigest()
+        split = 'training' if split_bucket(digest, seed=0) < 0.8 else 'validation'
+
+    filename = entry.get('filename')
+    if not filename:
+        ext = os.path.splitext(urlparse(entry['url']).path)[1].lower()
+        if ext not in ('.jpg', '.jpeg', '.png', '.webp', '.gif'):
+            ext = '.jpg'
+        filename = f"{entry['category']}_{hashlib.sha1(entry['url'].encode()).hexdigest()[:12]}{ext}"
+
+    base = training_base if split == 'training' else validation_base
+    return os.path.join(base, entry['category'], filename)
+
+
+class Downloader:
+    """
+    Concurrent image downloader
+
+    Uses one pooled requests.Session shared by all worker threads, limits
+    concurrent requests per host, retries transient failures with exponential
+    backoff, resumes partial '.part' files with HTTP Range requests and skips
+    images whose content hash was already downloaded.
+    """
+
+    def __init__(self, workers=16, per_host=4, retries=3, backoff=1.0, timeout=30, hash_index_path=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_limits = {}
+        self._lock = threading.Lock()
+
+        self.hash_index_path = hash_index_path
+        # sha256 -> saved path, and URL -> saved path for URLs that turned out to be duplicates
+        self.hashes = {}
+        self.duplicates = {}
+        if hash_index_path and os.path.exists(hash_index_path):
+            with open(hash_index_path, 'r') as f:
+                index = json.load(f)
+            self.hashes = index.get('hashes', {})
+            self.duplicates = index.get('duplicates', {})
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_limits[host]
+
+    def _fetch_to(self, url, part_path):
+        """Download url into part_path, resuming from its current size"""
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+        with self._host_semaphore(url):
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            try:
+                if response.status_code == 416:
+                    # Range not satisfiable: the part file is already complete
+                    return
+                response.raise_for_status()
+                # A 200 to a Range request means the server ignored it: start over
+                mode = 'ab' if offset and response.status_code == 206 else 'wb'
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=65536):
+                        if chunk:
+                            f.write(chunk)
+            finally:
+                response.close()
+
+    def download(self, url, filepath):
+        """
+        Download one image
+
+        Returns:
+            str: 'downloaded', 'skipped', 'duplicate' or 'failed'
+        """
         if os.path.exists(filepath):
-            print(f"⏭️ Skipped (exists): {filename}")
-            continue
-        
-        # Download image
-        if download_image(url, filepath):
-            downloaded += 1
-            
-        # Be nice to servers
-        time.sleep(1)
-    
-    print(f"📊 Downloaded {downloaded} new images for {category}")
-    return downloaded
+            return 'skipped'
+        if os.path.exists(self.duplicates.get(url, '')):
+            return 'duplicate'
+
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        part_path = filepath + '.part'
+
+        for attempt in range(self.retries + 1):
+            try:
+                self._fetch_to(url, part_path)
+                break
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status not in RETRY_STATUS or attempt == self.retries:
+                    print(f"❌ Failed to download {url}: {e}")
+                    return 'failed'
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    print(f"❌ Failed to download {url}: {e}")
+                    return 'failed'
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+        digest = file_sha256(part_path)
+        with self._lock:
+            existing = self.hashes.get(digest)
+            if existing and existing != filepath and os.path.exists(existing):
+                os.remove(part_path)
+                self.duplicates[url] = existing
+                print(f"⏭️ Duplicate of {os.path.basename(existing)}: {os.path.basename(filepath)}")
+                return 'duplicate'
+            self.hashes[digest] = filepath
+
+        os.replace(part_path, filepath)
+        print(f"✅ Downloaded: {os.path.basename(filepath)}")
+        return 'downloaded'
+
+    def save_hash_index(self):
+        if self.hash_index_path:
+            with open(self.hash_index_path, 'w') as f:
+                json.dump({'hashes': self.hashes, 'duplicates': self.duplicates}, f)
+
+    def download_all(self, jobs):
+        """
+        Download (url, filepath) jobs concurrently
+
+        Returns:
+            dict: Count of each download status
+        """
+        counts = {'downloaded': 0, 'skipped': 0, 'duplicate': 0, 'failed': 0}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for status in executor.map(lambda job: self.download(*job), jobs):
+                    counts[status] += 1
+        finally:
+            self.save_hash_index()
+        return counts
+
 
 def main():
+    parser = argparse.ArgumentParser(description='Download training images into ../data')
+    parser.add_argument('--manifest', help='URL manifest (.jsonl or .csv); defaults to the built-in samples')
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent downloads')
+    parser.add_argument('--per-host', type=int, default=4, help='Concurrent connections per host')
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--resize', type=int, metavar='SIZE',
+                        help='Keep originals in <data-dir>/originals and store compact copies with this shorter side')
+
+    args = parser.parse_args()
+
     print("🎯 Sample Image Downloader for UrbanPulse AI Training")
     print("=" * 60)
     
-    base_dir = os.path.join('..', 'data')
+    base_dir = args.data_dir
     training_base = os.path.join(base_dir, 'training')
     validation_base = os.path.join(base_dir, 'validation')
-    
-    total_downloaded = 0
-    
-    for category in categories:
-        if category not in sample_urls:
-            print(f"⚠️ No sample URLs defined for category: {category}")
-            continue
-        
-        training_folder = os.path.join(training_base, category)
-        validation_folder = os.path.join(validation_base, category)
-        
-        # Ensure folders exist
-        os.makedirs(training_folder, exist_ok=True)
-        os.makedirs(validation_folder, exist_ok=True)
-        
-        # Download samples
-        downloaded = download_samples_for_category(
-            category, 
-            sample_urls[category], 
-            training_folder, 
-            validation_folder
+
+    entries = load_manifest(args.manifest) if args.manifest else manifest_from_samples()
+    unknown = sorted({e['category'] for e in entries} - set(categories))
+    if unknown:
+        print(f"⚠️ Skipping entries for unknown categories: {', '.join(unknown)}")
+    entries = [e for e in entries if e['category'] in categories]
+
+    originals_base = os.path.join(base_dir, 'originals')
+    jobs = {}
+    for entry in entries:
+        if args.resize:
+            path = entry_destination(entry, os.path.join(originals_base, 'training'),
+                                     os.path.join(originals_base, 'validation'))
+        else:
+            path = entry_destination(entry, training_base, validation_base)
+        jobs.setdefault(path, entry['url'])
+    print(f"{len(jobs)} images in manifest")
+
+    os.makedirs(base_dir, exist_ok=True)
+    downloader = Downloader(
+        workers=args.workers,
+        per_host=args.per_host,
+        retries=args.retries,
+        timeout=args.timeout,
+        hash_index_path=os.path.join(base_dir, HASH_INDEX_NAME)
+    )
+    start = time.perf_counter()
+    counts = downloader.download_all([(url, path) for path, url in jobs.items()])
+
+    if args.resize:
+        ingest_images(
+            [(path, os.path.join(base_dir, os.path.relpath(path, originals_base)))
+             for path in jobs if os.path.exists(path)],
+            os.path.join(base_dir, INGEST_INDEX_NAME), size=args.resize
         )
-        
-        total_downloaded += downloaded
+    elapsed = time.perf_counter() - start
     
     print("\n" + "=" * 60)
-    print(f"🎉 Download completed! Total new images: {total_downloaded}")
+    print(f"🎉 Download completed! Total new images: {counts['downloaded']} "
+          f"({counts['skipped']} already present, {counts['duplicate']} duplicates, "
+          f"{counts['failed']} failed) in {elapsed:.1f}s")
     print("\n📋 Summary:")
     
     # Count existing images
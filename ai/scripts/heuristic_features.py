@@ -0,0 +1,377 @@
+"""
+Heuristic Tensor-Feature Classifier
+
+NumPy port of the backend's fallback classifier
+(aiClassificationService.classifyWithTensorFlowFeatures). The same feature
+set as extractTensorFeatures() and calculateDarkPixelRatio() is computed for
+a whole batch of images in one vectorized pass, and the same
+calculateCategoryConfidence() rules turn it into per-category confidences.
+Results match the JS service to within float32 rounding, so the fallback
+path can be scored offline over large backlogs and its features analysed.
+
+Images are prepared like tfLoader.createTensorFromImageBuffer(): resized
+to cover 224x224 (centre crop), alpha dropped, scaled to [0, 1].
+
+Usage:
+    python heuristic_features.py ../data/validation --output heuristic_predictions.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from pack_dataset import IMAGE_EXTENSIONS
+from paths import LABELS_PATH
+
+IMAGE_SIZE = 224
+DARK_THRESHOLD = 0.3
+COLOR_NAMES = ('red', 'green', 'blue')
+SURFACE_TYPES = ('asphalt', 'concrete', 'rough_surface', 'unknown')
+
+# calculateCategoryConfidence(): per category, (condition, amount) pairs that
+# add evidence and (condition, amount) pairs that subtract without counting
+CONFIDENCE_RULES = {
+    'pothole': {
+        'evidence': [
+            (lambda f: f['brightness'] < 0.4, 0.25),
+            (lambda f: f['darkPixelRatio'] > 0.3, 0.30),
+            (lambda f: f['grayscaleTendency'] > 0.6, 0.20),
+            (lambda f: f['surfaceType'] == 'asphalt', 0.25),
+            (lambda f: f['contrast'] > 0.35, 0.15),
+            (lambda f: f['textureComplexity'] > 0.08, 0.10),
+        ],
+        'penalties': [
+            (lambda f: f['brightness'] > 0.7, 0.20),
+            (lambda f: f['colorUniformity'] < 0.3, 0.15),
+        ],
+    },
+    'road_damage': {
+        'evidence': [
+            (lambda f: f['brightness'] < 0.6, 0.20),
+            (lambda f: f['grayscaleTendency'] > 0.5, 0.20),
+            (lambda f: f['contrast'] > 0.3, 0.25),
+            (lambda f: f['textureComplexity'] > 0.05, 0.15),
+            (lambda f: (f['surfaceType'] == 'asphalt') | (f['surfaceType'] == 'concrete'), 0.20),
+        ],
+    },
+    'garbage': {
+        'evidence': [
+            (lambda f: f['textureComplexity'] > 0.15, 0.30),
+            (lambda f: f['variance'] > 0.02, 0.25),
+            (lambda f: f['colorUniformity'] < 0.4, 0.20),
+            (lambda f: f['grayscaleTendency'] < 0.5, 0.15),
+            (lambda f: f['gradientMagnitude'] > 1.0, 0.15),
+        ],
+    },
+    'streetlight': {
+        'evidence': [
+            (lambda f: f['brightness'] > 0.7, 0.35),
+            (lambda f: f['contrast'] > 0.6, 0.25),
+            (lambda f: (f['dominantColor'] == 'red') | (f['red'] > 0.5), 0.15),
+        ],
+        'penalties': [
+            (lambda f: f['brightness'] < 0.3, 0.30),
+        ],
+    },
+    'construction': {
+        'evidence': [
+            (lambda f: f['red'] > 0.45, 0.30),
+            (lambda f: f['textureComplexity'] > 0.10, 0.20),
+            (lambda f: (f['brightness'] > 0.4) & (f['brightness'] < 0.8), 0.15),
+            (lambda f: f['colorUniformity'] < 0.5, 0.20),
+        ],
+    },
+    'vandalism': {
+        'evidence': [
+            (lambda f: f['colorUniformity'] < 0.3, 0.30),
+            (lambda f: f['contrast'] > 0.5, 0.25),
+            (lambda f: f['grayscaleTendency'] < 0.4, 0.20),
+            (lambda f: f['textureComplexity'] > 0.12, 0.15),
+        ],
+    },
+    'sidewalk_damage': {
+        'evidence': [
+            (lambda f: f['surfaceType'] == 'concrete', 0.25),
+            (lambda f: (f['brightness'] > 0.3) & (f['brightness'] < 0.7), 0.20),
+            (lambda f: f['grayscaleTendency'] > 0.6, 0.20),
+            (lambda f: f['textureComplexity'] > 0.06, 0.15),
+        ],
+    },
+    'water_leak': {
+        'evidence': [
+            (lambda f: f['darkPixelRatio'] > 0.25, 0.25),
+            (lambda f: f['brightness'] < 0.5, 0.20),
+            (lambda f: f['blue'] > f['red'], 0.20),
+            (lambda f: f['textureComplexity'] < 0.08, 0.15),
+        ],
+    },
+    'traffic_sign': {
+        'evidence': [
+            (lambda f: f['brightness'] > 0.5, 0.25),
+            (lambda f: (f['red'] > 0.4) | (f['dominantColor'] == 'red'), 0.30),
+            (lambda f: f['contrast'] > 0.5, 0.20),
+            (lambda f: f['colorUniformity'] > 0.5, 0.15),
+        ],
+    },
+}
+
+# Categories without rules ('other') get this confidence
+DEFAULT_CONFIDENCE = 0.20
+
+
+def load_image(path, size=IMAGE_SIZE):
+    """Decode an image like createTensorFromImageBuffer: cover-resize, centre crop, RGB in [0, 1]"""
+
+    with Image.open(path) as img:
+        img.draft('RGB', (size, size))
+        img = ImageOps.fit(img.convert('RGB'), (size, size), Image.LANCZOS, centering=(0.5, 0.5))
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+
+def load_batch(paths, size=IMAGE_SIZE, executor=None):
+    """
+    Decode paths into one (N, size, size, 3) float32 batch
+
+    Returns:
+        tuple: (images, paths that decoded successfully)
+    """
+
+    def load(path):
+        try:
+            return load_image(path, size)
+        except Exception as e:
+            print(f"⚠️ Skipping unreadable image {path}: {e}")
+            return None
+
+    images = list(executor.map(load, paths)) if executor else [load(p) for p in paths]
+    ok = [i for i, image in enumerate(images) if image is not None]
+    if not ok:
+        return np.empty((0, size, size, 3), dtype=np.float32), []
+    return np.stack([images[i] for i in ok]), [paths[i] for i in ok]
+
+
+def extract_features(images):
+    """
+    Features of extractTensorFeatures() for a batch of [0, 1] RGB images
+
+    Args:
+        images (np.ndarray): (N, H, W, 3) float array
+
+    Returns:
+        dict: Feature name -> (N,) array; names follow the JS result, with
+            the colorDistribution fields flattened (red, green, blue,
+            redVariance, ..., dominantColor, colorBalance)
+    """
+
+    images = np.asarray(images, dtype=np.float32)
+    n = len(images)
+    flat = images.reshape(n, -1)
+
+    brightness = flat.mean(axis=1, dtype=np.float64)
+    variance = flat.var(axis=1, dtype=np.float64)
+    contrast = flat.max(axis=1).astype(np.float64) - flat.min(axis=1)
+    # tf.norm of the whole tensor
+    gradient_magnitude = np.sqrt(np.einsum('ij,ij->i', flat, flat, dtype=np.float64))
+    dark_pixel_ratio = (flat < DARK_THRESHOLD).mean(axis=1)
+
+    channel_means = images.mean(axis=(1, 2), dtype=np.float64)
+    channel_vars = images.var(axis=(1, 2), dtype=np.float64)
+    red, green, blue = channel_means.T
+
+    spread = np.abs(red - green) + np.abs(green - blue) + np.abs(blue - red)
+    color_uniformity = 1 - spread
+    grayscale_tendency = 1 - spread / 3
+    texture_complexity = np.sqrt(variance)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        color_balance = channel_means.min(axis=1) / channel_means.max(axis=1)
+
+    # classifySurfaceType(): first matching rule wins
+    surface_type = np.select(
+        [
+            (grayscale_tendency > 0.8) & (brightness < 0.6) & (contrast > 0.3),
+            (brightness > 0.7) & (grayscale_tendency > 0.7),
+            texture_complexity > 0.15,
+        ],
+        SURFACE_TYPES[:3],
+        default=SURFACE_TYPES[3]
+    )
+
+    return {
+        'brightness': brightness,
+        'variance': variance,
+        'contrast': contrast,
+        'textureComplexity': texture_complexity,
+        'gradientMagnitude': gradient_magnitude,
+        'darkPixelRatio': dark_pixel_ratio,
+        'colorUniformity': color_uniformity,
+        'grayscaleTendency': grayscale_tendency,
+        'red': red,
+        'green': green,
+        'blue': blue,
+        'redVariance': channel_vars[:, 0],
+        'greenVariance': channel_vars[:, 1],
+        'blueVariance': channel_vars[:, 2],
+        'dominantColor': np.array(COLOR_NAMES)[np.argmax(channel_means, axis=1)],
+        'colorBalance': color_balance,
+        'complexity': variance * contrast,
+        'surfaceType': surface_type,
+    }
+
+
+def category_confidences(features, categories):
+    """
+    calculateCategoryConfidence() for every image and category
+
+    Returns:
+        np.ndarray: (N, len(categories)) confidences in [0.05, 0.95]
+    """
+
+    n = len(features['brightness'])
+    confidences = np.empty((n, len(categories)))
+
+    for j, category in enumerate(categories):
+        rules = CONFIDENCE_RULES.get(category)
+        if rules is None:
+            confidence = np.full(n, DEFAULT_CONFIDENCE)
+            evidence = np.ones(n, dtype=np.int64)
+        else:
+            confidence = np.full(n, 0.05)
+            evidence = np.zeros(n, dtype=np.int64)
+            for condition, amount in rules['evidence']:
+                hit = np.asarray(condition(features))
+                confidence = confidence + np.where(hit, amount, 0.0)
+                evidence += hit
+            for condition, amount in rules.get('penalties', []):
+                confidence = confidence - np.where(condition(features), amount, 0.0)
+
+        # Evidence strength bonus / penalty
+        confidence = confidence * np.select(
+            [evidence >= 3, evidence >= 2, evidence == 0], [1.3, 1.1, 0.5], default=1.0
+        )
+        confidences[:, j] = np.clip(confidence, 0.05, 0.95)
+
+    return confidences
+
+
+def feature_record(features, i):
+    """Features of image i in the nested shape returned by extractTensorFeatures()"""
+
+    def value(name):
+        v = features[name][i]
+        return str(v) if isinstance(v, np.str_) else float(v)
+
+    record = {name: value(name) for name in (
+        'brightness', 'variance', 'contrast', 'textureComplexity', 'gradientMagnitude',
+        'darkPixelRatio', 'colorUniformity', 'grayscaleTendency'
+    )}
+    record['colorDistribution'] = {name: value(name) for name in (
+        'red', 'green', 'blue', 'redVariance', 'greenVariance', 'blueVariance',
+        'dominantColor', 'colorBalance'
+    )}
+    record['complexity'] = value('complexity')
+    record['surfaceType'] = value('surfaceType')
+    return record
+
+
+def classify_batch(images, labels_config, include_features=True):
+    """
+    Classify a batch the way classifyWithTensorFlowFeatures() does
+
+    Returns:
+        list: One classification dict per image (category, backendCategory,
+            confidence, allPredictions, threshold, source and optionally features)
+    """
+
+    categories = labels_config['aiCategories']
+    mapping = labels_config['categoryMapping']
+    threshold = labels_config['confidenceThreshold']
+
+    features = extract_features(images)
+    confidences = category_confidences(features, categories)
+
+    results = []
+    for i, row in enumerate(confidences):
+        predictions = [
+            {'category': c, 'confidence': round(float(conf), 4), 'backendCategory': mapping.get(c)}
+            for c, conf in zip(categories, row)
+        ]
+        # Stable sort, like Array.prototype.sort in the service
+        predictions.sort(key=lambda p: p['confidence'], reverse=True)
+        top = predictions[0]
+        category = top['category'] if top['confidence'] >= threshold else labels_config['defaultCategory']
+
+        result = {
+            'category': category,
+            'backendCategory': mapping.get(category),
+            'confidence': top['confidence'],
+            'allPredictions': predictions,
+            'threshold': threshold,
+            'source': 'tensorflow_tensors'
+        }
+        if include_features:
+            result['features'] = feature_record(features, i)
+        results.append(result)
+    return results
+
+
+def collect_images(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                paths.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+        elif item.lower().endswith('.txt'):
+            with open(item, 'r') as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        else:
+            paths.append(item)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score images with the backend heuristic classifier')
+    parser.add_argument('inputs', nargs='+', help='Image files, directories or .txt path lists')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--output', default='heuristic_predictions.jsonl', help='JSONL output file')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=8, help='Image decode threads')
+    parser.add_argument('--no-features', action='store_true', help='Omit the feature values from the output')
+
+    args = parser.parse_args()
+
+    with open(args.labels, 'r') as f:
+        labels_config = json.load(f)
+
+    paths = collect_images(args.inputs)
+    print(f"Scoring {len(paths)} images...")
+
+    written = 0
+    counts = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor, open(args.output, 'w') as out:
+        for offset in range(0, len(paths), args.batch_size):
+            images, ok_paths = load_batch(paths[offset:offset + args.batch_size], executor=executor)
+            if not ok_paths:
+                continue
+            for path, result in zip(ok_paths, classify_batch(images, labels_config, not args.no_features)):
+                out.write(json.dumps({'path': path, **result}) + '\n')
+                counts[result['category']] = counts.get(result['category'], 0) + 1
+            written += len(ok_paths)
+            elapsed = time.perf_counter() - start
+            print(f"\r{written}/{len(paths)} images ({written / elapsed:.1f} images/sec)", end='')
+    print()
+
+    print(f"✅ Wrote {written} results to {args.output}")
+    for category, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"   {category:<15}: {count}")
+
+
+if __name__ == "__main__":
+    main()
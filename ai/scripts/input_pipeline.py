@@ -0,0 +1,289 @@
+"""
+tf.data Input Pipeline
+
+Builds parallel, prefetching input pipelines for the urban infrastructure
+classifier. Replaces the single-threaded Keras ImageDataGenerator: files are
+decoded and resized in parallel map calls, augmentations are applied to whole
+batches at once, and validation batches can be cached after the first epoch.
+"""
+
+import math
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+# Augmentation ranges (same meaning as the ImageDataGenerator arguments)
+AUGMENTATION = {
+    'rotation_range': 20,         # degrees
+    'width_shift_range': 0.2,     # fraction of width
+    'height_shift_range': 0.2,    # fraction of height
+    'shear_range': 0.2,           # degrees
+    'zoom_range': 0.2,            # zoom in [1 - z, 1 + z]
+    'horizontal_flip': True,
+}
+
+
+def list_image_files(directory, class_names):
+    """
+    List image files under directory/<class>/ for every class
+
+    Class indices follow the order of class_names (labels.json), not the
+    alphabetical order of the directories on disk.
+
+    Args:
+        directory (str): Split directory (e.g. ../data/training)
+        class_names (list): Ordered category names
+
+    Returns:
+        tuple: (list of file paths, list of integer labels)
+    """
+
+    paths = []
+    labels = []
+
+    for index, class_name in enumerate(class_names):
+        class_dir = os.path.join(directory, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+
+        with os.scandir(class_dir) as entries:
+            files = sorted(
+                entry.path for entry in entries
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+
+        paths.extend(files)
+        labels.extend([index] * len(files))
+
+    return paths, labels
+
+
+def decode_image(path, img_height, img_width):
+    """Read, decode and resize a single image to float32 in [0, 1]"""
+
+    data = tf.io.read_file(path)
+    image = tf.io.decode_image(data, channels=3, expand_animations=False)
+    image = tf.image.resize(image, (img_height, img_width))
+    image.set_shape((img_height, img_width, 3))
+    return image / 255.0
+
+
+def _random_transforms(batch_size, img_height, img_width, augmentation):
+    """
+    Build one projective transform per image combining rotation, shear,
+    zoom and shift around the image centre.
+
+    The matrices map output pixel coordinates to input coordinates, as
+    expected by ImageProjectiveTransformV3.
+    """
+
+    def uniform(limit):
+        return tf.random.uniform((batch_size,), -limit, limit)
+
+    theta = uniform(augmentation['rotation_range'] * math.pi / 180.0)
+    shear = uniform(augmentation['shear_range'] * math.pi / 180.0)
+    zoom = augmentation['zoom_range']
+    zx = tf.random.uniform((batch_size,), 1.0 - zoom, 1.0 + zoom)
+    zy = tf.random.uniform((batch_size,), 1.0 - zoom, 1.0 + zoom)
+    tx = uniform(augmentation['width_shift_range'] * img_width)
+    ty = uniform(augmentation['height_shift_range'] * img_height)
+
+    cos_t, sin_t = tf.cos(theta), tf.sin(theta)
+
+    # Linear part: rotation @ shear @ zoom
+    a0 = cos_t * zx
+    a1 = (-cos_t * tf.sin(shear) - sin_t * tf.cos(shear)) * zy
+    b0 = sin_t * zx
+    b1 = (-sin_t * tf.sin(shear) + cos_t * tf.cos(shear)) * zy
+
+    # Keep the transform centred on the image, then apply the shift
+    cx = (img_width - 1) / 2.0
+    cy = (img_height - 1) / 2.0
+    a2 = cx - a0 * cx - a1 * cy + tx
+    b2 = cy - b0 * cx - b1 * cy + ty
+
+    zeros = tf.zeros((batch_size,))
+    return tf.stack([a0, a1, a2, b0, b1, b2, zeros, zeros], axis=1)
+
+
+def augment_batch(images, img_height, img_width, augmentation=None):
+    """Apply random affine augmentation and horizontal flips to a batch"""
+
+    augmentation = augmentation or AUGMENTATION
+    batch_size = tf.shape(images)[0]
+
+    transforms = _random_transforms(batch_size, img_height, img_width, augmentation)
+    images = tf.raw_ops.ImageProjectiveTransformV3(
+        images=images,
+        transforms=transforms,
+        output_shape=tf.constant([img_height, img_width], dtype=tf.int32),
+        fill_value=0.0,
+        interpolation='BILINEAR',
+        fill_mode='NEAREST'
+    )
+
+    if augmentation.get('horizontal_flip'):
+        flip = tf.random.uniform((batch_size, 1, 1, 1)) < 0.5
+        images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+
+    return images
+
+
+def build_dataset(paths, labels, num_classes, img_height, img_width, batch_size,
+                  training=False, cache=None, seed=None, augmentation=None, shard=None):
+    """
+    Build a batched tf.data pipeline from file paths and integer labels
+
+    Args:
+        paths (list): Image file paths
+        labels (list): Integer class indices
+        num_classes (int): Number of categories for one-hot labels
+        img_height (int): Target image height
+        img_width (int): Target image width
+        batch_size (int): Batch size
+        training (bool): Shuffle and augment when True
+        cache (str): None to disable caching, '' for in-memory caching,
+            or a file path prefix for on-disk caching of decoded batches
+        seed (int): Shuffle seed
+        augmentation (dict): Augmentation ranges (defaults to AUGMENTATION)
+        shard (tuple): (num_shards, index) to read only this worker's files
+
+    Returns:
+        tf.data.Dataset: Dataset yielding (images, one_hot_labels) batches
+    """
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+
+    if shard:
+        # Shard file paths before decoding so each worker only decodes its own files
+        dataset = dataset.shard(*shard)
+
+    if training:
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda path, label: (
+            decode_image(path, img_height, img_width),
+            tf.one_hot(label, num_classes)
+        ),
+        num_parallel_calls=AUTOTUNE,
+        deterministic=not training
+    )
+    dataset = dataset.batch(batch_size)
+
+    if cache is not None:
+        dataset = dataset.cache(cache)
+
+    if training:
+        dataset = dataset.map(
+            lambda images, labels: (
+                augment_batch(images, img_height, img_width, augmentation),
+                labels
+            ),
+            num_parallel_calls=AUTOTUNE
+        )
+
+    options = tf.data.Options()
+    options.experimental_optimization.map_parallelization = True
+    dataset = dataset.with_options(options)
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def build_packed_dataset(packed, num_classes, batch_size, training=False,
+                         seed=None, augmentation=None, shard=None):
+    """
+    Build a batched tf.data pipeline over a packed split (see pack_dataset.py)
+
+    Images are gathered from the memory-mapped uint8 shards, so nothing is
+    decoded during training.
+
+    Args:
+        packed (PackedSplit): Packed split to read from
+        num_classes (int): Number of categories for one-hot labels
+        batch_size (int): Batch size
+        training (bool): Shuffle and augment when True
+        seed (int): Shuffle seed
+        augmentation (dict): Augmentation ranges (defaults to AUGMENTATION)
+        shard (tuple): (num_shards, index) to read only this worker's samples
+
+    Returns:
+        tf.data.Dataset: Dataset yielding (images, one_hot_labels) batches
+    """
+
+    img_height, img_width, channels = packed.image_shape
+
+    def gather(indices):
+        images, labels = packed.gather(indices)
+        return images, labels.astype(np.int32)
+
+    def load_batch(indices):
+        images, labels = tf.numpy_function(gather, [indices], (tf.uint8, tf.int32))
+        images.set_shape((None, img_height, img_width, channels))
+        labels.set_shape((None,))
+        return tf.cast(images, tf.float32) / 255.0, tf.one_hot(labels, num_classes)
+
+    dataset = tf.data.Dataset.range(len(packed))
+
+    if shard:
+        dataset = dataset.shard(*shard)
+
+    if training:
+        dataset = dataset.shuffle(len(packed), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(load_batch, num_parallel_calls=AUTOTUNE, deterministic=not training)
+
+    if training:
+        dataset = dataset.map(
+            lambda images, labels: (
+                augment_batch(images, img_height, img_width, augmentation),
+                labels
+            ),
+            num_parallel_calls=AUTOTUNE
+        )
+
+    return dataset.prefetch(AUTOTUNE)
+
+
+def benchmark_dataset(dataset, steps=100, warmup=5):
+    """
+    Iterate over a dataset without training to measure input throughput
+
+    Args:
+        dataset (tf.data.Dataset): Batched dataset yielding (images, labels)
+        steps (int): Number of batches to time
+        warmup (int): Batches to skip before timing (fills prefetch buffers)
+
+    Returns:
+        dict: Batches, images and images/sec over the timed steps
+    """
+
+    iterator = iter(dataset)
+    for _ in range(warmup):
+        if next(iterator, None) is None:
+            break
+
+    images = 0
+    batches = 0
+    start = time.perf_counter()
+    for images_batch, _ in iterator:
+        images += int(images_batch.shape[0])
+        batches += 1
+        if batches >= steps:
+            break
+    elapsed = time.perf_counter() - start
+
+    return {
+        'batches': batches,
+        'images': images,
+        'seconds': elapsed,
+        'images_per_sec': images / elapsed if elapsed > 0 else 0.0
+    }
+
@@ -0,0 +1,328 @@
+"""
+Packed Dataset Shards
+
+Decodes the images under ai/data/<split>/<class>/ once and stores them as
+fixed-shape uint8 arrays in .npy shards, plus a JSON manifest holding the
+label index. Training then streams pixels straight from np.memmap views
+instead of re-decoding JPEGs every epoch.
+
+Packing is incremental: files already present in the manifest with the same
+size and modification time are not decoded again. New files go into new
+shards; changed or deleted files are dropped from the index (run with
+--rebuild to reclaim their space).
+
+Layout:
+    data/packed/<split>/manifest.json
+    data/packed/<split>/shard-00000.npy   # uint8 [N, H, W, 3]
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from paths import DATA_DIR, LABELS_PATH
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+MANIFEST_NAME = 'manifest.json'
+# Version 2: images resized like tf.image.resize (see resize_bilinear) instead of PIL
+MANIFEST_VERSION = 2
+DEFAULT_IMAGE_SIZE = 224
+DEFAULT_SHARD_SIZE = 4096
+
+
+def _bilinear_axis(out_size, in_size):
+    # Half-pixel centres, clamped to the edge pixels like TensorFlow's resize kernel
+    x = np.clip((np.arange(out_size) + 0.5) * in_size / out_size - 0.5, 0, in_size - 1)
+    lower = np.floor(x).astype(np.intp)
+    upper = np.minimum(lower + 1, in_size - 1)
+    return lower, upper, (x - lower).astype(np.float32)
+
+
+def resize_bilinear(image, img_height, img_width):
+    """
+    Resize a uint8 (H, W, C) array like tf.image.resize(method='bilinear')
+
+    No antialiasing, so packed shards and served images get the same pixels
+    as input_pipeline.decode_image (up to rounding to uint8). PIL's BILINEAR
+    filter antialiases when downscaling and would not.
+    """
+
+    y0, y1, fy = _bilinear_axis(img_height, image.shape[0])
+    x0, x1, fx = _bilinear_axis(img_width, image.shape[1])
+    fx = fx[None, :, None]
+    # Gather the needed rows and columns before converting, not the full image
+    top, bottom = image[y0], image[y1]
+    top = top[:, x0].astype(np.float32) * (1 - fx) + top[:, x1].astype(np.float32) * fx
+    bottom = bottom[:, x0].astype(np.float32) * (1 - fx) + bottom[:, x1].astype(np.float32) * fx
+    fy = fy[:, None, None]
+    resized = top * (1 - fy) + bottom * fy
+    return np.clip(np.round(resized), 0, 255).astype(np.uint8)
+
+
+def load_image_array(path, img_height, img_width):
+    """Decode an image to a uint8 RGB array of shape (img_height, img_width, 3)"""
+
+    with Image.open(path) as img:
+        image = np.asarray(img.convert('RGB'), dtype=np.uint8)
+    return resize_bilinear(image, img_height, img_width)
+
+
+def _decode_job(job):
+    path, img_height, img_width = job
+    try:
+        return load_image_array(path, img_height, img_width)
+    except Exception as e:
+        print(f"⚠️ Skipping unreadable image {path}: {e}")
+        return None
+
+
+def scan_split(split_dir, class_names):
+    """
+    Return {relative_path: (label, size, mtime_ns)} for every image in a split
+
+    Labels follow the order of class_names.
+    """
+
+    files = {}
+    for label, class_name in enumerate(class_names):
+        class_dir = os.path.join(split_dir, class_name)
+        if not os.path.isdir(class_dir):
+            continue
+        with os.scandir(class_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    stat = entry.stat()
+                    rel = f"{class_name}/{entry.name}"
+                    files[rel] = (label, stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def read_manifest(packed_dir):
+    path = os.path.join(packed_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(packed_dir, manifest):
+    path = os.path.join(packed_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def pack_split(split_dir, packed_dir, class_names, img_height=DEFAULT_IMAGE_SIZE,
+               img_width=DEFAULT_IMAGE_SIZE, shard_size=DEFAULT_SHARD_SIZE,
+               workers=None, rebuild=False):
+    """
+    Pack one split directory into uint8 shards, decoding only new images
+
+    Args:
+        split_dir (str): Source split directory (e.g. ../data/training)
+        packed_dir (str): Output directory for shards and manifest
+        class_names (list): Ordered category names from labels.json
+        img_height (int): Stored image height
+        img_width (int): Stored image width
+        shard_size (int): Maximum images per shard file
+        workers (int): Decode processes (defaults to os.cpu_count())
+        rebuild (bool): Discard existing shards and pack everything again
+
+    Returns:
+        dict: The updated manifest
+    """
+
+    os.makedirs(packed_dir, exist_ok=True)
+    manifest = None if rebuild else read_manifest(packed_dir)
+
+    if manifest is not None:
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Packed data in {packed_dir} was written by an older pack_dataset.py "
+                             f"with a different resize; re-run with --rebuild")
+        if (manifest['class_names'] != list(class_names)
+                or manifest['image_shape'] != [img_height, img_width, 3]):
+            raise ValueError(
+                f"Packed data in {packed_dir} was built for different classes or "
+                f"image shape; re-run with --rebuild"
+            )
+    else:
+        for name in os.listdir(packed_dir):
+            if name.startswith('shard-') and name.endswith('.npy'):
+                os.remove(os.path.join(packed_dir, name))
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'class_names': list(class_names),
+            'image_shape': [img_height, img_width, 3],
+            'shards': [],
+            'records': {}
+        }
+
+    current = scan_split(split_dir, class_names)
+    records = manifest['records']
+
+    # Drop records whose source was deleted or modified since the last pack
+    stale = [
+        rel for rel, rec in records.items()
+        if rel not in current or (rec['size'], rec['mtime_ns']) != current[rel][1:]
+    ]
+    for rel in stale:
+        del records[rel]
+
+    new_files = sorted(rel for rel in current if rel not in records)
+    print(f"{split_dir}: {len(records)} packed, {len(new_files)} new, {len(stale)} stale")
+
+    for start in range(0, len(new_files), shard_size):
+        chunk = new_files[start:start + shard_size]
+        jobs = [(os.path.join(split_dir, rel), img_height, img_width) for rel in chunk]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            arrays = list(executor.map(_decode_job, jobs, chunksize=16))
+
+        decoded = [(rel, arr) for rel, arr in zip(chunk, arrays) if arr is not None]
+        if not decoded:
+            continue
+
+        shard_index = len(manifest['shards'])
+        shard_name = f"shard-{shard_index:05d}.npy"
+        shard_path = os.path.join(packed_dir, shard_name)
+
+        shard = np.lib.format.open_memmap(
+            shard_path + '.tmp', mode='w+', dtype=np.uint8,
+            shape=(len(decoded), img_height, img_width, 3)
+        )
+        for offset, (rel, arr) in enumerate(decoded):
+            shard[offset] = arr
+            label, size, mtime_ns = current[rel]
+            records[rel] = {
+                'shard': shard_index,
+                'offset': offset,
+                'label': label,
+                'size': size,
+                'mtime_ns': mtime_ns
+            }
+        shard.flush()
+        del shard
+        os.replace(shard_path + '.tmp', shard_path)
+
+        manifest['shards'].append({'file': shard_name, 'count': len(decoded)})
+        write_manifest(packed_dir, manifest)
+        print(f"  wrote {shard_name} ({len(decoded)} images)")
+
+    write_manifest(packed_dir, manifest)
+    return manifest
+
+
+class PackedSplit:
+    """
+    Read-only view of a packed split backed by np.memmap shards
+
+    Pixels are never copied until a batch is gathered; contiguous reads
+    return views into the mapped files.
+    """
+
+    def __init__(self, packed_dir):
+        manifest = read_manifest(packed_dir)
+        if manifest is None:
+            raise FileNotFoundError(f"No {MANIFEST_NAME} in {packed_dir}; run pack_dataset.py first")
+
+        self.packed_dir = packed_dir
+        self.class_names = manifest['class_names']
+        self.image_shape = tuple(manifest['image_shape'])
+        self.shards = [
+            np.load(os.path.join(packed_dir, shard['file']), mmap_mode='r')
+            for shard in manifest['shards']
+        ]
+
+        # Label index sorted by (shard, offset) so sequential reads stay sequential
+        entries = sorted(
+            (rec['shard'], rec['offset'], rec['label'])
+            for rec in manifest['records'].values()
+        )
+        index = np.array(entries, dtype=np.int64).reshape(-1, 3)
+        self.shard_ids = index[:, 0]
+        self.offsets = index[:, 1]
+        self.labels = index[:, 2]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def gather(self, indices):
+        """Return (uint8 images, labels) for an array of sample indices"""
+
+        indices = np.asarray(indices)
+        images = np.empty((len(indices),) + self.image_shape, dtype=np.uint8)
+        shard_ids = self.shard_ids[indices]
+        offsets = self.offsets[indices]
+
+        for shard_id in np.unique(shard_ids):
+            mask = shard_ids == shard_id
+            images[mask] = self.shards[shard_id][offsets[mask]]
+
+        return images, self.labels[indices]
+
+    def batches(self, batch_size, shuffle=False, seed=None):
+        """Yield (uint8 images, labels) batches; unshuffled runs yield memmap views"""
+
+        if shuffle:
+            order = np.random.default_rng(seed).permutation(len(self))
+            for start in range(0, len(order), batch_size):
+                yield self.gather(order[start:start + batch_size])
+            return
+
+        start = 0
+        while start < len(self):
+            shard_id = self.shard_ids[start]
+            end = min(start + batch_size, len(self))
+            # Stop at the shard boundary so the slice stays a zero-copy view
+            same_shard = self.shard_ids[start:end] == shard_id
+            if not same_shard.all():
+                end = start + int(np.argmin(same_shard))
+            first = self.offsets[start]
+            if np.all(np.diff(self.offsets[start:end]) == 1):
+                yield self.shards[shard_id][first:first + (end - start)], self.labels[start:end]
+            else:
+                yield self.gather(np.arange(start, end))
+            start = end
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack image folders into memory-mapped shards')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directory containing the split folders')
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, 'packed'), help='Output directory for packed splits')
+    parser.add_argument('--splits', nargs='+', default=['training', 'validation'], help='Splits to pack')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--size', type=int, default=DEFAULT_IMAGE_SIZE, help='Stored image height/width')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Images per shard')
+    parser.add_argument('--workers', type=int, help='Decode processes (default: all cores)')
+    parser.add_argument('--rebuild', action='store_true', help='Discard existing shards and repack')
+
+    args = parser.parse_args()
+
+    with open(args.labels, 'r') as f:
+        class_names = json.load(f)['aiCategories']
+
+    for split in args.splits:
+        split_dir = os.path.join(args.data_dir, split)
+        if not os.path.isdir(split_dir):
+            print(f"⚠️ Split directory not found: {split_dir}")
+            continue
+        manifest = pack_split(
+            split_dir,
+            os.path.join(args.output, split),
+            class_names,
+            img_height=args.size,
+            img_width=args.size,
+            shard_size=args.shard_size,
+            workers=args.workers,
+            rebuild=args.rebuild
+        )
+        print(f"✅ {split}: {len(manifest['records'])} images in {len(manifest['shards'])} shards")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+Package Paths
+
+Locations of the model and data directories, resolved from this file rather
+than the current working directory, so every script and the `python -m
+scripts` entry point work no matter where they are started from.
+"""
+
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+AI_DIR = os.path.dirname(SCRIPTS_DIR)
+MODEL_DIR = os.path.join(AI_DIR, 'model')
+DATA_DIR = os.path.join(AI_DIR, 'data')
+BENCHMARKS_DIR = os.path.join(AI_DIR, 'benchmarks')
+LABELS_PATH = os.path.join(MODEL_DIR, 'labels.json')
@@ -0,0 +1,180 @@
+"""
+Batch Offline Inference
+
+Classifies whole directories (or file lists) of images with the trained Keras
+model and writes one JSON line per image. Images are decoded and resized by
+a parallel, prefetching tf.data pipeline and scored in batches, so large
+backlogs of historical reports can be back-classified in one pass.
+
+Each result carries the same fields the backend derives from labels.json:
+the top AI category, its confidence, the mapped backend category and whether
+the confidence met confidenceThreshold (below it the default category is
+used, as in aiClassificationService.js).
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from pack_dataset import IMAGE_EXTENSIONS
+from paths import LABELS_PATH, MODEL_DIR
+
+DEFAULT_MODELS = [os.path.join(MODEL_DIR, 'final_model.h5'), os.path.join(MODEL_DIR, 'best_model.h5')]
+
+
+def find_default_model():
+    for path in DEFAULT_MODELS:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def collect_inputs(inputs):
+    """
+    Expand inputs into a list of image paths
+
+    Each input may be an image file, a directory (searched recursively) or a
+    .txt file listing one image path per line.
+    """
+
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                paths.extend(
+                    os.path.join(dirpath, f) for f in sorted(filenames)
+                    if f.lower().endswith(IMAGE_EXTENSIONS)
+                )
+        elif item.lower().endswith('.txt'):
+            with open(item, 'r') as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        else:
+            paths.append(item)
+    return paths
+
+
+def read_done_paths(output_path):
+    """Paths already present in an existing JSONL output (for --resume)"""
+
+    done = set()
+    if os.path.exists(output_path):
+        with open(output_path, 'r') as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['path'])
+                except (ValueError, KeyError):
+                    continue
+    return done
+
+
+def build_predict_dataset(paths, img_height, img_width, batch_size):
+    """Parallel decode pipeline yielding (paths, images) batches; unreadable files are dropped"""
+
+    import tensorflow as tf
+    from input_pipeline import AUTOTUNE, decode_image
+
+    dataset = tf.data.Dataset.from_tensor_slices(paths)
+    dataset = dataset.map(
+        lambda path: (path, decode_image(path, img_height, img_width)),
+        num_parallel_calls=AUTOTUNE
+    )
+    dataset = dataset.apply(tf.data.experimental.ignore_errors())
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def format_result(path, probabilities, labels_config):
+    """Build one result record from a probability vector"""
+
+    categories = labels_config['aiCategories']
+    mapping = labels_config['categoryMapping']
+    threshold = labels_config['confidenceThreshold']
+
+    top = int(np.argmax(probabilities))
+    predicted = categories[top]
+    confidence = float(probabilities[top])
+    meets_threshold = confidence >= threshold
+    category = predicted if meets_threshold else labels_config['defaultCategory']
+
+    return {
+        'path': path,
+        'category': category,
+        'predictedCategory': predicted,
+        'confidence': round(confidence, 6),
+        'backendCategory': mapping.get(category),
+        'meetsThreshold': meets_threshold
+    }
+
+
+def predict(model, paths, labels_config, output_path, batch_size=64, append=False):
+    """
+    Score paths with model and write JSONL results to output_path
+
+    Returns:
+        int: Number of images classified
+    """
+
+    _, img_height, img_width, _ = model.input_shape
+    dataset = build_predict_dataset(paths, img_height, img_width, batch_size)
+
+    written = 0
+    start = time.perf_counter()
+    with open(output_path, 'a' if append else 'w') as out:
+        for batch_paths, images in dataset:
+            probabilities = model.predict_on_batch(images)
+            for path, probs in zip(batch_paths.numpy(), np.asarray(probabilities)):
+                record = format_result(path.decode('utf-8'), probs, labels_config)
+                out.write(json.dumps(record) + '\n')
+            written += len(probabilities)
+            elapsed = time.perf_counter() - start
+            print(f"\r{written}/{len(paths)} images ({written / elapsed:.1f} images/sec)", end='')
+    print()
+
+    skipped = len(paths) - written
+    if skipped:
+        print(f"⚠️ Skipped {skipped} unreadable images")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Classify directories of images in batches')
+    parser.add_argument('inputs', nargs='+', help='Image files, directories or .txt path lists')
+    parser.add_argument('--model', help='Keras model (.h5 or SavedModel); defaults to final_model.h5/best_model.h5')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--output', default='predictions.jsonl', help='JSONL output file')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--resume', action='store_true', help='Skip images already in the output file')
+
+    args = parser.parse_args()
+
+    model_path = args.model or find_default_model()
+    if not model_path or not os.path.exists(model_path):
+        print("Error: No trained model found. Train one with train.py or pass --model")
+        return
+
+    with open(args.labels, 'r') as f:
+        labels_config = json.load(f)
+
+    paths = collect_inputs(args.inputs)
+    if args.resume:
+        done = read_done_paths(args.output)
+        paths = [p for p in paths if p not in done]
+        print(f"Resuming: {len(done)} already classified")
+
+    if not paths:
+        print("Nothing to classify")
+        return
+
+    print(f"Loading model from: {model_path}")
+    import tensorflow as tf
+    model = tf.keras.models.load_model(model_path, compile=False)
+
+    print(f"Classifying {len(paths)} images (batch size {args.batch_size})...")
+    written = predict(model, paths, labels_config, args.output, args.batch_size, append=args.resume)
+    print(f"✅ Wrote {written} results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
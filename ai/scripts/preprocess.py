@@ -4,59 +4,543 @@ Data preprocessing utilities for the UrbanPulse AI system.
 Provides helpers to split datasets, balance classes, and visualize samples.
 """
 
+import hashlib
+import json
 import os
 import shutil
-import random
-from typing import List, Tuple
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from PIL import Image
 
+from paths import DATA_DIR
+
 
 def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
-def split_dataset(source_dir: str, train_dir: str, val_dir: str, split: float = 0.8, seed: int = 42):
-    random.seed(seed)
-    classes = [d for d in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, d))]
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp')
+
+SPLIT_MODES = ('copy', 'hardlink', 'symlink', 'reflink', 'manifest')
+SPLIT_MANIFEST_VERSION = 1
+
+_FICLONE = 0x40049409  # Linux ioctl: share extents between two files
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def split_bucket(digest: str, seed: int) -> float:
+    """Map a content hash to a stable value in [0, 1) for the given seed."""
+    salted = hashlib.sha256(f"{seed}:{digest}".encode()).digest()
+    return int.from_bytes(salted[:8], 'big') / 2 ** 64
+
+
+def _reflink(src: str, dst: str):
+    import fcntl
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            # Filesystem without reflink support: fall back to a plain copy
+            shutil.copyfileobj(fsrc, fdst)
+
+
+def _is_placed(src: str, dst: str, mode: str) -> bool:
+    """True if dst already holds src the way mode would place it."""
+    if os.path.islink(dst):
+        return mode == 'symlink' and os.readlink(dst) == os.path.abspath(src)
+    if mode == 'symlink' or not os.path.exists(dst):
+        return False
+    if mode == 'hardlink' and os.path.samefile(src, dst):
+        return True
+    # Copies (including hardlink fallbacks): unchanged size and not older than the source
+    src_stat, dst_stat = os.stat(src), os.stat(dst)
+    return src_stat.st_size == dst_stat.st_size and dst_stat.st_mtime_ns >= src_stat.st_mtime_ns
+
+
+def place_file(src: str, dst: str, mode: str):
+    if mode == 'manifest' or _is_placed(src, dst, mode):
+        return
+    if os.path.lexists(dst):
+        # Outdated copy, or a link to other content
+        os.remove(dst)
+    if mode == 'copy':
+        shutil.copy2(src, dst)
+    elif mode == 'hardlink':
+        try:
+            os.link(src, dst)
+        except OSError:
+            # Cross-device or unsupported: copy instead
+            shutil.copy2(src, dst)
+    elif mode == 'symlink':
+        os.symlink(os.path.abspath(src), dst)
+    elif mode == 'reflink':
+        _reflink(src, dst)
+    else:
+        raise ValueError(f"Unknown split mode: {mode} (expected one of {SPLIT_MODES})")
+
+
+def _remove_unassigned(class_dir: str, keep: set) -> int:
+    """Delete files in a split class directory that are no longer assigned to it."""
+    removed = 0
+    with os.scandir(class_dir) as entries:
+        for e in entries:
+            if (e.is_file() or e.is_symlink()) and e.name not in keep:
+                os.remove(e.path)
+                removed += 1
+    return removed
+
+
+def split_dataset(source_dir: str, train_dir: str, val_dir: str, split: float = 0.8, seed: int = 42,
+                  mode: str = 'copy', workers: Optional[int] = None,
+                  manifest_path: Optional[str] = None,
+                  clusters: Optional[List[List[str]]] = None,
+                  clusters_root: Optional[str] = None,
+                  resize: Optional[int] = None) -> Dict:
+    """
+    Split source_dir/<class>/ images into train and validation sets.
+
+    Each file is assigned by hashing its contents, so the split is stable:
+    adding new images never moves existing ones between train and val.
+    Hashing and placing run in a thread pool across all classes and files.
+    Existing split directories are reconciled: files no longer assigned to a
+    side (after changing split or seed, or deleting a source) are removed,
+    and outdated copies or links are replaced. With mode='hardlink', 'symlink' or 'reflink' no bytes are copied, and
+    'manifest' only writes the JSON split manifest that train.py can consume.
+
+    clusters lists groups of near-duplicate files (paths relative to
+    clusters_root, the 'root' written by dedup.py report, or "<class>/<name>"
+    paths when clusters_root is None); every member of a cluster lands on the
+    same side. A cluster follows its members already split in the previous
+    manifest at manifest_path (same split and seed), so adding a near-duplicate
+    does not move them; a new cluster goes where the smallest content hash in
+    it falls. Members still move when a cluster joins files that were split
+    apart before (e.g. the first split with clusters). Members outside
+    source_dir are ignored, and a ValueError is raised if no member matches a
+    file being split.
+
+    With resize set (mode must be 'copy'), train_dir and val_dir receive compact
+    copies whose shorter side is resize pixels instead of the originals (see ingest_images);
+    the ingest index next to train_dir points each copy back to its source,
+    and the manifest's per-subset 'roots' point at the compact copies.
+    """
+    if mode not in SPLIT_MODES:
+        raise ValueError(f"Unknown split mode: {mode} (expected one of {SPLIT_MODES})")
+    if resize and mode != 'copy':
+        raise ValueError(f"resize writes compact copies into the split directories; it needs mode='copy', not '{mode}'")
+
+    classes = sorted(d for d in os.listdir(source_dir) if os.path.isdir(os.path.join(source_dir, d)))
+    jobs = []
+    for cls in classes:
+        if mode != 'manifest':
+            ensure_dir(os.path.join(train_dir, cls))
+            ensure_dir(os.path.join(val_dir, cls))
+        with os.scandir(os.path.join(source_dir, cls)) as entries:
+            jobs.extend((cls, e.name) for e in entries if e.is_file())
+
+    max_workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = dict(zip(
+            (f"{cls}/{name}" for cls, name in jobs),
+            executor.map(lambda job: file_sha256(os.path.join(source_dir, *job)), jobs)
+        ))
+
+    def bucket_subset(digest):
+        return 'train' if split_bucket(digest, seed) < split else 'validation'
+
+    previous = {}
+    if clusters and manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            old = json.load(f)
+        if old.get('split') == split and old.get('seed') == seed:
+            previous = {e['path']: subset for subset in ('train', 'validation') for e in old[subset]}
+
+    # Every file in a near-duplicate cluster goes to the cluster's side
+    cluster_subsets = {}
+    matched = 0
+    for cluster in clusters or []:
+        if clusters_root:
+            cluster = [os.path.relpath(os.path.join(clusters_root, *path.split('/')), source_dir)
+                       .replace(os.sep, '/') for path in cluster]
+        members = [path for path in cluster if path in digests]
+        matched += len(members)
+        if not members:
+            continue
+        placed = sorted((digests[path], previous[path]) for path in members if path in previous)
+        subset = placed[0][1] if placed else bucket_subset(min(digests[path] for path in members))
+        for path in members:
+            cluster_subsets[path] = subset
+    if clusters and not matched:
+        raise ValueError(f"No near-duplicate cluster member is under {source_dir}"
+                         f" (clusters root: {clusters_root}); was dedup.py build run on this dataset?")
+    if clusters:
+        print(f"Keeping {matched} near-duplicate files together in their clusters")
+
+    def process(job):
+        cls, name = job
+        rel = f"{cls}/{name}"
+        subset = cluster_subsets.get(rel) or bucket_subset(digests[rel])
+        src = os.path.join(source_dir, cls, name)
+        dst = os.path.join(train_dir if subset == 'train' else val_dir, cls, name)
+        if not resize:
+            place_file(src, dst, mode)
+        return subset, {'path': rel, 'class': cls, 'sha256': digests[rel]}, (src, dst)
+
+    manifest = {
+        'version': SPLIT_MANIFEST_VERSION,
+        'source_dir': os.path.abspath(source_dir),
+        'split': split,
+        'seed': seed,
+        'classes': classes,
+        'train': [],
+        'validation': [],
+    }
+    counts = {cls: [0, 0] for cls in classes}
+    placements = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for subset, entry, placement in executor.map(process, jobs):
+            manifest[subset].append(entry)
+            counts[entry['class']][0 if subset == 'train' else 1] += 1
+            placements.append(placement)
+
+    if mode != 'manifest':
+        removed = 0
+        for subset, split_root in (('train', train_dir), ('validation', val_dir)):
+            assigned: Dict[str, set] = {cls: set() for cls in classes}
+            for entry in manifest[subset]:
+                assigned[entry['class']].add(entry['path'].split('/', 1)[1])
+            for cls in classes:
+                removed += _remove_unassigned(os.path.join(split_root, cls), assigned[cls])
+        if removed:
+            print(f"Removed {removed} files no longer assigned to their split directory")
+
+    if resize:
+        index_path = os.path.join(os.path.dirname(os.path.abspath(train_dir)), INGEST_INDEX_NAME)
+        ingest_images(placements, index_path, size=resize, workers=workers)
+        # Train from the compact copies; images that failed to ingest are left out
+        manifest['roots'] = {'train': os.path.abspath(train_dir), 'validation': os.path.abspath(val_dir)}
+        for subset in ('train', 'validation'):
+            root = manifest['roots'][subset]
+            manifest[subset] = [e for e in manifest[subset]
+                                if os.path.exists(os.path.join(root, *e['path'].split('/')))]
+
+    for subset in ('train', 'validation'):
+        manifest[subset].sort(key=lambda e: e['path'])
 
     for cls in classes:
-        src = os.path.join(source_dir, cls)
-        images = [f for f in os.listdir(src) if os.path.isfile(os.path.join(src, f))]
-        random.shuffle(images)
+        print(f"Class {cls}: {counts[cls][0]} train, {counts[cls][1]} val")
+
+    if manifest_path:
+        ensure_dir(os.path.dirname(os.path.abspath(manifest_path)))
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        print(f"Split manifest written to {manifest_path}")
+
+    return manifest
+
+
+def load_split_manifest(manifest_path: str, class_names: List[str]) -> Dict[str, Tuple[List[str], List[int]]]:
+    """
+    Read a split manifest into {'train': (paths, labels), 'validation': (paths, labels)}.
+
+    Labels follow the order of class_names (labels.json); classes not listed
+    there are skipped. Paths resolve against the subset's entry in 'roots'
+    (written by split --resize) or else source_dir.
+    """
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    roots = manifest.get('roots', {})
+    index = {name: i for i, name in enumerate(class_names)}
+    result = {}
+    for subset in ('train', 'validation'):
+        root = roots.get(subset, manifest['source_dir'])
+        entries = [e for e in manifest[subset] if e['class'] in index]
+        paths = [os.path.join(root, *e['path'].split('/')) for e in entries]
+        labels = [index[e['class']] for e in entries]
+        result[subset] = (paths, labels)
+    return result
+
 
-        split_idx = int(len(images) * split)
-        train_imgs = images[:split_idx]
-        val_imgs = images[split_idx:]
+VERIFY_CACHE_NAME = '.verify_cache.sqlite'
 
-        # Create dirs
-        ensure_dir(os.path.join(train_dir, cls))
-        ensure_dir(os.path.join(val_dir, cls))
 
-        # Copy files
-        for f in train_imgs:
-            shutil.copy2(os.path.join(src, f), os.path.join(train_dir, cls, f))
-        for f in val_imgs:
-            shutil.copy2(os.path.join(src, f), os.path.join(val_dir, cls, f))
+def _verify_one(path: str) -> Tuple[str, bool, str]:
+    try:
+        with Image.open(path) as img:
+            img.verify()
+        return path, True, ''
+    except Exception as e:
+        return path, False, f"{type(e).__name__}: {e}"
 
-        print(f"Class {cls}: {len(train_imgs)} train, {len(val_imgs)} val")
 
+def _open_verify_cache(cache_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS verified ("
+        " path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ok INTEGER, error TEXT)"
+    )
+    return conn
 
-def verify_images(root_dir: str, exts: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.webp')):
-    bad = []
+
+def verify_images(root_dir: str, exts: Tuple[str, ...] = ('.jpg', '.jpeg', '.png', '.webp'),
+                  workers: Optional[int] = None, cache_path: Optional[str] = None,
+                  quarantine_dir: Optional[str] = None) -> List[str]:
+    """
+    Verify every image under root_dir and return the paths of corrupt ones.
+
+    Results are cached in SQLite keyed by path, size and mtime (by default in
+    <root_dir>/.verify_cache.sqlite; pass ':memory:' to disable), so later runs
+    only open new or changed files. Uncached files are verified in a process
+    pool. Bad files are moved under quarantine_dir when it is given.
+    """
+    if cache_path is None:
+        cache_path = os.path.join(root_dir, VERIFY_CACHE_NAME)
+    conn = _open_verify_cache(cache_path)
+    cached = {row[0]: row[1:] for row in conn.execute("SELECT path, size, mtime_ns, ok, error FROM verified")}
+
+    quarantine_root = os.path.abspath(quarantine_dir) if quarantine_dir else None
+    files = {}
     for dirpath, _, filenames in os.walk(root_dir):
+        dirpath_abs = os.path.abspath(dirpath)
+        if quarantine_root and os.path.commonpath([dirpath_abs, quarantine_root]) == quarantine_root:
+            continue
         for f in filenames:
             if f.lower().endswith(exts):
                 p = os.path.join(dirpath, f)
-                try:
-                    with Image.open(p) as img:
-                        img.verify()
-                except Exception:
-                    bad.append(p)
+                st = os.stat(p)
+                files[p] = (st.st_size, st.st_mtime_ns)
+
+    results = {}
+    pending = []
+    for p, (size, mtime_ns) in files.items():
+        hit = cached.get(p)
+        if hit is not None and hit[0] == size and hit[1] == mtime_ns:
+            results[p] = (bool(hit[2]), hit[3])
+        else:
+            pending.append(p)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for p, ok, error in executor.map(_verify_one, pending, chunksize=32):
+                results[p] = (ok, error)
+        conn.executemany(
+            "INSERT OR REPLACE INTO verified (path, size, mtime_ns, ok, error) VALUES (?, ?, ?, ?, ?)",
+            [(p, files[p][0], files[p][1], int(results[p][0]), results[p][1]) for p in pending]
+        )
+
+    # Forget files that no longer exist
+    conn.executemany("DELETE FROM verified WHERE path = ?", [(p,) for p in cached if p not in files])
+
+    bad = sorted(p for p, (ok, _) in results.items() if not ok)
+
+    if quarantine_dir and bad:
+        for p in bad:
+            dst = os.path.join(quarantine_dir, os.path.relpath(p, root_dir))
+            ensure_dir(os.path.dirname(dst))
+            shutil.move(p, dst)
+        conn.executemany("DELETE FROM verified WHERE path = ?", [(p,) for p in bad])
+
+    conn.commit()
+    conn.close()
+
+    # Keyed by the class folder, with its split when root_dir has one (e.g. 'training/pothole')
+    counts: Dict[str, List[int]] = {}
+    for p, (ok, _) in results.items():
+        cls = os.path.relpath(os.path.dirname(p), root_dir).replace(os.sep, '/')
+        counts.setdefault(cls, [0, 0])[0 if ok else 1] += 1
+
+    print(f"Verified {len(results)} images ({len(pending)} checked, {len(results) - len(pending)} cached)")
+    for cls in sorted(counts):
+        print(f"Class {cls}: {counts[cls][0]} ok, {counts[cls][1]} bad")
+
     if bad:
-        print("Invalid/corrupt images:")
+        print("Invalid/corrupt images:" if not quarantine_dir else f"Quarantined to {quarantine_dir}:")
         for p in bad:
-            print(" -", p)
+            print(" -", p, f"({results[p][1]})")
     else:
         print("All images verified OK.")
 
+    return bad
+
+
+INGEST_INDEX_NAME = '.ingest_index.sqlite'
+DEFAULT_INGEST_SIZE = 256
+
+
+def _ingest_one(job: Tuple[str, str, int, int]) -> Tuple[str, int, int, str]:
+    """Write a compact copy of src to dst whose shorter side is at most size pixels."""
+    src, dst, size, quality = job
+    try:
+        ensure_dir(os.path.dirname(dst))
+        tmp = dst + '.tmp'
+        with Image.open(src) as img:
+            fmt = img.format
+            if min(img.size) <= size or fmt not in ('JPEG', 'PNG', 'WEBP'):
+                # Already small enough, or a format the copy could not keep under its name
+                shutil.copyfile(src, tmp)
+                width, height = img.size
+            else:
+                # JPEG: let libjpeg decode at a reduced DCT scale instead of full resolution
+                img.draft('RGB', (size, size))
+                scale = size / min(img.size)
+                target = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+                img = img.convert('RGB').resize(target, Image.BILINEAR, reducing_gap=2.0)
+                img.save(tmp, format=fmt, quality=quality)
+                width, height = target
+        os.replace(tmp, dst)
+        return dst, width, height, ''
+    except Exception as e:
+        if os.path.exists(dst + '.tmp'):
+            os.remove(dst + '.tmp')
+        return dst, 0, 0, f"{type(e).__name__}: {e}"
+
+
+def _open_ingest_index(index_path: str) -> sqlite3.Connection:
+    ensure_dir(os.path.dirname(os.path.abspath(index_path)))
+    conn = sqlite3.connect(index_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS ingested ("
+        " path TEXT PRIMARY KEY, original TEXT, size INTEGER, mtime_ns INTEGER,"
+        " canonical INTEGER, width INTEGER, height INTEGER)"
+    )
+    return conn
+
+
+def ingest_images(jobs: List[Tuple[str, str]], index_path: str, size: int = DEFAULT_INGEST_SIZE,
+                  quality: int = 90, workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Store a training-resolution copy of each (original, compact) path pair.
+
+    Every image is decoded once with PIL draft mode (reduced-size JPEG
+    decoding) and resized so its shorter side is size pixels; smaller images,
+    and formats other than JPEG, PNG and WebP, are copied unchanged. The SQLite index at index_path maps each compact
+    copy to its original, and copies whose original size, mtime and target
+    size are unchanged are skipped, so reruns are cheap. Work runs in a
+    process pool.
+    """
+    conn = _open_ingest_index(index_path)
+    done = {row[0]: row[1:] for row in conn.execute(
+        "SELECT path, original, size, mtime_ns, canonical FROM ingested")}
+
+    pending = []
+    stats = {}
+    skipped = 0
+    for src, dst in jobs:
+        src, dst = os.path.abspath(src), os.path.abspath(dst)
+        st = os.stat(src)
+        stats[dst] = (src, st.st_size, st.st_mtime_ns)
+        if done.get(dst) == (src, st.st_size, st.st_mtime_ns, size) and os.path.exists(dst):
+            skipped += 1
+        else:
+            pending.append((src, dst, size, quality))
+
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for dst, width, height, error in executor.map(_ingest_one, pending, chunksize=16):
+                if error:
+                    failed += 1
+                    print(f"⚠️ Could not ingest {stats[dst][0]}: {error}")
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingested (path, original, size, mtime_ns, canonical, width, height)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", (dst, *stats[dst], size, width, height)
+                )
+    conn.commit()
+    conn.close()
+
+    counts = {'ingested': len(pending) - failed, 'skipped': skipped, 'failed': failed}
+    print(f"Ingested {counts['ingested']} images at {size}px ({skipped} up to date, {failed} failed)")
+    return counts
+
+
+def ingest_dataset(source_dir: str, output_dir: str, size: int = DEFAULT_INGEST_SIZE, quality: int = 90,
+                   workers: Optional[int] = None, index_path: Optional[str] = None) -> Dict[str, int]:
+    """Mirror source_dir/<class>/ images into output_dir as compact copies (see ingest_images)."""
+    jobs = []
+    for dirpath, _, filenames in os.walk(source_dir):
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                src = os.path.join(dirpath, name)
+                jobs.append((src, os.path.join(output_dir, os.path.relpath(src, source_dir))))
+    return ingest_images(jobs, index_path or os.path.join(output_dir, INGEST_INDEX_NAME),
+                         size=size, quality=quality, workers=workers)
+
+
+def original_path(compact_path: str, index_path: str) -> Optional[str]:
+    """Return the full-resolution original recorded for an ingested image."""
+    conn = _open_ingest_index(index_path)
+    row = conn.execute("SELECT original FROM ingested WHERE path = ?",
+                       (os.path.abspath(compact_path),)).fetchone()
+    conn.close()
+    return row[0] if row else None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='UrbanPulse dataset preprocessing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    split_parser = subparsers.add_parser('split', help='Split a class-folder dataset into train/validation')
+    split_parser.add_argument('source', help='Source directory with one folder per class')
+    split_parser.add_argument('--train-dir', default=os.path.join(DATA_DIR, 'training'))
+    split_parser.add_argument('--val-dir', default=os.path.join(DATA_DIR, 'validation'))
+    split_parser.add_argument('--split', type=float, default=0.8, help='Fraction of images used for training')
+    split_parser.add_argument('--seed', type=int, default=42)
+    split_parser.add_argument('--mode', choices=SPLIT_MODES, default='copy',
+                              help='How files are placed in the split directories')
+    split_parser.add_argument('--workers', type=int)
+    split_parser.add_argument('--manifest', default=os.path.join(DATA_DIR, 'split_manifest.json'),
+                              help='Where to write the JSON split manifest')
+    split_parser.add_argument('--dedup-clusters',
+                              help='Clusters JSON from dedup.py report; keeps each cluster on one side')
+    split_parser.add_argument('--resize', type=int, metavar='SIZE',
+                              help='Store compact copies with this shorter side instead of the originals '
+                                   '(only with --mode copy)')
+
+    ingest_parser = subparsers.add_parser('ingest', help='Write training-resolution copies of a class-folder dataset')
+    ingest_parser.add_argument('source', help='Directory of full-resolution images')
+    ingest_parser.add_argument('output', help='Directory for the compact copies')
+    ingest_parser.add_argument('--size', type=int, default=DEFAULT_INGEST_SIZE, help='Shorter side in pixels')
+    ingest_parser.add_argument('--quality', type=int, default=90, help='JPEG/WebP quality')
+    ingest_parser.add_argument('--workers', type=int)
+
+    verify_parser = subparsers.add_parser('verify', help='Verify images and optionally quarantine bad ones')
+    verify_parser.add_argument('root', nargs='?', default=DATA_DIR, help='Directory to scan')
+    verify_parser.add_argument('--workers', type=int)
+    verify_parser.add_argument('--cache', help=f'Result cache (default: <root>/{VERIFY_CACHE_NAME})')
+    verify_parser.add_argument('--no-cache', action='store_true', help='Re-verify every file')
+    verify_parser.add_argument('--quarantine', help='Move corrupt images into this directory')
+
+    args = parser.parse_args()
+
+    if args.command == 'verify':
+        verify_images(args.root, workers=args.workers,
+                      cache_path=':memory:' if args.no_cache else args.cache,
+                      quarantine_dir=args.quarantine)
+    elif args.command == 'split':
+        clusters = clusters_root = None
+        if args.dedup_clusters:
+            with open(args.dedup_clusters, 'r') as f:
+                report = json.load(f)
+            clusters, clusters_root = report['clusters'], report.get('root')
+        split_dataset(args.source, args.train_dir, args.val_dir, split=args.split, seed=args.seed,
+                      mode=args.mode, workers=args.workers, manifest_path=args.manifest,
+                      clusters=clusters, clusters_root=clusters_root, resize=args.resize)
+    elif args.command == 'ingest':
+        ingest_dataset(args.source, args.output, size=args.size, quality=args.quality, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
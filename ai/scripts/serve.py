@@ -0,0 +1,304 @@
+"""
+Local Inference Server
+
+Serves the trained Keras model over HTTP with dynamic request batching.
+Concurrent /classify requests are queued and collected into micro-batches
+(up to --max-batch-size images, waiting at most --max-wait-ms for the batch
+to fill), which then run as a single forward pass.
+
+Endpoints:
+    POST /classify   multipart form with an 'image' field (as the backend's
+                     /api/classify route) or a raw image body; responds with
+                     the same classification shape as aiClassificationService
+    GET  /health     model and batching status
+    GET  /metrics    request counts, batch sizes and p50/p99 latency
+
+Images are resized like the training pipeline (pack_dataset.load_image_array
+matches tf.image.resize bilinear, no crop), so scores match what the model
+saw during training and validation. The backend's sharp cover-crop differs
+for non-square images.
+
+Usage:
+    python serve.py --model ../model/best_model.h5 --port 8500
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from pack_dataset import load_image_array
+from paths import LABELS_PATH
+from predict import find_default_model
+
+LATENCY_WINDOW = 10000
+
+
+def json_response(data, status=200):
+    from aiohttp import web
+    return web.json_response(data, status=status)
+
+
+class MicroBatcher:
+    """Collects single-image requests into batches for one forward pass"""
+
+    def __init__(self, model, max_batch_size=32, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        # One thread runs the model so forward passes never overlap
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.batches = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def predict(self, image):
+        """Queue one preprocessed image and wait for its probability vector"""
+
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((image, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+
+            while len(items) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = np.stack([image for image, _ in items])
+            try:
+                probabilities = await loop.run_in_executor(self.executor, self._forward, batch)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.batch_sizes.append(len(items))
+            for (_, future), probs in zip(items, probabilities):
+                if not future.done():
+                    future.set_result(probs)
+
+    def _forward(self, batch):
+        return self.model(batch, training=False).numpy()
+
+
+class InferenceServer:
+    def __init__(self, model, labels_config, max_batch_size=32, max_wait_ms=5.0, decode_workers=4):
+        self.model = model
+        self.labels_config = labels_config
+        self.batcher = MicroBatcher(model, max_batch_size, max_wait_ms)
+        self.decode_executor = ThreadPoolExecutor(max_workers=decode_workers)
+        _, self.img_height, self.img_width, _ = model.input_shape
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+
+    def format_classification(self, probabilities):
+        """Mirror the result shape of aiClassificationService.classifyWithTensorFlowModel"""
+
+        config = self.labels_config
+        predictions = [
+            {
+                'category': category,
+                'confidence': float(probabilities[i]),
+                'backendCategory': config['categoryMapping'].get(category)
+            }
+            for i, category in enumerate(config['aiCategories'])
+        ]
+        predictions.sort(key=lambda p: p['confidence'], reverse=True)
+
+        top = predictions[0]
+        category = top['category']
+        if top['confidence'] < config['confidenceThreshold']:
+            category = config['defaultCategory']
+
+        return {
+            'category': category,
+            'backendCategory': config['categoryMapping'].get(category),
+            'confidence': top['confidence'],
+            'allPredictions': predictions,
+            'threshold': config['confidenceThreshold']
+        }
+
+    async def read_image(self, request):
+        if request.content_type.startswith('multipart/'):
+            form = await request.post()
+            field = form.get('image')
+            if field is None or not hasattr(field, 'file'):
+                return None
+            return field.file.read()
+        return await request.read()
+
+    async def classify(self, request):
+        start = time.perf_counter()
+        self.requests += 1
+
+        data = await self.read_image(request)
+        if not data:
+            self.errors += 1
+            return json_response({
+                'success': False,
+                'message': 'No image file provided',
+                'error': 'Missing image file'
+            }, status=400)
+
+        loop = asyncio.get_running_loop()
+        try:
+            pixels = await loop.run_in_executor(
+                self.decode_executor, load_image_array, io.BytesIO(data), self.img_height, self.img_width
+            )
+        except Exception as e:
+            self.errors += 1
+            return json_response({
+                'success': False,
+                'message': 'Image preprocessing failed',
+                'error': str(e)
+            }, status=400)
+
+        try:
+            probabilities = await self.batcher.predict(pixels.astype(np.float32) / 255.0)
+        except Exception as e:
+            self.errors += 1
+            return json_response({
+                'success': False,
+                'message': 'Image classification failed',
+                'error': str(e)
+            }, status=500)
+
+        processing_time = (time.perf_counter() - start) * 1000
+        self.latencies.append(processing_time)
+
+        classification = self.format_classification(probabilities)
+        classification['processingTime'] = round(processing_time, 2)
+        classification['source'] = 'python_model'
+        return json_response({'success': True, 'classification': classification})
+
+    async def health(self, request):
+        return json_response({
+            'status': 'ok',
+            'model': {
+                'inputShape': list(self.model.input_shape),
+                'outputShape': list(self.model.output_shape),
+                'totalParams': int(self.model.count_params())
+            },
+            'categories': self.labels_config['aiCategories'],
+            'batching': {
+                'maxBatchSize': self.batcher.max_batch_size,
+                'maxWaitMs': self.batcher.max_wait * 1000
+            }
+        })
+
+    async def metrics(self, request):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        batch_sizes = np.array(self.batcher.batch_sizes) if self.batcher.batch_sizes else np.zeros(1)
+        return json_response({
+            'requests': self.requests,
+            'errors': self.errors,
+            'batches': self.batcher.batches,
+            'queueDepth': self.batcher.queue.qsize(),
+            'latencyMs': {
+                'p50': float(np.percentile(latencies, 50)),
+                'p99': float(np.percentile(latencies, 99)),
+                'mean': float(latencies.mean()),
+                'window': len(self.latencies)
+            },
+            'batchSize': {
+                'mean': float(batch_sizes.mean()),
+                'max': int(batch_sizes.max())
+            }
+        })
+
+    async def on_startup(self, app):
+        self.batcher.start()
+
+    async def on_cleanup(self, app):
+        await self.batcher.stop()
+        self.decode_executor.shutdown(wait=False)
+
+    def create_app(self):
+        from aiohttp import web
+
+        app = web.Application(client_max_size=10 * 1024 * 1024)
+        app.router.add_post('/classify', self.classify)
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/metrics', self.metrics)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+
+def load_model(model_path):
+    """Load the Keras model and run one warm-up pass so the first request is not slow"""
+
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path, compile=False)
+    _, height, width, channels = model.input_shape
+    model(np.zeros((1, height, width, channels), dtype=np.float32), training=False)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local inference server with dynamic batching')
+    parser.add_argument('--model', help='Keras model (.h5 or SavedModel); defaults to final_model.h5/best_model.h5')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8500)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0,
+                        help='Longest a request waits for its batch to fill')
+    parser.add_argument('--decode-workers', type=int, default=4)
+
+    args = parser.parse_args()
+
+    model_path = args.model or find_default_model()
+    if not model_path:
+        print("Error: No trained model found. Train one with train.py or pass --model")
+        return
+
+    with open(args.labels, 'r') as f:
+        labels_config = json.load(f)
+
+    print(f"Loading model from: {model_path}")
+    model = load_model(model_path)
+
+    server = InferenceServer(
+        model, labels_config,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        decode_workers=args.decode_workers
+    )
+    print(f"🚀 Serving on http://{args.host}:{args.port} "
+          f"(max batch {args.max_batch_size}, max wait {args.max_wait_ms}ms)")
+    from aiohttp import web
+
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Similar-Report Lookup
+
+Embeds report images with the trained classifier and finds earlier reports
+showing the same issue, so duplicate citizen reports can be merged.
+
+The embedding is the input of the model's final classification layer: the
+Dense(512) output of train.py's CNN, the Dense(128) output of the demo
+model, or the pooled backbone features of a --backbone model. Embeddings
+are L2-normalised, so inner products are cosine similarities.
+
+The index is an inverted file (IVF) in plain NumPy: spherical k-means
+splits the vectors into nlist clusters, and a query only scores the vectors
+in its nprobe closest clusters. Until enough vectors exist to train the
+clusters, queries fall back to an exact scan. New images can be added at
+any time; the clusters are retrained automatically once the index has
+outgrown them (unless --nlist fixes their number), and the index is saved as
+a single .npz file.
+
+Usage:
+    python similar.py build ../data/reports --index ../model/similar_index.npz
+    python similar.py query new_report.jpg --k 5
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from paths import MODEL_DIR
+
+DEFAULT_INDEX_PATH = os.path.join(MODEL_DIR, 'similar_index.npz')
+# Vectors per cluster needed before the clusters are trained (as faiss recommends)
+MIN_POINTS_PER_LIST = 39
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 256
+# Re-cluster once the target nlist for the current size is this many times the trained one
+RETRAIN_GROWTH = 2
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Cluster unit vectors by cosine similarity; returns (k, D) unit centroids"""
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        # Re-seed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file nearest-neighbour index over unit vectors
+
+    Args:
+        dim (int): Embedding size
+        nlist (int): Number of clusters (default: about 4 * sqrt(N) when trained)
+        nprobe (int): Clusters scanned per query
+    """
+
+    def __init__(self, dim, nlist=None, nprobe=8):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids = None
+        # Storage grows geometrically; vectors and assignments are views of the filled rows
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self.keys = []
+        self._key_set = set()
+        self.metadata = {}
+        self._dirty = True
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._key_set
+
+    @property
+    def vectors(self):
+        return self._vectors[:len(self.keys)]
+
+    @property
+    def assignments(self):
+        return self._assignments[:len(self.keys)] if self.is_trained else self._assignments[:0]
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    def _reserve(self, size):
+        if size <= len(self._vectors):
+            return
+        capacity = max(size, 2 * len(self._vectors), 1024)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:len(self.keys)] = self.vectors
+        assignments = np.zeros(capacity, dtype=np.int32)
+        assignments[:len(self.assignments)] = self.assignments
+        self._vectors, self._assignments = vectors, assignments
+
+    def train(self):
+        """(Re)cluster all stored vectors"""
+
+        nlist = min(self._target_nlist(), len(self.vectors))
+        rng = np.random.default_rng(0)
+        sample_size = min(len(self.vectors), nlist * KMEANS_SAMPLE_PER_LIST)
+        sample = self.vectors[rng.choice(len(self.vectors), sample_size, replace=False)]
+        self.centroids = spherical_kmeans(sample, nlist)
+        if len(self._assignments) < len(self._vectors):
+            self._assignments = np.zeros(len(self._vectors), dtype=np.int32)
+        self._assignments[:len(self.keys)] = self._assign(self.vectors)
+        self._dirty = True
+
+    def _target_nlist(self):
+        return self.nlist or max(1, int(4 * np.sqrt(len(self.vectors))))
+
+    def _assign(self, vectors):
+        if not len(vectors):
+            return np.empty(0, dtype=np.int32)
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def add(self, vectors, keys):
+        """
+        Add embeddings with their keys (e.g. image paths); keys already in the
+        index are ignored
+
+        Returns:
+            int: Number of vectors added
+        """
+
+        vectors = normalize(vectors).reshape(-1, self.dim)
+        new = [i for i, key in enumerate(keys) if key not in self._key_set]
+        if not new:
+            return 0
+        vectors = vectors[new]
+        keys = [keys[i] for i in new]
+
+        start = len(self.keys)
+        self._reserve(start + len(keys))
+        self._vectors[start:start + len(keys)] = vectors
+        self.keys.extend(keys)
+        self._key_set.update(keys)
+
+        if self.is_trained:
+            if self.nlist is None and self._target_nlist() >= RETRAIN_GROWTH * len(self.centroids):
+                # Lists have grown well past their target size: re-cluster with more lists
+                self.train()
+            else:
+                self._assignments[start:start + len(keys)] = self._assign(vectors)
+        elif len(self.vectors) >= MIN_POINTS_PER_LIST * self._target_nlist():
+            self.train()
+        self._dirty = True
+        return len(keys)
+
+    def _build_lists(self):
+        # Store vectors grouped by cluster so each probe reads one contiguous block
+        self._order = np.argsort(self.assignments, kind='stable')
+        self._grouped = self.vectors[self._order]
+        self._bounds = np.searchsorted(self.assignments[self._order], np.arange(len(self.centroids) + 1))
+        self._dirty = False
+
+    def search(self, queries, k=5):
+        """
+        Top-k most similar stored vectors for each query
+
+        Returns:
+            list: For each query, a list of (key, cosine similarity) pairs
+        """
+
+        queries = normalize(queries).reshape(-1, self.dim)
+        if not len(self.keys):
+            return [[] for _ in queries]
+
+        if not self.is_trained:
+            scores = queries @ self.vectors.T
+            return [self._top_k(np.arange(len(self.keys)), row, k) for row in scores]
+
+        if self._dirty:
+            self._build_lists()
+
+        results = []
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        for query, lists in zip(queries, probes):
+            blocks = [np.arange(self._bounds[c], self._bounds[c + 1]) for c in lists]
+            rows = np.concatenate(blocks)
+            scores = self._grouped[rows] @ query
+            results.append(self._top_k(self._order[rows], scores, k))
+        return results
+
+    def _top_k(self, ids, scores, k):
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(self.keys[ids[i]], float(scores[i])) for i in top]
+
+    def save(self, path, metadata=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f,
+                vectors=self.vectors,
+                assignments=self.assignments,
+                centroids=self.centroids if self.is_trained else np.empty((0, self.dim), dtype=np.float32),
+                keys=np.array(self.keys, dtype=str),
+                config=json.dumps({'dim': self.dim, 'nlist': self.nlist, 'nprobe': self.nprobe,
+                                   'metadata': metadata or self.metadata})
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            config = json.loads(str(data['config']))
+            index = cls(config['dim'], config['nlist'], config['nprobe'])
+            index._vectors = data['vectors']
+            index._assignments = data['assignments']
+            index.centroids = data['centroids'] if len(data['centroids']) else None
+            index.keys = [str(key) for key in data['keys']]
+        index._key_set = set(index.keys)
+        index.metadata = config['metadata']
+        return index
+
+
+def embedding_model(model):
+    """Model returning the input of the final classification layer"""
+
+    import tensorflow as tf
+
+    final = model.layers[-1]
+    if isinstance(final, tf.keras.Model):
+        # Backbone + head (train.py --backbone): the pooled backbone output
+        return tf.keras.Model(model.inputs, model.layers[-2].output)
+    return tf.keras.Model(model.inputs, final.input)
+
+
+def embed_images(embedder, paths, batch_size=64):
+    """Yield (paths, embeddings) batches; unreadable images are skipped"""
+
+    from predict import build_predict_dataset
+
+    _, img_height, img_width, _ = embedder.input_shape
+    for batch_paths, images in build_predict_dataset(paths, img_height, img_width, batch_size):
+        embeddings = embedder.predict_on_batch(images)
+        yield [p.decode('utf-8') for p in batch_paths.numpy()], np.asarray(embeddings, dtype=np.float32)
+
+
+def load_embedder(model_path):
+    import tensorflow as tf
+    return embedding_model(tf.keras.models.load_model(model_path, compile=False))
+
+
+def build(inputs, model_path, index_path=DEFAULT_INDEX_PATH, nlist=None, nprobe=8,
+          batch_size=64, retrain=False):
+    """Embed images not yet in the index and add them; returns the index"""
+
+    from predict import collect_inputs
+
+    embedder = load_embedder(model_path)
+    dim = int(embedder.output_shape[-1])
+
+    if os.path.exists(index_path):
+        index = IVFIndex.load(index_path)
+        if index.dim != dim:
+            raise ValueError(f"Index at {index_path} holds {index.dim}-d vectors but the model "
+                             f"produces {dim}-d embeddings; use a new --index")
+    else:
+        index = IVFIndex(dim, nlist, nprobe)
+
+    paths = [os.path.abspath(p) for p in collect_inputs(inputs)]
+    pending = [p for p in paths if p not in index]
+    print(f"{len(paths)} images, {len(paths) - len(pending)} already indexed, {len(pending)} to embed")
+
+    start = time.perf_counter()
+    added = 0
+    if pending:
+        for batch_paths, embeddings in embed_images(embedder, pending, batch_size):
+            added += index.add(embeddings, batch_paths)
+            print(f"\r{added}/{len(pending)} embedded", end='')
+        print()
+
+    if retrain and len(index):
+        index.train()
+
+    index.save(index_path, metadata={'model': os.path.abspath(model_path)})
+    print(f"✅ Added {added} images in {time.perf_counter() - start:.1f}s; "
+          f"index has {len(index)} ({'IVF, %d lists' % len(index.centroids) if index.is_trained else 'exact'}) "
+          f"saved to {index_path}")
+    return index
+
+
+def query(images, model_path, index_path=DEFAULT_INDEX_PATH, k=5, nprobe=None):
+    """Print and return the k most similar indexed reports for each image"""
+
+    index = IVFIndex.load(index_path)
+    if nprobe:
+        index.nprobe = nprobe
+    embedder = load_embedder(model_path)
+
+    results = {}
+    for batch_paths, embeddings in embed_images(embedder, images):
+        start = time.perf_counter()
+        matches = index.search(embeddings, k)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(batch_paths)
+        for path, neighbours in zip(batch_paths, matches):
+            results[path] = neighbours
+            print(f"{path} ({elapsed_ms:.2f} ms):")
+            for key, similarity in neighbours:
+                print(f"   {similarity:.3f}  {key}")
+    return results
+
+
+def main():
+    from predict import find_default_model
+
+    parser = argparse.ArgumentParser(description='Find earlier reports similar to an image')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Embed images and add them to the index')
+    build_parser.add_argument('inputs', nargs='+', help='Image files, directories or .txt path lists')
+    build_parser.add_argument('--nlist', type=int, help='IVF clusters (default: about 4 * sqrt(N))')
+    build_parser.add_argument('--nprobe', type=int, default=8)
+    build_parser.add_argument('--batch-size', type=int, default=64)
+    build_parser.add_argument('--retrain', action='store_true', help='Re-cluster all vectors after adding')
+
+    query_parser = subparsers.add_parser('query', help='Find the most similar indexed images')
+    query_parser.add_argument('images', nargs='+')
+    query_parser.add_argument('--k', type=int, default=5)
+    query_parser.add_argument('--nprobe', type=int, help='Override the clusters scanned per query')
+
+    for sub in (build_parser, query_parser):
+        sub.add_argument('--model', help='Keras model; defaults to final_model.h5/best_model.h5')
+        sub.add_argument('--index', default=DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args()
+
+    model_path = args.model or find_default_model()
+    if not model_path:
+        print("Error: No trained model found. Train one with train.py or pass --model")
+        return
+
+    if args.command == 'build':
+        build(args.inputs, model_path, args.index, nlist=args.nlist, nprobe=args.nprobe,
+              batch_size=args.batch_size, retrain=args.retrain)
+    elif args.command == 'query':
+        query(args.images, model_path, args.index, k=args.k, nprobe=args.nprobe)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Input Resolution / Width Sweep
+
+Trains the train.py CNN (create_model) for every combination of input
+resolution and channel-width multiplier, then measures single-image CPU
+latency for each and reports the latency/accuracy Pareto frontier.
+
+Configurations train in parallel worker processes, each with its own
+thread budget covering TensorFlow ops, the tf.data pipeline and OpenMP/MKL. Latency is measured afterwards, one model at a
+time, so the timings are not skewed by concurrent training. Finished
+configurations are kept (<output-dir>/<name>.h5 and .json) and skipped when
+the sweep is re-run.
+
+The chosen configuration is the fastest one on the frontier within
+--max-accuracy-drop of the best accuracy. Train it fully with
+`train.py --img-size R --width W`; convert.py records the model's input
+resolution in model.json (userDefinedMetadata.inputResolution), which the
+backend uses to resize images.
+
+Usage:
+    python sweep.py --resolutions 224 160 128 --widths 1.0 0.5 --epochs 10 --workers 2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+
+from paths import MODEL_DIR
+from tune import init_worker
+
+DEFAULT_RESOLUTIONS = [224, 192, 160, 128]
+DEFAULT_WIDTHS = [1.0, 0.75, 0.5]
+DEFAULT_OUTPUT_DIR = os.path.join(MODEL_DIR, 'sweep')
+
+
+def config_name(resolution, width):
+    return f"r{resolution}_w{width:g}"
+
+
+def count_macs(model):
+    """Multiply-accumulates of one forward pass through Conv2D and Dense layers"""
+
+    from tensorflow.keras import layers
+
+    macs = 0
+    for layer in model.layers:
+        if isinstance(layer, layers.Conv2D):
+            _, out_h, out_w, out_c = layer.output_shape
+            kh, kw, in_c, _ = layer.kernel.shape
+            macs += out_h * out_w * out_c * kh * kw * in_c
+        elif isinstance(layer, layers.Dense):
+            macs += int(layer.kernel.shape[0]) * int(layer.kernel.shape[1])
+    return int(macs)
+
+
+def train_config(job):
+    """
+    Train and evaluate one configuration (runs in a worker process)
+
+    Returns:
+        dict: Result record, also written to <output_dir>/<name>.json
+    """
+
+    import tensorflow as tf
+
+    # Thread pools were capped by init_worker before TensorFlow started
+    tf.keras.utils.set_random_seed(job['seed'])
+
+    from train import BATCH_SIZE, create_model, load_sources, make_dataset
+
+    name = config_name(job['resolution'], job['width'])
+    path = os.path.join(job['output_dir'], f"{name}.h5")
+
+    train_source, val_source = load_sources(job['packed_dir'], job['split_manifest'])
+    train_data = make_dataset(train_source, BATCH_SIZE, training=True, img_size=job['resolution'],
+                              threads=job['threads'])
+    validation_data = make_dataset(val_source, BATCH_SIZE, cache='', img_size=job['resolution'],
+                                   threads=job['threads'])
+
+    model = create_model(img_size=job['resolution'], width=job['width'])
+    start = time.perf_counter()
+    history = model.fit(
+        train_data,
+        epochs=job['epochs'],
+        validation_data=validation_data,
+        callbacks=[
+            tf.keras.callbacks.ModelCheckpoint(path, monitor='val_accuracy', save_best_only=True),
+            tf.keras.callbacks.EarlyStopping(monitor='val_accuracy', patience=job['patience'],
+                                             restore_best_weights=True)
+        ],
+        verbose=2
+    )
+    train_seconds = time.perf_counter() - start
+
+    model = tf.keras.models.load_model(path)
+    _, accuracy = model.evaluate(validation_data, verbose=0)
+    result = {
+        'name': name,
+        'resolution': job['resolution'],
+        'width': job['width'],
+        'params': int(model.count_params()),
+        'macs': count_macs(model),
+        'val_accuracy': float(accuracy),
+        'epochs_trained': len(history.history['loss']),
+        'train_seconds': train_seconds,
+        'path': path
+    }
+    with open(os.path.join(job['output_dir'], f"{name}.json"), 'w') as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def pareto_frontier(results):
+    """Results not beaten by another on both latency and accuracy, fastest first"""
+
+    frontier = []
+    best_accuracy = -1.0
+    for result in sorted(results, key=lambda r: (r['latency_ms'], -r['val_accuracy'])):
+        if result['val_accuracy'] > best_accuracy:
+            frontier.append(result)
+            best_accuracy = result['val_accuracy']
+    return frontier
+
+
+def choose(frontier, max_accuracy_drop):
+    """Fastest frontier entry within max_accuracy_drop of the most accurate one"""
+
+    best = max(r['val_accuracy'] for r in frontier)
+    return next(r for r in frontier if r['val_accuracy'] >= best - max_accuracy_drop)
+
+
+def print_report(results, frontier, chosen):
+    on_frontier = {r['name'] for r in frontier}
+    print(f"{'Config':<14}{'Res':>5}{'Width':>7}{'Params':>12}{'MMACs':>9}{'Latency ms':>12}{'Val acc':>9}")
+    for r in sorted(results, key=lambda r: r['latency_ms']):
+        mark = ('*' if r['name'] in on_frontier else '') + (' <- chosen' if r is chosen else '')
+        print(f"{r['name']:<14}{r['resolution']:>5}{r['width']:>7g}{r['params']:>12,}{r['macs'] / 1e6:>9.0f}"
+              f"{r['latency_ms']:>12.2f}{r['val_accuracy']:>9.4f}  {mark}")
+    print("* = on the latency/accuracy Pareto frontier")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sweep input resolution and width of the CNN')
+    parser.add_argument('--resolutions', nargs='+', type=int, default=DEFAULT_RESOLUTIONS)
+    parser.add_argument('--widths', nargs='+', type=float, default=DEFAULT_WIDTHS)
+    parser.add_argument('--epochs', type=int, default=10, help='Maximum epochs per configuration')
+    parser.add_argument('--patience', type=int, default=3, help='Early-stopping patience per configuration')
+    parser.add_argument('--workers', type=int, default=2, help='Configurations trained in parallel')
+    parser.add_argument('--threads-per-worker', type=int,
+                        help='TensorFlow threads per worker (default: CPUs / workers)')
+    parser.add_argument('--latency-threads', type=int, default=1, help='Threads for the latency measurement')
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Accuracy the chosen configuration may give up for speed')
+    parser.add_argument('--packed-dir', help='Read pre-decoded shards written by pack_dataset.py')
+    parser.add_argument('--split-manifest', help='Read file lists from a preprocess.py split manifest')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help='Retrain configurations that already have results')
+
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.workers)
+
+    results = []
+    jobs = []
+    for resolution, width in product(args.resolutions, args.widths):
+        result_path = os.path.join(args.output_dir, f"{config_name(resolution, width)}.json")
+        if os.path.exists(result_path) and not args.force:
+            with open(result_path, 'r') as f:
+                results.append(json.load(f))
+            continue
+        jobs.append({
+            'resolution': resolution, 'width': width, 'epochs': args.epochs, 'patience': args.patience,
+            'threads': threads, 'seed': args.seed, 'output_dir': args.output_dir,
+            'packed_dir': args.packed_dir, 'split_manifest': args.split_manifest
+        })
+
+    print(f"{len(results) + len(jobs)} configurations, {len(results)} already done, "
+          f"{len(jobs)} to train ({args.workers} workers x {threads} threads)")
+
+    if jobs:
+        # TensorFlow is not fork-safe; each worker starts a fresh interpreter
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context, initializer=init_worker,
+                                 initargs=(threads,)) as pool:
+            futures = {pool.submit(train_config, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"⚠️ {config_name(job['resolution'], job['width'])} failed: {e}")
+                    continue
+                results.append(result)
+                print(f"✅ {result['name']}: val_accuracy {result['val_accuracy']:.4f} "
+                      f"after {result['epochs_trained']} epochs ({result['train_seconds']:.0f}s)")
+
+    if not results:
+        print("No configurations finished")
+        return
+
+    # Latency is measured here, sequentially, once all training has stopped
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(args.latency_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    from distill import measure_latency
+
+    print(f"Measuring latency ({args.latency_threads} thread(s), batch 1)...")
+    for result in results:
+        model = tf.keras.models.load_model(result['path'], compile=False)
+        result['latency_ms'] = measure_latency(model)
+
+    frontier = pareto_frontier(results)
+    chosen = choose(frontier, args.max_accuracy_drop)
+
+    print()
+    print_report(results, frontier, chosen)
+
+    report_path = os.path.join(args.output_dir, 'sweep_report.json')
+    with open(report_path, 'w') as f:
+        json.dump({
+            'config': {'epochs': args.epochs, 'latency_threads': args.latency_threads,
+                       'max_accuracy_drop': args.max_accuracy_drop},
+            'results': results,
+            'frontier': [r['name'] for r in frontier],
+            'chosen': chosen
+        }, f, indent=2)
+
+    print(f"\n✅ Report written to {report_path}")
+    print(f"Chosen: {chosen['resolution']}x{chosen['resolution']}, width x{chosen['width']:g} "
+          f"({chosen['latency_ms']:.2f} ms, val_accuracy {chosen['val_accuracy']:.4f})")
+    print(f"Next: python train.py --img-size {chosen['resolution']} --width {chosen['width']:g}, "
+          f"then convert.py (the resolution is stored in model.json metadata)")
+
+
+if __name__ == "__main__":
+    main()
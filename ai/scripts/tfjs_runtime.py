@@ -0,0 +1,365 @@
+"""
+NumPy Runtime for TensorFlow.js Layers Models
+
+Loads a tfjs layers-model (model.json + .bin weight shards) and runs it with
+NumPy alone, so the artifacts in ai/model/ can be validated, compared and
+used for batch scoring without importing TensorFlow.
+
+Weight shards are memory-mapped and every weight that lies inside a single
+shard is a zero-copy view of the mapping; only weights that cross a shard
+boundary or are stored quantized are materialised.
+
+Supported layers: InputLayer, Conv2D (im2col + GEMM), MaxPooling2D,
+AveragePooling2D, GlobalAveragePooling2D, GlobalMaxPooling2D, Flatten,
+Dropout (identity at inference), Activation, Rescaling and Dense, in a
+Sequential topology.
+
+Usage:
+    python tfjs_runtime.py ../model/model.json
+    python tfjs_runtime.py ../model/model_updated.json --images ../data/validation --output scores.jsonl
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from pack_dataset import IMAGE_EXTENSIONS, load_image_array
+from paths import LABELS_PATH, MODEL_DIR
+
+# im2col matrices are built for this many bytes of patches at a time
+IM2COL_BYTES = 256 * 1024 * 1024
+
+QUANTIZED_DTYPES = {'uint8': np.uint8, 'uint16': np.uint16, 'float16': np.float16}
+STORAGE_DTYPES = {'float32': np.float32, 'int32': np.int32, 'bool': np.bool_}
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    None: lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'relu6': lambda x: np.clip(x, 0, 6),
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+    'tanh': np.tanh,
+    'softmax': _softmax,
+}
+
+
+def _pair(value):
+    """Normalise a Keras int / list / tfjs {"0": a, "1": b} argument to a tuple"""
+
+    if isinstance(value, dict):
+        return tuple(value[str(i)] for i in range(len(value)))
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    return (value, value)
+
+
+def _same_padding(size, kernel, stride):
+    out = -(-size // stride)
+    total = max((out - 1) * stride + kernel - size, 0)
+    return total // 2, total - total // 2
+
+
+def _pad(x, kernel, strides, padding, value=0.0):
+    if padding != 'same':
+        return x
+    top, bottom = _same_padding(x.shape[1], kernel[0], strides[0])
+    left, right = _same_padding(x.shape[2], kernel[1], strides[1])
+    if not (top or bottom or left or right):
+        return x
+    return np.pad(x, ((0, 0), (top, bottom), (left, right), (0, 0)), constant_values=value)
+
+
+def _windows(x, kernel, strides):
+    """Strided (N, Ho, Wo, C, kh, kw) view of all pooling/conv windows"""
+
+    view = np.lib.stride_tricks.sliding_window_view(x, kernel, axis=(1, 2))
+    return view[:, ::strides[0], ::strides[1]]
+
+
+class Conv2D:
+    def __init__(self, config, weights):
+        self.kernel = weights['kernel']
+        self.bias = weights.get('bias')
+        self.kernel_size = self.kernel.shape[:2]
+        self.strides = _pair(config.get('strides', 1))
+        self.padding = config.get('padding', 'valid')
+        self.activation = ACTIVATIONS[config.get('activation')]
+        if _pair(config.get('dilation_rate', 1)) != (1, 1):
+            raise NotImplementedError("Dilated convolutions are not supported")
+        kh, kw, c, f = self.kernel.shape
+        # GEMM operand laid out to match the im2col patch order (kh, kw, C)
+        self.matrix = np.ascontiguousarray(self.kernel).reshape(kh * kw * c, f)
+
+    def __call__(self, x):
+        x = _pad(x, self.kernel_size, self.strides, self.padding)
+        kh, kw = self.kernel_size
+        n, _, _, c = x.shape
+        windows = _windows(x, self.kernel_size, self.strides)
+        _, ho, wo = windows.shape[:3]
+        out = np.empty((n, ho, wo, self.matrix.shape[1]), dtype=np.float32)
+
+        # im2col per chunk of images so the patch matrix stays bounded
+        per_image = ho * wo * kh * kw * c * 4
+        step = max(1, IM2COL_BYTES // max(per_image, 1))
+        for start in range(0, n, step):
+            chunk = windows[start:start + step]
+            cols = chunk.transpose(0, 1, 2, 4, 5, 3).reshape(-1, kh * kw * c)
+            result = cols @ self.matrix
+            if self.bias is not None:
+                result += self.bias
+            out[start:start + step] = result.reshape(len(chunk), ho, wo, -1)
+        return self.activation(out)
+
+
+class Pooling2D:
+    def __init__(self, config, reduce):
+        self.pool_size = _pair(config.get('pool_size', 2))
+        self.strides = _pair(config.get('strides') or self.pool_size)
+        self.padding = config.get('padding', 'valid')
+        self.reduce = reduce
+
+    def __call__(self, x):
+        ph, pw = self.pool_size
+        if self.padding == 'valid' and self.strides == self.pool_size:
+            # Non-overlapping windows: a reshape instead of a window view
+            n, h, w, c = x.shape
+            ho, wo = h // ph, w // pw
+            blocks = x[:, :ho * ph, :wo * pw].reshape(n, ho, ph, wo, pw, c)
+            return self.reduce(blocks, axis=(2, 4))
+        if self.reduce is np.max:
+            x = _pad(x, self.pool_size, self.strides, self.padding, value=-np.inf)
+            return _windows(x, self.pool_size, self.strides).max(axis=(4, 5))
+        if self.padding == 'same':
+            # Keras averages over the valid (unpadded) part of each window
+            ones = np.ones((1,) + x.shape[1:3] + (1,), dtype=np.float32)
+            sums = _windows(_pad(x, self.pool_size, self.strides, 'same'), self.pool_size, self.strides).sum(axis=(4, 5))
+            counts = _windows(_pad(ones, self.pool_size, self.strides, 'same'), self.pool_size, self.strides).sum(axis=(4, 5))
+            return sums / counts
+        return _windows(x, self.pool_size, self.strides).mean(axis=(4, 5))
+
+
+class Dense:
+    def __init__(self, config, weights):
+        self.kernel = weights['kernel']
+        self.bias = weights.get('bias')
+        self.activation = ACTIVATIONS[config.get('activation')]
+
+    def __call__(self, x):
+        y = x @ self.kernel
+        if self.bias is not None:
+            y = y + self.bias
+        return self.activation(y)
+
+
+def _build_layer(class_name, config, weights):
+    if class_name == 'Conv2D':
+        return Conv2D(config, weights)
+    if class_name == 'MaxPooling2D':
+        return Pooling2D(config, np.max)
+    if class_name == 'AveragePooling2D':
+        return Pooling2D(config, np.mean)
+    if class_name == 'GlobalAveragePooling2D':
+        return lambda x: x.mean(axis=(1, 2))
+    if class_name == 'GlobalMaxPooling2D':
+        return lambda x: x.max(axis=(1, 2))
+    if class_name == 'Flatten':
+        return lambda x: x.reshape(len(x), -1)
+    if class_name in ('Dropout', 'SpatialDropout2D', 'GaussianNoise', 'InputLayer'):
+        return None
+    if class_name == 'Activation':
+        return ACTIVATIONS[config['activation']]
+    if class_name == 'Rescaling':
+        scale, offset = config.get('scale', 1.0), config.get('offset', 0.0)
+        return lambda x: x * np.float32(scale) + np.float32(offset)
+    if class_name == 'Dense':
+        return Dense(config, weights)
+    raise NotImplementedError(f"Layer type {class_name} is not supported")
+
+
+def load_weights(model_dir, weights_manifest):
+    """
+    Map every weight in the manifest to a NumPy array
+
+    Returns:
+        dict: Weight name -> array (memmap views where possible)
+    """
+
+    weights = {}
+    for group in weights_manifest:
+        shards = [np.memmap(os.path.join(model_dir, p), dtype=np.uint8, mode='r') for p in group['paths']]
+        bounds = np.cumsum([0] + [len(s) for s in shards])
+        offset = 0
+
+        for entry in group['weights']:
+            quantization = entry.get('quantization')
+            dtype = QUANTIZED_DTYPES[quantization['dtype']] if quantization else STORAGE_DTYPES[entry['dtype']]
+            count = int(np.prod(entry['shape'], dtype=np.int64))
+            size = count * np.dtype(dtype).itemsize
+
+            shard = int(np.searchsorted(bounds, offset, side='right')) - 1
+            local = offset - bounds[shard]
+            if local + size <= len(shards[shard]):
+                raw = shards[shard][local:local + size]
+            else:
+                # Weight crosses a shard boundary: stitch the pieces together
+                raw = np.concatenate([
+                    s[max(0, offset - b):max(0, min(len(s), offset + size - b))]
+                    for s, b in zip(shards, bounds[:-1])
+                ])
+            values = raw.view(dtype).reshape(entry['shape'])
+
+            if quantization and quantization['dtype'] in ('uint8', 'uint16'):
+                values = values.astype(np.float32) * np.float32(quantization['scale']) + np.float32(quantization['min'])
+            elif quantization:
+                values = values.astype(np.float32)
+
+            weights[entry['name']] = values
+            offset += size
+    return weights
+
+
+class LayersModel:
+    """
+    A tfjs layers-model executed with NumPy
+
+    Args:
+        model_json_path (str): Path to model.json; weight shards are resolved
+            relative to its directory
+    """
+
+    def __init__(self, model_json_path):
+        with open(model_json_path, 'r') as f:
+            artifacts = json.load(f)
+
+        topology = artifacts['modelTopology']
+        if isinstance(topology, str):
+            topology = json.loads(topology)
+        model_config = topology.get('model_config', topology)
+        if model_config['class_name'] != 'Sequential':
+            raise NotImplementedError(f"Only Sequential models are supported, got {model_config['class_name']}")
+
+        self.path = model_json_path
+        self.name = model_config['config'].get('name')
+        self.metadata = artifacts.get('userDefinedMetadata', {})
+        self.weights = load_weights(os.path.dirname(os.path.abspath(model_json_path)), artifacts['weightsManifest'])
+
+        self.input_shape = None
+        self.layers = []
+        for layer in model_config['config']['layers']:
+            config = layer['config']
+            shape = config.get('batch_input_shape') or config.get('batchInputShape')
+            if shape and self.input_shape is None:
+                self.input_shape = tuple(shape[1:])
+
+            layer_weights = {}
+            for name, value in self.weights.items():
+                # Converted Keras models may prefix names with the model name
+                parts = name.split('/')
+                if len(parts) >= 2 and parts[-2] == config['name']:
+                    layer_weights[parts[-1]] = value
+
+            fn = _build_layer(layer['class_name'], config, layer_weights)
+            if fn is not None:
+                self.layers.append((config['name'], layer['class_name'], fn))
+
+    @property
+    def num_params(self):
+        return int(sum(w.size for w in self.weights.values()))
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for _, _, fn in self.layers:
+            x = fn(x)
+        return x
+
+    def predict(self, x, batch_size=32):
+        x = np.asarray(x, dtype=np.float32)
+        return np.concatenate([self(x[i:i + batch_size]) for i in range(0, len(x), batch_size)])
+
+    def summary(self):
+        print(f"Model: {self.name} ({os.path.basename(self.path)})")
+        print(f"Input shape: {self.input_shape}")
+        for name, class_name, _ in self.layers:
+            print(f"  {name:<30}{class_name}")
+        print(f"Total params: {self.num_params:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a TensorFlow.js layers model with NumPy')
+    parser.add_argument('model', nargs='?', default=os.path.join(MODEL_DIR, 'model.json'), help='Path to model.json')
+    parser.add_argument('--images', nargs='+', help='Image files or directories to score')
+    parser.add_argument('--labels', default=LABELS_PATH, help='Path to labels.json')
+    parser.add_argument('--output', help='JSONL output for --images (default: print)')
+    parser.add_argument('--batch-size', type=int, default=32)
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = LayersModel(args.model)
+    load_s = time.perf_counter() - start
+    model.summary()
+
+    x = np.random.default_rng(0).random((1,) + model.input_shape, dtype=np.float32)
+    start = time.perf_counter()
+    output = model(x)
+    print(f"Loaded in {load_s * 1000:.1f} ms; first forward pass {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"Output shape: {output.shape}, sum of probabilities: {output.sum():.4f}")
+
+    if not args.images:
+        return
+
+    with open(args.labels, 'r') as f:
+        labels_config = json.load(f)
+    categories = labels_config['aiCategories']
+
+    paths = []
+    for item in args.images:
+        if os.path.isdir(item):
+            for dirpath, _, filenames in os.walk(item):
+                paths.extend(os.path.join(dirpath, f) for f in sorted(filenames)
+                             if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(item)
+
+    img_height, img_width = model.metadata.get('inputResolution') or model.input_shape[:2]
+    out = open(args.output, 'w') if args.output else None
+    start = time.perf_counter()
+    scored = 0
+    for i in range(0, len(paths), args.batch_size):
+        batch_paths, images = [], []
+        for path in paths[i:i + args.batch_size]:
+            try:
+                images.append(load_image_array(path, img_height, img_width))
+                batch_paths.append(path)
+            except Exception as e:
+                print(f"⚠️ Skipping unreadable image {path}: {e}")
+        if not images:
+            continue
+
+        probabilities = model(np.stack(images).astype(np.float32) / 255.0)
+        for path, probs in zip(batch_paths, probabilities):
+            top = int(np.argmax(probs))
+            record = {'path': path, 'category': categories[top], 'confidence': round(float(probs[top]), 6)}
+            if out:
+                out.write(json.dumps(record) + '\n')
+            else:
+                print(f"{record['category']:<15} {record['confidence']:.4f}  {path}")
+        scored += len(batch_paths)
+
+    if out:
+        out.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Scored {scored} images in {elapsed:.1f}s ({scored / max(elapsed, 1e-9):.1f} images/sec)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,31 @@ This script trains a CNN model to classify images of urban infrastructure
 into two categories: potholes and garbage.
 """
 
-import tensorflow as tf
-from tensorflow.keras import layers, models
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
+import argparse
+import math
 import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
 import numpy as np
-from sklearn.metrics import classification_report, confusion_matrix
-import matplotlib.pyplot as plt
+
+from backbones import (
+    BACKBONES,
+    DEFAULT_FEATURE_CACHE,
+    build_backbone,
+    cached_features,
+    create_head,
+    create_transfer_model,
+    default_weights_path,
+    feature_dataset,
+    source_fingerprint,
+    unfreeze_top_layers,
+)
+from pack_dataset import PackedSplit
+from paths import DATA_DIR, LABELS_PATH, MODEL_DIR
+from preprocess import load_split_manifest
 
 # Configuration
 IMG_HEIGHT = 224
@@ -21,7 +39,7 @@ EPOCHS = 50
 
 # Load categories from labels.json
 import json
-with open('../model/labels.json', 'r') as f:
+with open(LABELS_PATH, 'r') as f:
     labels_config = json.load(f)
     
 CLASS_NAMES = labels_config['aiCategories']
@@ -29,83 +47,306 @@ NUM_CLASSES = len(CLASS_NAMES)
 
 print(f"Loaded {NUM_CLASSES} categories: {CLASS_NAMES}")
 
+# Numeric precision policies for --precision
+PRECISIONS = {
+    'fp32': 'float32',
+    'mixed_bfloat16': 'mixed_bfloat16'
+}
+
 # Data paths
-DATA_DIR = '../data'
 TRAINING_DIR = os.path.join(DATA_DIR, 'training')
 VALIDATION_DIR = os.path.join(DATA_DIR, 'validation')
 
-def create_data_generators():
-    """Create data generators with augmentation for training"""
+def load_sources(packed_dir=None, split_manifest=None):
+    """
+    Resolve the training and validation inputs
     
-    # Training data generator with augmentation
-    train_datagen = ImageDataGenerator(
-        rescale=1./255,
-        rotation_range=20,
-        width_shift_range=0.2,
-        height_shift_range=0.2,
-        shear_range=0.2,
-        zoom_range=0.2,
-        horizontal_flip=True,
-        fill_mode='nearest'
-    )
+    Returns:
+        tuple: (train_source, validation_source), each a PackedSplit or a
+            (paths, labels) pair
+    """
     
-    # Validation data generator (only rescaling)
-    validation_datagen = ImageDataGenerator(rescale=1./255)
+    from input_pipeline import list_image_files
     
-    # Create generators
-    train_generator = train_datagen.flow_from_directory(
-        TRAINING_DIR,
-        target_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        classes=CLASS_NAMES
-    )
+    if packed_dir:
+        # Pre-decoded shards from pack_dataset.py
+        sources = []
+        for split in ('training', 'validation'):
+            packed = PackedSplit(os.path.join(packed_dir, split))
+            if packed.class_names != CLASS_NAMES:
+                raise ValueError(f"Packed {split} classes {packed.class_names} do not match labels.json")
+            # Any stored size works: make_dataset resizes batches to the model input
+            if packed.image_shape[2:] != (3,):
+                raise ValueError(f"Packed {split} images have shape {packed.image_shape}; expected RGB")
+            sources.append(packed)
+        return tuple(sources)
     
-    validation_generator = validation_datagen.flow_from_directory(
-        VALIDATION_DIR,
-        target_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=BATCH_SIZE,
-        class_mode='categorical',
-        classes=CLASS_NAMES
-    )
+    if split_manifest:
+        # File lists come from preprocess.split_dataset(); no split directories needed
+        subsets = load_split_manifest(split_manifest, CLASS_NAMES)
+        return subsets['train'], subsets['validation']
+    
+    return (list_image_files(TRAINING_DIR, CLASS_NAMES),
+            list_image_files(VALIDATION_DIR, CLASS_NAMES))
+
+def source_size(source):
+    return len(source) if isinstance(source, PackedSplit) else len(source[0])
+
+def make_dataset(source, batch_size, training=False, cache=None, shard=None, img_size=None,
+                 augmentation=None, threads=None):
+    """
+    Build a tf.data pipeline for one source (see load_sources)
+    
+    Images are resized to img_size x img_size (default IMG_HEIGHT x IMG_WIDTH);
+    packed shards are resized per batch when their stored size differs.
+    augmentation overrides input_pipeline.AUGMENTATION for training batches.
+    threads caps the pipeline's private thread pool (by default tf.data
+    sizes it to every core).
+    """
+    
+    import tensorflow as tf
+    from input_pipeline import AUTOTUNE, build_dataset, build_packed_dataset
+    
+    img_height, img_width = (img_size, img_size) if img_size else (IMG_HEIGHT, IMG_WIDTH)
+    
+    if isinstance(source, PackedSplit):
+        dataset = build_packed_dataset(source, NUM_CLASSES, batch_size, training=training, shard=shard,
+                                       augmentation=augmentation)
+        if source.image_shape[:2] != (img_height, img_width):
+            dataset = dataset.map(
+                lambda images, labels: (tf.image.resize(images, (img_height, img_width)), labels),
+                num_parallel_calls=AUTOTUNE
+            )
+    else:
+        paths, labels = source
+        dataset = build_dataset(
+            paths, labels, NUM_CLASSES,
+            img_height, img_width, batch_size,
+            training=training, cache=cache, shard=shard, augmentation=augmentation
+        )
+    
+    if threads:
+        options = tf.data.Options()
+        options.threading.private_threadpool_size = threads
+        options.threading.max_intra_op_parallelism = 1
+        dataset = dataset.with_options(options)
+    return dataset
+
+def create_distributed_dataset(strategy, source, global_batch_size, training=False, cache=None,
+                               img_size=None, augmentation=None):
+    """
+    Distribute a source for Model.fit under a tf.distribute strategy
+    
+    Each input pipeline reads only its shard of the files and batches with
+    the per-replica share of global_batch_size. The dataset repeats, so fit
+    needs steps_per_epoch / validation_steps. Uses
+    strategy.distribute_datasets_from_function rather than Keras's
+    DatasetCreator, which Keras 3 no longer has.
+    """
+    
+    def dataset_fn(input_context):
+        batch_size = input_context.get_per_replica_batch_size(global_batch_size)
+        shard = (input_context.num_input_pipelines, input_context.input_pipeline_id)
+        return make_dataset(source, batch_size, training=training, cache=cache, shard=shard,
+                            img_size=img_size, augmentation=augmentation).repeat()
+    
+    return strategy.distribute_datasets_from_function(dataset_fn)
+
+def get_strategy(name):
+    """Return the tf.distribute strategy for --strategy"""
+    
+    import tensorflow as tf
+    
+    if name == 'mirrored':
+        return tf.distribute.MirroredStrategy()
+    if name == 'multiworker':
+        # Cluster layout comes from the TF_CONFIG environment variable
+        return tf.distribute.MultiWorkerMirroredStrategy()
+    return tf.distribute.get_strategy()
+
+def is_chief():
+    """True unless TF_CONFIG marks this process as a non-chief worker"""
     
-    return train_generator, validation_generator
+    tf_config = json.loads(os.environ.get('TF_CONFIG', '{}'))
+    task = tf_config.get('task', {})
+    task_type = task.get('type')
+    if task_type in (None, 'chief'):
+        return True
+    # Without an explicit chief, worker 0 takes that role
+    return (task_type == 'worker' and task.get('index', 0) == 0
+            and 'chief' not in tf_config.get('cluster', {}))
+
+def find_free_ports(count):
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket()
+        sock.bind(('localhost', 0))
+        sockets.append(sock)
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
 
-def create_model():
-    """Create CNN model for binary classification"""
+def launch_local_workers(num_workers):
+    """
+    Run this script as num_workers local processes with a TF_CONFIG cluster
+    
+    Lets multi-worker training be exercised on a single machine. Each worker
+    gets --strategy multiworker and the remaining command-line arguments.
+    """
+    
+    workers = [f"localhost:{port}" for port in find_free_ports(num_workers)]
+    argv = []
+    skip = False
+    for arg in sys.argv[1:]:
+        if skip:
+            skip = False
+            continue
+        if arg in ('--local-workers', '--strategy'):
+            skip = True
+            continue
+        if arg.startswith(('--local-workers=', '--strategy=')):
+            continue
+        argv.append(arg)
+    
+    processes = []
+    for index in range(num_workers):
+        env = dict(os.environ)
+        env['TF_CONFIG'] = json.dumps({
+            'cluster': {'worker': workers},
+            'task': {'type': 'worker', 'index': index}
+        })
+        cmd = [sys.executable, os.path.abspath(__file__), '--strategy', 'multiworker'] + argv
+        print(f"Starting worker {index} on {workers[index]}")
+        processes.append(subprocess.Popen(cmd, env=env))
+    
+    return max(process.wait() for process in processes)
+
+def create_model(precision='fp32', jit_compile=False, img_size=None, width=1.0, dropout=0.5,
+                 learning_rate=None):
+    """
+    Create CNN model for urban infrastructure classification
+    
+    Args:
+        precision (str): 'fp32' or 'mixed_bfloat16' (bfloat16 compute, float32 variables)
+        jit_compile (bool): Compile the train/predict steps with XLA
+        img_size (int): Square input resolution (default IMG_HEIGHT x IMG_WIDTH)
+        width (float): Multiplier for the number of filters and hidden units
+        dropout (float): Dropout rate before the hidden Dense layer
+        learning_rate (float): Adam learning rate (default: Keras default 0.001)
+    """
+    
+    import tensorflow as tf
+    from tensorflow.keras import layers, models
+    
+    # The policy applies to every layer created after this call
+    tf.keras.mixed_precision.set_global_policy(PRECISIONS[precision])
+    
+    input_shape = (img_size, img_size, 3) if img_size else (IMG_HEIGHT, IMG_WIDTH, 3)
+    
+    def scaled(units):
+        return max(1, int(round(units * width)))
     
     model = models.Sequential([
         # Base CNN layers
-        layers.Conv2D(32, (3, 3), activation='relu', input_shape=(IMG_HEIGHT, IMG_WIDTH, 3)),
+        layers.Conv2D(scaled(32), (3, 3), activation='relu', input_shape=input_shape),
         layers.MaxPooling2D(2, 2),
         
-        layers.Conv2D(64, (3, 3), activation='relu'),
+        layers.Conv2D(scaled(64), (3, 3), activation='relu'),
         layers.MaxPooling2D(2, 2),
         
-        layers.Conv2D(128, (3, 3), activation='relu'),
+        layers.Conv2D(scaled(128), (3, 3), activation='relu'),
         layers.MaxPooling2D(2, 2),
         
-        layers.Conv2D(128, (3, 3), activation='relu'),
+        layers.Conv2D(scaled(128), (3, 3), activation='relu'),
         layers.MaxPooling2D(2, 2),
         
         # Classifier layers
         layers.Flatten(),
-        layers.Dropout(0.5),
-        layers.Dense(512, activation='relu'),
-        layers.Dense(NUM_CLASSES, activation='softmax')
+        layers.Dropout(dropout),
+        layers.Dense(scaled(512), activation='relu'),
+        # Softmax stays in float32 for numerically stable probabilities
+        layers.Dense(NUM_CLASSES, activation='softmax', dtype='float32')
     ])
     
     model.compile(
-        optimizer='adam',
+        optimizer=tf.keras.optimizers.Adam(learning_rate) if learning_rate else 'adam',
         loss='categorical_crossentropy',
-        metrics=['accuracy']
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
+    
+    return model
+
+def train_backbone_head(backbone, train_source, val_source, weights_path, feature_cache,
+                        epochs, jit_compile=False, img_size=None):
+    """
+    Train a classification head on cached bottleneck features
+    
+    The frozen backbone runs over both splits once (or the cached features
+    are reused) and the head is fitted on the pooled embeddings.
+    
+    Returns:
+        keras.Model: The trained head
+    """
+    
+    import tensorflow as tf
+    
+    features = {}
+    for split, source in (('training', train_source), ('validation', val_source)):
+        dataset = make_dataset(source, BATCH_SIZE, img_size=img_size)
+        features[split] = cached_features(
+            backbone, dataset, feature_cache, split, source_fingerprint(source), weights_path
+        )
+    
+    head = create_head(backbone.output_shape[-1], NUM_CLASSES)
+    head.compile(
+        optimizer=tf.keras.optimizers.Adam(1e-3),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
+    
+    print(f"Training head on cached features for up to {epochs} epochs...")
+    head.fit(
+        feature_dataset(*features['training'], NUM_CLASSES, BATCH_SIZE, training=True),
+        validation_data=feature_dataset(*features['validation'], NUM_CLASSES, BATCH_SIZE),
+        epochs=epochs,
+        callbacks=[tf.keras.callbacks.EarlyStopping(
+            monitor='val_accuracy',
+            patience=10,
+            restore_best_weights=True
+        )],
+        verbose=2
     )
+    return head
+
+def create_backbone_model(backbone, head, fine_tune_layers=0, jit_compile=False):
+    """
+    Stack backbone and trained head into the full classifier
     
+    With fine_tune_layers > 0 the top backbone layers are unfrozen and the
+    model is compiled with a low learning rate for fine-tuning.
+    """
+    
+    import tensorflow as tf
+    
+    if fine_tune_layers:
+        unfreeze_top_layers(backbone, fine_tune_layers)
+    model = create_transfer_model(backbone, head)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(1e-5 if fine_tune_layers else 1e-3),
+        loss='categorical_crossentropy',
+        metrics=['accuracy'],
+        jit_compile=jit_compile
+    )
     return model
 
 def plot_training_history(history):
     """Plot training and validation accuracy/loss"""
     
+    import matplotlib.pyplot as plt
+    
     acc = history.history['accuracy']
     val_acc = history.history['val_accuracy']
     loss = history.history['loss']
@@ -127,45 +368,247 @@ def plot_training_history(history):
     plt.legend(loc='upper right')
     plt.title('Training and Validation Loss')
     
-    plt.savefig('../model/training_history.png')
+    plt.savefig(os.path.join(MODEL_DIR, 'training_history.png'))
     plt.show()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Train the urban infrastructure classifier')
+    parser.add_argument(
+        '--no-cache-validation',
+        action='store_true',
+        help='Decode validation images every epoch instead of caching them'
+    )
+    parser.add_argument(
+        '--packed-dir',
+        help='Read pre-decoded shards written by pack_dataset.py (e.g. ../data/packed)'
+    )
+    parser.add_argument(
+        '--split-manifest',
+        help='Read train/validation file lists from a preprocess.py split manifest'
+    )
+    parser.add_argument(
+        '--precision',
+        choices=sorted(PRECISIONS),
+        default='fp32',
+        help='Compute precision (mixed_bfloat16 keeps variables and softmax in float32)'
+    )
+    parser.add_argument(
+        '--jit',
+        action='store_true',
+        help='Compile the model with XLA (jit_compile=True)'
+    )
+    parser.add_argument(
+        '--strategy',
+        choices=['none', 'mirrored', 'multiworker'],
+        default='none',
+        help='tf.distribute strategy (multiworker reads the cluster from TF_CONFIG)'
+    )
+    parser.add_argument(
+        '--local-workers',
+        type=int,
+        metavar='N',
+        help='Launch N local multi-worker processes with a generated TF_CONFIG'
+    )
+    parser.add_argument(
+        '--profile-log',
+        default=os.path.join(MODEL_DIR, 'training_profile.jsonl'),
+        help='JSON lines file for per-epoch timing records (empty to disable)'
+    )
+    parser.add_argument(
+        '--profile-batches',
+        action='store_true',
+        help='Also record timing for every training batch'
+    )
+    parser.add_argument(
+        '--trace-steps',
+        type=int,
+        nargs=2,
+        metavar=('FIRST', 'LAST'),
+        help='Capture a TensorBoard profiler trace for this global step window'
+    )
+    parser.add_argument(
+        '--trace-dir',
+        default=os.path.join(MODEL_DIR, 'logs', 'profile'),
+        help='Log directory for the profiler trace'
+    )
+    parser.add_argument(
+        '--img-size',
+        type=int,
+        default=IMG_HEIGHT,
+        help='Square input resolution (see sweep.py for the latency/accuracy trade-off)'
+    )
+    parser.add_argument(
+        '--width',
+        type=float,
+        default=1.0,
+        help='Multiplier for the filters and hidden units of the CNN'
+    )
+    parser.add_argument(
+        '--backbone',
+        choices=sorted(BACKBONES),
+        help='Use a pretrained backbone with a head trained on cached features instead of the CNN'
+    )
+    parser.add_argument(
+        '--backbone-weights',
+        help='Local no-top weights file for --backbone (default: ../model/backbones/<name>_notop.h5)'
+    )
+    parser.add_argument(
+        '--feature-cache',
+        default=DEFAULT_FEATURE_CACHE,
+        help='Directory for cached bottleneck features'
+    )
+    parser.add_argument(
+        '--head-epochs',
+        type=int,
+        default=30,
+        help='Epochs for training the head on cached features'
+    )
+    parser.add_argument(
+        '--fine-tune-epochs',
+        type=int,
+        default=0,
+        help='Epochs of end-to-end fine-tuning after the head is trained (0 to skip)'
+    )
+    parser.add_argument(
+        '--fine-tune-layers',
+        type=int,
+        default=20,
+        help='Number of top backbone layers unfrozen for fine-tuning'
+    )
+    parser.add_argument(
+        '--benchmark-input',
+        type=int,
+        metavar='STEPS',
+        help='Only time the training input pipeline for STEPS batches and exit'
+    )
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Batch size per replica')
+    parser.add_argument('--epochs', type=int, default=EPOCHS, help='Maximum training epochs')
+    parser.add_argument('--learning-rate', type=float, help='Adam learning rate (default 0.001)')
+    parser.add_argument('--dropout', type=float, default=0.5, help='Dropout before the hidden Dense layer')
+    parser.add_argument(
+        '--hparams',
+        help='JSON file of hyperparameters (e.g. tune.py best --output); overrides the four flags above '
+             'and may set "augmentation"'
+    )
+    args = parser.parse_args()
+    
+    args.augmentation = None
+    if args.hparams:
+        with open(args.hparams, 'r') as f:
+            hparams = json.load(f)
+        for key in ('batch_size', 'epochs', 'learning_rate', 'dropout', 'augmentation'):
+            if key in hparams:
+                setattr(args, key, hparams[key])
+    return args
+
 def main():
     """Main training function"""
     
+    args = parse_args()
+    
+    if args.local_workers:
+        sys.exit(launch_local_workers(args.local_workers))
+    
+    import tensorflow as tf
+    from input_pipeline import benchmark_dataset
+    from training_profiler import TimedCallback, TrainingProfiler
+    
+    # Strategies must be created before any other TensorFlow op runs
+    strategy = get_strategy(args.strategy)
+    global_batch_size = args.batch_size * strategy.num_replicas_in_sync
+    chief = is_chief()
+    
     print("Starting Urban Infrastructure Classification Training...")
-    print(f"Image size: {IMG_HEIGHT}x{IMG_WIDTH}")
-    print(f"Batch size: {BATCH_SIZE}")
-    print(f"Epochs: {EPOCHS}")
+    print(f"Image size: {args.img_size}x{args.img_size}" + (f", width x{args.width}" if args.width != 1.0 else ''))
+    print(f"Batch size: {args.batch_size} per replica, {global_batch_size} global "
+          f"({strategy.num_replicas_in_sync} replicas, strategy: {args.strategy})")
+    print(f"Epochs: {args.epochs}")
     print(f"Classes: {CLASS_NAMES}")
+    print(f"Precision: {args.precision}, XLA: {'on' if args.jit else 'off'}")
+    if args.backbone:
+        print(f"Backbone: {args.backbone} (head {args.head_epochs} epochs, "
+              f"fine-tune {args.fine_tune_epochs} epochs)")
     
     # Check if data directories exist
-    if not os.path.exists(TRAINING_DIR):
-        print(f"Error: Training directory not found: {TRAINING_DIR}")
-        print("Please add training images to the data/training/ directory")
-        return
+    if not (args.packed_dir or args.split_manifest):
+        if not os.path.exists(TRAINING_DIR):
+            print(f"Error: Training directory not found: {TRAINING_DIR}")
+            print("Please add training images to the data/training/ directory")
+            return
+        
+        if not os.path.exists(VALIDATION_DIR):
+            print(f"Error: Validation directory not found: {VALIDATION_DIR}")
+            print("Please add validation images to the data/validation/ directory")
+            return
     
-    if not os.path.exists(VALIDATION_DIR):
-        print(f"Error: Validation directory not found: {VALIDATION_DIR}")
-        print("Please add validation images to the data/validation/ directory")
-        return
+    # Create input pipelines
+    print("Creating input pipelines...")
+    train_source, val_source = load_sources(args.packed_dir, args.split_manifest)
+    train_samples = source_size(train_source)
+    validation_samples = source_size(val_source)
+    validation_cache = None if args.no_cache_validation else ''
     
-    # Create data generators
-    print("Creating data generators...")
-    train_generator, validation_generator = create_data_generators()
+    # Training pipeline: parallel decode, batched augmentation, prefetch
+    train_dataset = make_dataset(train_source, global_batch_size, training=True, img_size=args.img_size,
+                                 augmentation=args.augmentation)
     
-    print(f"Training samples: {train_generator.samples}")
-    print(f"Validation samples: {validation_generator.samples}")
+    # Validation pipeline: decode once, cache decoded batches in memory
+    validation_dataset = make_dataset(val_source, global_batch_size, cache=validation_cache,
+                                      img_size=args.img_size)
+    
+    print(f"Training samples: {train_samples}")
+    print(f"Validation samples: {validation_samples}")
+    
+    if args.benchmark_input:
+        stats = benchmark_dataset(train_dataset, steps=args.benchmark_input)
+        print(f"Input pipeline: {stats['images_per_sec']:.1f} images/sec "
+              f"({stats['images']} images in {stats['seconds']:.2f}s)")
+        return
     
-    # Create model
+    fit_kwargs = {}
+    if args.strategy != 'none':
+        # Each worker reads its own shard with the per-replica batch size
+        train_data = create_distributed_dataset(strategy, train_source, global_batch_size, training=True,
+                                                img_size=args.img_size, augmentation=args.augmentation)
+        validation_data = create_distributed_dataset(strategy, val_source, global_batch_size,
+                                                     cache=validation_cache, img_size=args.img_size)
+        fit_kwargs['steps_per_epoch'] = math.ceil(train_samples / global_batch_size)
+        fit_kwargs['validation_steps'] = math.ceil(validation_samples / global_batch_size)
+    else:
+        train_data, validation_data = train_dataset, validation_dataset
+    
+    # Create model and optimizer under the strategy scope
     print("Creating model...")
-    model = create_model()
+    epochs = args.epochs
+    if args.backbone:
+        weights_path = args.backbone_weights or default_weights_path(args.backbone)
+        tf.keras.mixed_precision.set_global_policy(PRECISIONS[args.precision])
+        with strategy.scope():
+            backbone = build_backbone(args.backbone, (args.img_size, args.img_size, 3), weights_path)
+            head = train_backbone_head(
+                backbone, train_source, val_source, weights_path, args.feature_cache,
+                args.head_epochs, jit_compile=args.jit, img_size=args.img_size
+            )
+            model = create_backbone_model(
+                backbone, head,
+                fine_tune_layers=args.fine_tune_layers if args.fine_tune_epochs else 0,
+                jit_compile=args.jit
+            )
+        epochs = args.fine_tune_epochs
+    else:
+        with strategy.scope():
+            model = create_model(precision=args.precision, jit_compile=args.jit,
+                                 img_size=args.img_size, width=args.width,
+                                 dropout=args.dropout, learning_rate=args.learning_rate)
     model.summary()
     
+    # Only the chief writes best_model.h5; other workers checkpoint to a scratch dir
+    checkpoint_dir = MODEL_DIR if chief else tempfile.mkdtemp(prefix='urbanpulse_worker_')
+    
     # Setup callbacks
     callbacks = [
         tf.keras.callbacks.ModelCheckpoint(
-            '../model/best_model.h5',
+            os.path.join(checkpoint_dir, 'best_model.h5'),
             monitor='val_accuracy',
             save_best_only=True,
             verbose=1
@@ -183,25 +626,43 @@ def main():
         )
     ]
     
-    # Train model
-    print("Starting training...")
-    history = model.fit(
-        train_generator,
-        epochs=EPOCHS,
-        validation_data=validation_generator,
-        callbacks=callbacks
-    )
+    # Time the callbacks above and profile data wait vs compute per step
+    callbacks = [TimedCallback(callback) for callback in callbacks]
+    callbacks.append(TrainingProfiler(
+        global_batch_size,
+        timed_callbacks=callbacks,
+        output_path=args.profile_log if chief and args.profile_log else None,
+        log_batches=args.profile_batches,
+        trace_steps=tuple(args.trace_steps) if args.trace_steps else None,
+        trace_dir=args.trace_dir
+    ))
     
-    # Plot training history
-    plot_training_history(history)
+    # Train model (with --backbone this is the optional fine-tuning phase)
+    history = None
+    if epochs:
+        print("Starting training..." if not args.backbone else "Fine-tuning backbone and head...")
+        history = model.fit(
+            train_data,
+            epochs=epochs,
+            validation_data=validation_data,
+            callbacks=callbacks,
+            **fit_kwargs
+        )
     
-    # Save final model
-    model.save('../model/final_model.h5')
-    print("Model saved as final_model.h5")
+    if chief:
+        # Plot training history
+        if history is not None:
+            plot_training_history(history)
+        
+        # Save final model
+        model.save(os.path.join(MODEL_DIR, 'final_model.h5'))
+        print("Model saved as final_model.h5")
+    else:
+        shutil.rmtree(checkpoint_dir, ignore_errors=True)
     
     # Evaluate model
     print("Evaluating model...")
-    val_loss, val_accuracy = model.evaluate(validation_generator)
+    val_loss, val_accuracy = model.evaluate(validation_dataset)
     print(f"Final validation accuracy: {val_accuracy:.4f}")
     print(f"Final validation loss: {val_loss:.4f}")
     
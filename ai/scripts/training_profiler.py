@@ -0,0 +1,348 @@
+"""
+Training Profiler Callbacks
+
+Keras callbacks that break training time down so slow runs can be
+attributed to the input pipeline, the model step, validation or the other
+callbacks (checkpoint writes, early stopping, LR scheduling).
+
+TrainingProfiler records per-batch and per-epoch wall time, samples/sec and
+the split between waiting for data and computing. Keras fetches each batch
+inside its compiled train function, where an input stall looks like compute,
+so the profiler swaps in a train function that pulls the batch eagerly and
+times that fetch before running the compiled train step (Keras 2 only, i.e.
+tensorflow<2.16; under Keras 3 data wait reads 0). Other callbacks can be
+wrapped in TimedCallback so their cost is reported per epoch. Results are
+appended as JSON lines, one record per epoch (and optionally per batch),
+plus a summary at the end of training. A TensorBoard profiler trace can be
+captured for a chosen window of global steps.
+
+Usage:
+    timed = [TimedCallback(cb) for cb in callbacks]
+    profiler = TrainingProfiler(batch_size, timed_callbacks=timed,
+                                output_path='../model/training_profile.jsonl')
+    model.fit(..., callbacks=timed + [profiler])
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from paths import MODEL_DIR
+
+_FORWARDED_HOOKS = (
+    'on_train_begin', 'on_train_end',
+    'on_epoch_begin', 'on_epoch_end',
+    'on_train_batch_begin', 'on_train_batch_end',
+    'on_test_begin', 'on_test_end',
+    'on_test_batch_begin', 'on_test_batch_end',
+    'on_predict_begin', 'on_predict_end',
+    'on_predict_batch_begin', 'on_predict_batch_end',
+)
+
+
+class TimedCallback(tf.keras.callbacks.Callback):
+    """
+    Wrap a callback and measure the time spent in its hooks
+
+    The wrapped callback behaves exactly as before; its time is accumulated
+    per hook and read (and reset) by TrainingProfiler.
+    """
+
+    def __init__(self, callback, name=None):
+        super().__init__()
+        self.callback = callback
+        self.name = name or type(callback).__name__
+        self._supports_tf_logs = getattr(callback, '_supports_tf_logs', False)
+        self.reset()
+
+        for hook in _FORWARDED_HOOKS:
+            setattr(self, hook, self._timed(hook))
+
+    def reset(self):
+        self.elapsed = {}
+
+    def take(self, *hooks):
+        """Return and clear the time accumulated in the given hooks"""
+
+        return sum(self.elapsed.pop(hook, 0.0) for hook in hooks)
+
+    def _timed(self, hook):
+        target = getattr(self.callback, hook)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return target(*args, **kwargs)
+            finally:
+                self.elapsed[hook] = self.elapsed.get(hook, 0.0) + time.perf_counter() - start
+
+        return wrapper
+
+    def set_model(self, model):
+        super().set_model(model)
+        self.callback.set_model(model)
+
+    def set_params(self, params):
+        super().set_params(params)
+        self.callback.set_params(params)
+
+    # Keras skips batch hooks for callbacks that do not implement them
+    def _implements_train_batch_hooks(self):
+        return self.callback._implements_train_batch_hooks()
+
+    def _implements_test_batch_hooks(self):
+        return self.callback._implements_test_batch_hooks()
+
+    def _implements_predict_batch_hooks(self):
+        return self.callback._implements_predict_batch_hooks()
+
+
+def _percentiles(values):
+    if not values:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    values = np.asarray(values)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'max': float(values.max())
+    }
+
+
+class TrainingProfiler(tf.keras.callbacks.Callback):
+    """
+    Per-batch and per-epoch timing with a data-wait vs compute breakdown
+
+    Put it last in the callback list so the cost of the other (wrapped)
+    callbacks can be separated from data and compute time.
+
+    Args:
+        batch_size (int): Global batch size, used for samples/sec
+        timed_callbacks (list): TimedCallback wrappers to report on
+        output_path (str): JSON lines file to append records to
+        log_batches (bool): Also write one record per training batch
+        trace_steps (tuple): (first, last) global step of a TensorBoard
+            profiler trace, inclusive
+        trace_dir (str): Log directory for the profiler trace
+        verbose (bool): Print a one-line summary per epoch
+    """
+
+    def __init__(self, batch_size, timed_callbacks=None, output_path=None, log_batches=False,
+                 trace_steps=None, trace_dir=os.path.join(MODEL_DIR, 'logs', 'profile'), verbose=True):
+        super().__init__()
+        self.batch_size = batch_size
+        self.timed_callbacks = list(timed_callbacks or [])
+        self.output_path = output_path
+        self.log_batches = log_batches
+        self.trace_steps = trace_steps
+        self.trace_dir = trace_dir
+        self.verbose = verbose
+        self.epochs = []
+        self.global_step = 0
+        self._tracing = False
+        self._fetch_s = 0.0
+        self._original_train_function = None
+
+    def _write(self, record):
+        if not self.output_path:
+            return
+        with open(self.output_path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    @staticmethod
+    def _reduce_per_replica():
+        """Keras 2's helper that turns per-replica step outputs into fit's logs"""
+
+        try:
+            from keras.src.engine.training import reduce_per_replica  # Keras 2.13+
+        except ImportError:
+            try:
+                from keras.engine.training import reduce_per_replica
+            except ImportError:
+                return None
+        return reduce_per_replica
+
+    def _wrap_train_function(self):
+        """
+        Replace model.train_function (built by fit before on_train_begin) with
+        one that fetches the batch outside the compiled step and times it
+
+        Returns:
+            bool: False if the model's train function cannot be wrapped
+        """
+
+        model = self.model
+        reduce_per_replica = self._reduce_per_replica()
+        if (reduce_per_replica is None
+                or getattr(model, 'train_function', None) is None
+                or getattr(model, '_steps_per_execution', None) is None
+                or int(model._steps_per_execution.numpy()) != 1):
+            return False
+
+        strategy = model.distribute_strategy
+        # Same reduction as Model.make_train_function ('auto' since Keras 2.13)
+        reduction = getattr(model, 'distribute_reduction_method', None) or 'first'
+        train_step = model.train_step
+        if getattr(model, '_jit_compile', False):
+            train_step = tf.function(train_step, jit_compile=True, reduce_retracing=True)
+
+        def run_step(data):
+            outputs = strategy.run(train_step, args=(data,))
+            model._train_counter.assign_add(1)
+            return reduce_per_replica(outputs, strategy, reduction=reduction)
+
+        if not model.run_eagerly:
+            run_step = tf.function(run_step, reduce_retracing=True)
+
+        def train_function(iterator):
+            start = time.perf_counter()
+            data = next(iterator)
+            self._fetch_s = time.perf_counter() - start
+            return run_step(data)
+
+        self._original_train_function = model.train_function
+        model.train_function = train_function
+        return True
+
+    def on_train_begin(self, logs=None):
+        if not self._wrap_train_function():
+            print("⚠️ TrainingProfiler: cannot time batch fetches (needs Keras 2, i.e. "
+                  "tensorflow<2.16, and steps_per_execution=1); data wait will read 0")
+        self._train_start = time.perf_counter()
+        self._run_id = time.strftime('%Y%m%dT%H%M%S')
+        if self.output_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        for cb in self.timed_callbacks:
+            cb.reset()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._last_batch_end = self._epoch_start
+        self._step_ms = []
+        self._wait_ms = []
+        self._compute_ms = []
+        self._validation_s = 0.0
+        self._callback_s = {cb.name: 0.0 for cb in self.timed_callbacks}
+        self._charge_callbacks('on_epoch_begin')
+
+    def _charge_callbacks(self, *hooks):
+        total = 0.0
+        for cb in self.timed_callbacks:
+            spent = cb.take(*hooks)
+            self._callback_s[cb.name] += spent
+            total += spent
+        return total
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.trace_steps and not self._tracing and self.global_step == self.trace_steps[0]:
+            tf.profiler.experimental.start(self.trace_dir)
+            self._tracing = True
+
+        self._batch_callbacks = self._charge_callbacks('on_train_batch_begin')
+        self._fetch_s = 0.0
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.perf_counter()
+        callbacks = self._batch_callbacks + self._charge_callbacks('on_train_batch_end')
+        step_ms = (now - self._last_batch_end) * 1000
+        # The wrapped train function timed the fetch; the rest of the step is compute
+        wait_ms = self._fetch_s * 1000
+        compute_ms = max(0.0, step_ms - wait_ms - callbacks * 1000)
+        self._wait_ms.append(wait_ms)
+        self._compute_ms.append(compute_ms)
+        self._step_ms.append(step_ms)
+        self._last_batch_end = now
+
+        if self._tracing and self.global_step >= self.trace_steps[1]:
+            tf.profiler.experimental.stop()
+            self._tracing = False
+            if self.verbose:
+                print(f"Profiler trace for steps {self.trace_steps[0]}-{self.trace_steps[1]} "
+                      f"written to {self.trace_dir}")
+
+        if self.log_batches:
+            self._write({
+                'type': 'batch',
+                'run': self._run_id,
+                'step': self.global_step,
+                'batch': batch,
+                'step_ms': step_ms,
+                'data_wait_ms': self._wait_ms[-1],
+                'compute_ms': compute_ms
+            })
+        self.global_step += 1
+
+    def on_test_begin(self, logs=None):
+        self._charge_callbacks('on_test_begin')
+        self._validation_start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self._validation_s += time.perf_counter() - self._validation_start
+        self._charge_callbacks('on_test_batch_begin', 'on_test_batch_end', 'on_test_end')
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Wrapped callbacks ran their on_epoch_end (checkpoint writes etc.) before this one
+        self._charge_callbacks('on_epoch_end')
+        wall_s = time.perf_counter() - self._epoch_start
+        steps = len(self._step_ms)
+        train_s = sum(self._step_ms) / 1000
+        samples_per_sec = steps * self.batch_size / train_s if train_s > 0 else 0.0
+        wait_total = sum(self._wait_ms)
+        compute_total = sum(self._compute_ms)
+
+        record = {
+            'type': 'epoch',
+            'run': self._run_id,
+            'epoch': epoch + 1,
+            'wall_s': wall_s,
+            'train_s': train_s,
+            'validation_s': self._validation_s,
+            'steps': steps,
+            'samples_per_sec': samples_per_sec,
+            'step_ms': _percentiles(self._step_ms),
+            'data_wait_ms': _percentiles(self._wait_ms),
+            'compute_ms': _percentiles(self._compute_ms),
+            'data_wait_fraction': wait_total / (wait_total + compute_total) if steps else 0.0,
+            'callbacks_s': dict(self._callback_s)
+        }
+        self.epochs.append(record)
+        self._write(record)
+
+        if logs is not None:
+            logs['samples_per_sec'] = samples_per_sec
+            logs['step_ms'] = record['step_ms']['mean']
+
+        if self.verbose:
+            callbacks = ', '.join(f"{name} {secs:.2f}s" for name, secs in self._callback_s.items())
+            print(f"Epoch {epoch + 1}: {samples_per_sec:.1f} samples/sec, "
+                  f"{record['step_ms']['mean']:.1f} ms/step "
+                  f"({record['data_wait_fraction']:.0%} waiting for data), "
+                  f"validation {self._validation_s:.1f}s"
+                  + (f", callbacks: {callbacks}" if callbacks else ''))
+
+    def on_train_end(self, logs=None):
+        if self._original_train_function is not None:
+            self.model.train_function = self._original_train_function
+            self._original_train_function = None
+
+        if self._tracing:
+            tf.profiler.experimental.stop()
+            self._tracing = False
+
+        total_s = time.perf_counter() - self._train_start
+        self._write({
+            'type': 'summary',
+            'run': self._run_id,
+            'epochs': len(self.epochs),
+            'total_s': total_s,
+            'mean_samples_per_sec': float(np.mean([e['samples_per_sec'] for e in self.epochs]))
+            if self.epochs else 0.0,
+            'validation_s': sum(e['validation_s'] for e in self.epochs),
+            'callbacks_s': {
+                cb.name: sum(e['callbacks_s'].get(cb.name, 0.0) for e in self.epochs)
+                for cb in self.timed_callbacks
+            }
+        })
@@ -0,0 +1,528 @@
+"""
+Hyperparameter Search
+
+Tunes the learning rate, batch size, dropout and augmentation ranges of the
+train.py CNN by running trials in a process pool: one trial per worker
+process, with TensorFlow, its tf.data pipelines and OpenMP/MKL capped at
+--threads-per-trial threads and the pool sized to the available cores by
+default.
+
+Modes:
+    random  parameters sampled independently; median pruning
+    bayes   Tree-structured Parzen Estimator (TPE) after a few random trials:
+            new parameters maximise l(x)/g(x), the density ratio between the
+            best quarter of finished trials and the rest; median pruning
+    asha    random parameters with asynchronous successive halving: at rung
+            epochs min_epochs * eta^k a trial only continues if it is in the
+            top 1/eta of the trials that reached that rung
+
+Median pruning stops a trial after --min-epochs when its validation accuracy
+is below the median of the other trials at the same epoch.
+
+Trials, their per-epoch validation accuracy and their outcome are stored in
+a SQLite study, shared by the workers (pruning decisions read the other
+trials' reports from it). Re-running the same study resumes it: finished
+trials are kept and interrupted ones are re-run with the same parameters.
+
+Usage:
+    python tune.py run --study lr-aug --mode asha --trials 40 --epochs 27
+    python tune.py status --study lr-aug
+    python tune.py best --study lr-aug --output ../model/best_hparams.json
+    python train.py --hparams ../model/best_hparams.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing
+
+import numpy as np
+
+from paths import MODEL_DIR
+
+DEFAULT_STUDY_PATH = os.path.join(MODEL_DIR, 'tuning.sqlite')
+MODES = ['random', 'bayes', 'asha']
+
+# name -> ('log', low, high) | ('uniform', low, high) | ('choice', [options])
+SEARCH_SPACE = {
+    'learning_rate': ('log', 1e-4, 3e-3),
+    'batch_size': ('choice', [16, 32, 64]),
+    'dropout': ('uniform', 0.2, 0.6),
+    'rotation_range': ('uniform', 0.0, 30.0),
+    'width_shift_range': ('uniform', 0.0, 0.3),
+    'height_shift_range': ('uniform', 0.0, 0.3),
+    'shear_range': ('uniform', 0.0, 10.0),
+    'zoom_range': ('uniform', 0.0, 0.3),
+    'horizontal_flip': ('choice', [True, False]),
+}
+# Keys of input_pipeline.AUGMENTATION (not imported here: it loads TensorFlow)
+AUGMENTATION_KEYS = ('rotation_range', 'width_shift_range', 'height_shift_range',
+                     'shear_range', 'zoom_range', 'horizontal_flip')
+
+TPE_STARTUP_TRIALS = 8
+TPE_GAMMA = 0.25
+TPE_CANDIDATES = 24
+MEDIAN_MIN_TRIALS = 3
+
+
+def trial_hparams(params):
+    """Trial parameters in the format of train.py --hparams"""
+
+    return {
+        'batch_size': int(params['batch_size']),
+        'learning_rate': float(params['learning_rate']),
+        'dropout': float(params['dropout']),
+        'augmentation': {key: params[key] for key in AUGMENTATION_KEYS}
+    }
+
+
+class Study:
+    """
+    Trials of one search, stored in a SQLite database
+
+    Every method opens its own connection, so a Study can be used from the
+    main process and from each worker process at the same time.
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @classmethod
+    def open(cls, path, name, config=None):
+        """
+        Open a study, creating it with config if it does not exist yet
+
+        When resuming, config values that differ from the stored ones (other
+        than the mode) are reported and the stored values are kept.
+
+        Raises:
+            ValueError: If config disagrees with the stored study's mode
+            KeyError: If the study does not exist and no config is given
+        """
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        study = cls(path, name)
+        with closing(study._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS studies (name TEXT PRIMARY KEY, config TEXT, created REAL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS trials ("
+                " study TEXT, trial INTEGER, params TEXT, state TEXT, value REAL, epochs INTEGER,"
+                " started REAL, finished REAL, error TEXT, PRIMARY KEY (study, trial))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                " study TEXT, trial INTEGER, epoch INTEGER, value REAL, PRIMARY KEY (study, trial, epoch))"
+            )
+            row = conn.execute("SELECT config FROM studies WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                if config is None:
+                    raise KeyError(f"No study named {name!r} in {path}")
+                conn.execute("INSERT INTO studies VALUES (?, ?, ?)", (name, json.dumps(config), time.time()))
+                study.config = config
+            else:
+                study.config = json.loads(row[0])
+                if config is not None and config['mode'] != study.config['mode']:
+                    raise ValueError(f"Study {name!r} was created in {study.config['mode']} mode, "
+                                     f"not {config['mode']}; use another --study")
+                for key, value in (config or {}).items():
+                    if study.config.get(key) != value:
+                        print(f"⚠️ Study {name!r} was created with {key}={study.config.get(key)!r}; "
+                              f"ignoring {value!r}; use a new --study to change it")
+        return study
+
+    def add_trial(self, params):
+        with closing(self._connect()) as conn, conn:
+            trial = conn.execute("SELECT COALESCE(MAX(trial), -1) + 1 FROM trials WHERE study = ?",
+                                 (self.name,)).fetchone()[0]
+            conn.execute("INSERT INTO trials (study, trial, params, state) VALUES (?, ?, ?, 'queued')",
+                         (self.name, trial, json.dumps(params)))
+        return trial
+
+    def start(self, trial):
+        with closing(self._connect()) as conn, conn:
+            # A re-run trial starts over
+            conn.execute("DELETE FROM reports WHERE study = ? AND trial = ?", (self.name, trial))
+            conn.execute("UPDATE trials SET state = 'running', started = ? WHERE study = ? AND trial = ?",
+                         (time.time(), self.name, trial))
+
+    def finish(self, trial, state, value=None, epochs=None, error=None):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE trials SET state = ?, value = ?, epochs = ?, finished = ?, error = ?"
+                " WHERE study = ? AND trial = ?",
+                (state, value, epochs, time.time(), error, self.name, trial)
+            )
+
+    def report(self, trial, epoch, value):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)", (self.name, trial, epoch, value))
+
+    def values_at(self, epoch, exclude=None):
+        """Validation accuracy every (other) trial reported at epoch"""
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT trial, value FROM reports WHERE study = ? AND epoch = ?",
+                                (self.name, epoch)).fetchall()
+        return [value for trial, value in rows if trial != exclude]
+
+    def trials(self, states=None):
+        """All trials as dicts, in trial order; optionally only those in states"""
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT trial, params, state, value, epochs, started, finished, error FROM trials"
+                " WHERE study = ? ORDER BY trial", (self.name,)
+            ).fetchall()
+        keys = ('trial', 'params', 'state', 'value', 'epochs', 'started', 'finished', 'error')
+        trials = [dict(zip(keys, row)) for row in rows]
+        for trial in trials:
+            trial['params'] = json.loads(trial['params'])
+        return [t for t in trials if states is None or t['state'] in states]
+
+    def best(self):
+        finished = [t for t in self.trials(('complete', 'pruned')) if t['value'] is not None]
+        complete = [t for t in finished if t['state'] == 'complete']
+        return max(complete or finished, key=lambda t: t['value'], default=None)
+
+
+def sample_random(rng, space=SEARCH_SPACE):
+    params = {}
+    for name, spec in space.items():
+        if spec[0] == 'log':
+            params[name] = float(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))))
+        elif spec[0] == 'uniform':
+            params[name] = float(rng.uniform(spec[1], spec[2]))
+        else:
+            params[name] = spec[1][rng.integers(len(spec[1]))]
+    return params
+
+
+def _to_unit(spec, value):
+    if spec[0] == 'log':
+        return (math.log(value) - math.log(spec[1])) / (math.log(spec[2]) - math.log(spec[1]))
+    return (value - spec[1]) / (spec[2] - spec[1])
+
+
+def _from_unit(spec, u):
+    if spec[0] == 'log':
+        return float(math.exp(math.log(spec[1]) + u * (math.log(spec[2]) - math.log(spec[1]))))
+    return float(spec[1] + u * (spec[2] - spec[1]))
+
+
+def _parzen_log_density(x, points, bandwidth):
+    """Log density of a Gaussian mixture on points plus a uniform prior on [0, 1]"""
+
+    components = np.exp(-0.5 * ((x[:, None] - points[None, :]) / bandwidth) ** 2) / (bandwidth * math.sqrt(2 * math.pi))
+    return np.log((components.sum(axis=1) + 1.0) / (len(points) + 1))
+
+
+def sample_tpe(rng, history, space=SEARCH_SPACE, gamma=TPE_GAMMA, candidates=TPE_CANDIDATES):
+    """
+    Independent TPE: for each parameter, draw candidates from the density of
+    the best trials and keep the one maximising l(x) / g(x)
+
+    Args:
+        history (list): (params, value) pairs of finished trials, higher is better
+    """
+
+    ranked = sorted(history, key=lambda item: -item[1])
+    n_good = max(1, int(math.ceil(gamma * len(ranked))))
+    good = [params for params, _ in ranked[:n_good]]
+    bad = [params for params, _ in ranked[n_good:]] or good
+
+    params = {}
+    for name, spec in space.items():
+        if spec[0] == 'choice':
+            options = spec[1]
+            l = np.array([sum(p[name] == o for p in good) + 1.0 for o in options]) / (len(good) + len(options))
+            g = np.array([sum(p[name] == o for p in bad) + 1.0 for o in options]) / (len(bad) + len(options))
+            drawn = rng.choice(len(options), size=candidates, p=l)
+            params[name] = options[int(drawn[np.argmax(l[drawn] / g[drawn])])]
+            continue
+
+        good_x = np.array([_to_unit(spec, p[name]) for p in good])
+        bad_x = np.array([_to_unit(spec, p[name]) for p in bad])
+        bandwidth = max(0.05, 1.06 * float(np.std(good_x)) * len(good_x) ** -0.2)
+        centres = good_x[rng.integers(len(good_x), size=candidates)]
+        x = centres + rng.normal(0, bandwidth, size=candidates)
+        # Out-of-range draws fall back to the uniform prior instead of piling up on the bounds
+        outside = (x < 0.0) | (x > 1.0)
+        x[outside] = rng.uniform(size=int(outside.sum()))
+        score = _parzen_log_density(x, good_x, bandwidth) - _parzen_log_density(x, bad_x, bandwidth)
+        params[name] = _from_unit(spec, float(x[np.argmax(score)]))
+    return params
+
+
+def suggest(study, rng):
+    """Parameters for the next trial according to the study's mode"""
+
+    if study.config['mode'] == 'bayes':
+        history = [(t['params'], t['value']) for t in study.trials(('complete', 'pruned'))
+                   if t['value'] is not None]
+        if len(history) >= TPE_STARTUP_TRIALS:
+            return sample_tpe(rng, history)
+    return sample_random(rng)
+
+
+def asha_rungs(config):
+    """Epochs at which successive halving compares trials"""
+
+    rungs = []
+    epoch = config['min_epochs']
+    while epoch < config['epochs']:
+        rungs.append(epoch)
+        epoch *= config['eta']
+    return rungs
+
+
+def should_prune(study, trial, epoch, value):
+    """Decide after an epoch whether the trial stops (see the module docstring)"""
+
+    config = study.config
+    if config['mode'] == 'asha':
+        if epoch not in asha_rungs(config):
+            return False
+        # Includes this trial's own report; promote the top 1/eta of the rung
+        values = sorted(study.values_at(epoch), reverse=True)
+        keep = max(1, len(values) // config['eta'])
+        return value < values[keep - 1]
+
+    if epoch < config['min_epochs']:
+        return False
+    others = study.values_at(epoch, exclude=trial)
+    return len(others) >= MEDIAN_MIN_TRIALS and value < float(np.median(others))
+
+
+def init_worker(threads):
+    """Cap every thread pool of a worker process before TensorFlow starts"""
+
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'TF_NUM_INTRAOP_THREADS'):
+        os.environ[var] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '1'
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+
+def run_trial(study_path, study_name, trial, params):
+    """Train one trial, reporting every epoch to the study (runs in a worker process)"""
+
+    import tensorflow as tf
+
+    study = Study.open(study_path, study_name)
+    config = study.config
+    # Worker processes run one trial after another
+    tf.keras.backend.clear_session()
+    tf.keras.utils.set_random_seed(config['seed'] + trial)
+
+    from train import create_model, load_sources, make_dataset
+
+    study.start(trial)
+    hparams = trial_hparams(params)
+    reported = []
+
+    class Reporter(tf.keras.callbacks.Callback):
+        pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            value = float((logs or {})['val_accuracy'])
+            reported.append(value)
+            study.report(trial, epoch + 1, value)
+            if should_prune(study, trial, epoch + 1, value):
+                Reporter.pruned = True
+                self.model.stop_training = True
+
+    try:
+        train_source, val_source = load_sources(config['packed_dir'], config['split_manifest'])
+        train_data = make_dataset(train_source, hparams['batch_size'], training=True,
+                                  img_size=config['img_size'], augmentation=hparams['augmentation'],
+                                  threads=config['threads_per_trial'])
+        validation_data = make_dataset(val_source, hparams['batch_size'], cache='', img_size=config['img_size'],
+                                       threads=config['threads_per_trial'])
+        model = create_model(img_size=config['img_size'], dropout=hparams['dropout'],
+                             learning_rate=hparams['learning_rate'])
+        model.fit(train_data, epochs=config['epochs'], validation_data=validation_data,
+                  callbacks=[Reporter()], verbose=0)
+    except Exception as e:
+        study.finish(trial, 'failed', error=f"{type(e).__name__}: {e}")
+        return {'trial': trial, 'state': 'failed', 'error': str(e)}
+
+    state = 'pruned' if Reporter.pruned else 'complete'
+    value = max(reported) if reported else None
+    study.finish(trial, state, value, len(reported))
+    return {'trial': trial, 'state': state, 'value': value, 'epochs': len(reported)}
+
+
+def run(study, n_trials, workers):
+    """
+    Run trials until the study has n_trials finished ones
+
+    A worker process that dies (e.g. killed for running out of memory) breaks
+    the whole pool: the trials running in it are marked failed and a new pool
+    is started for the rest of the search.
+    """
+
+    # Trials left running by an interrupted search are re-run with their parameters
+    pending = [(t['trial'], t['params']) for t in study.trials(('queued', 'running'))]
+    if pending:
+        print(f"Resuming {len(pending)} interrupted trial(s)")
+    rng = np.random.default_rng(study.config['seed'] + len(study.trials()))
+
+    context = multiprocessing.get_context('spawn')
+
+    def start_pool():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_worker,
+                                   initargs=(study.config['threads_per_trial'],))
+
+    pool = start_pool()
+    running = {}
+    try:
+        while True:
+            broken = False
+            finished = len(study.trials(('complete', 'pruned', 'failed')))
+            while not broken and len(running) < workers and (pending or finished + len(running) < n_trials):
+                if pending:
+                    trial, params = pending.pop(0)
+                else:
+                    params = suggest(study, rng)
+                    trial = study.add_trial(params)
+                try:
+                    running[pool.submit(run_trial, study.path, study.name, trial, params)] = trial
+                except BrokenProcessPool:
+                    # A worker died since the last wait; this trial never started
+                    pending.insert(0, (trial, params))
+                    broken = True
+            if not running and not broken:
+                break
+
+            if not broken:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # The worker process died (e.g. out of memory)
+                        broken = broken or isinstance(e, BrokenProcessPool)
+                        study.finish(trial, 'failed', error=str(e))
+                        print(f"❌ Trial {trial} crashed: {e}")
+                        continue
+                    if result['state'] == 'failed':
+                        print(f"❌ Trial {trial} failed: {result['error']}")
+                    else:
+                        icon = '✅' if result['state'] == 'complete' else '✂️'
+                        print(f"{icon} Trial {trial} {result['state']} after {result['epochs']} epochs: "
+                              f"val_accuracy {result['value']:.4f}")
+
+            if broken:
+                # A dead worker takes the whole pool down, with every trial still running in it
+                for trial in running.values():
+                    study.finish(trial, 'failed', error='BrokenProcessPool: lost with its worker pool')
+                    print(f"❌ Trial {trial} lost when a worker process died")
+                running = {}
+                pool.shutdown()
+                print("⚠️ Restarting the worker pool")
+                pool = start_pool()
+    finally:
+        pool.shutdown()
+
+
+def print_status(study, limit=None):
+    trials = study.trials()
+    counts = {}
+    for t in trials:
+        counts[t['state']] = counts.get(t['state'], 0) + 1
+    print(f"Study {study.name!r} ({study.config['mode']}): {len(trials)} trials "
+          f"({', '.join(f'{n} {s}' for s, n in sorted(counts.items()))})")
+
+    ranked = sorted((t for t in trials if t['value'] is not None), key=lambda t: -t['value'])
+    print(f"{'Trial':>6}{'State':>10}{'Epochs':>8}{'Val acc':>9}{'LR':>10}{'Batch':>7}{'Dropout':>9}")
+    for t in ranked[:limit]:
+        p = t['params']
+        print(f"{t['trial']:>6}{t['state']:>10}{t['epochs']:>8}{t['value']:>9.4f}"
+              f"{p['learning_rate']:>10.2e}{p['batch_size']:>7}{p['dropout']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter search for the classifier')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='Run (or resume) a search')
+    run_parser.add_argument('--mode', choices=MODES, default='asha')
+    run_parser.add_argument('--trials', type=int, default=20, help='Finished trials to reach')
+    run_parser.add_argument('--epochs', type=int, default=27, help='Maximum epochs per trial')
+    run_parser.add_argument('--min-epochs', type=int, default=3,
+                            help='Epochs before a trial can be pruned (first ASHA rung)')
+    run_parser.add_argument('--eta', type=int, default=3, help='ASHA reduction factor')
+    run_parser.add_argument('--threads-per-trial', type=int, default=2, help='TensorFlow threads per trial')
+    run_parser.add_argument('--workers', type=int, help='Parallel trials (default: CPUs / threads per trial)')
+    run_parser.add_argument('--img-size', type=int, help='Input resolution (default: train.py IMG_HEIGHT)')
+    run_parser.add_argument('--packed-dir', help='Read pre-decoded shards written by pack_dataset.py')
+    run_parser.add_argument('--split-manifest', help='Read file lists from a preprocess.py split manifest')
+    run_parser.add_argument('--seed', type=int, default=0)
+
+    status_parser = subparsers.add_parser('status', help='Show the trials of a study, best first')
+    status_parser.add_argument('--limit', type=int, default=10)
+
+    best_parser = subparsers.add_parser('best', help='Write the best trial as a train.py --hparams file')
+    best_parser.add_argument('--output', default=os.path.join(MODEL_DIR, 'best_hparams.json'))
+
+    for sub in (run_parser, status_parser, best_parser):
+        sub.add_argument('--study', default='default', help='Study name')
+        sub.add_argument('--db', default=DEFAULT_STUDY_PATH, help='SQLite study database')
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        config = {
+            'mode': args.mode, 'epochs': args.epochs, 'min_epochs': args.min_epochs, 'eta': args.eta,
+            'threads_per_trial': args.threads_per_trial, 'img_size': args.img_size,
+            'packed_dir': args.packed_dir, 'split_manifest': args.split_manifest, 'seed': args.seed,
+            'space': {name: list(spec) for name, spec in SEARCH_SPACE.items()}
+        }
+        study = Study.open(args.db, args.study, config)
+        workers = args.workers or max(1, (os.cpu_count() or 1) // study.config['threads_per_trial'])
+        print(f"Study {args.study!r} in {args.db}: {study.config['mode']} search, {args.trials} trials, "
+              f"{workers} workers x {study.config['threads_per_trial']} threads")
+        if study.config['mode'] == 'asha':
+            print(f"ASHA rungs at epochs {asha_rungs(study.config)} (eta {study.config['eta']})")
+        start = time.perf_counter()
+        run(study, args.trials, workers)
+        print(f"\nSearch finished in {time.perf_counter() - start:.0f}s")
+        print_status(study)
+        return
+
+    try:
+        study = Study.open(args.db, args.study)
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        return
+
+    if args.command == 'status':
+        print_status(study, args.limit)
+    elif args.command == 'best':
+        best = study.best()
+        if best is None:
+            print("No finished trials yet")
+            return
+        with open(args.output, 'w') as f:
+            json.dump(trial_hparams(best['params']), f, indent=2)
+        print(f"✅ Trial {best['trial']} (val_accuracy {best['value']:.4f}) written to {args.output}")
+        print(f"Next: python train.py --hparams {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Parity check for heuristic_features.py against the backend classifier
+
+fixtures/heuristic_js.json holds small synthetic images with the results of
+aiClassificationService.classifyWithTensorFlowFeatures() on them; regenerate
+it with `node scripts/exportHeuristicFixture.js` from backend/ after changing
+either implementation. Image decoding (sharp vs PIL) is not covered here.
+
+Usage:
+    python -m pytest ai/tests
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TESTS_DIR, '..', 'scripts'))
+
+from heuristic_features import classify_batch  # noqa: E402
+from paths import MODEL_DIR  # noqa: E402
+
+FIXTURE_PATH = os.path.join(TESTS_DIR, 'fixtures', 'heuristic_js.json')
+
+with open(FIXTURE_PATH) as f:
+    FIXTURE = json.load(f)
+CASES = FIXTURE['cases']
+
+
+@pytest.fixture(scope='module')
+def results():
+    with open(os.path.join(MODEL_DIR, FIXTURE['labels'])) as f:
+        labels_config = json.load(f)
+    images = np.stack([
+        np.asarray(case['pixels'], dtype=np.float32).reshape(case['shape']) / 255.0
+        for case in CASES
+    ])
+    return classify_batch(images, labels_config)
+
+
+def assert_features_close(actual, expected, path=''):
+    assert actual.keys() == expected.keys(), path
+    for name, value in expected.items():
+        if isinstance(value, dict):
+            assert_features_close(actual[name], value, f'{path}{name}.')
+        elif isinstance(value, str):
+            assert actual[name] == value, f'{path}{name}'
+        else:
+            assert actual[name] == pytest.approx(value, rel=1e-5, abs=1e-6), f'{path}{name}'
+
+
+@pytest.mark.parametrize('index', range(len(CASES)), ids=[case['name'] for case in CASES])
+def test_matches_backend(results, index):
+    expected = CASES[index]['result']
+    actual = results[index]
+
+    assert_features_close(actual['features'], expected['features'])
+    assert {p['category']: p['confidence'] for p in actual['allPredictions']} == \
+        {p['category']: p['confidence'] for p in expected['allPredictions']}
+    assert [p['category'] for p in actual['allPredictions']] == \
+        [p['category'] for p in expected['allPredictions']]
+    for key in ('category', 'backendCategory', 'confidence', 'threshold', 'source'):
+        assert actual[key] == expected[key], key
@@ -0,0 +1,76 @@
+"""
+Check that TrainingProfiler's train function leaves training unchanged
+
+The same model is fit from the same weights with and without the profiler,
+on one device and on two mirrored CPU replicas; the logs must agree and the
+profiler must actually have timed the batch fetches. Needs TensorFlow with
+Keras 2 (tensorflow<2.16), as pinned in requirements.txt.
+
+Usage:
+    python -m pytest ai/tests/test_training_profiler.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+tf = pytest.importorskip('tensorflow')
+if int(tf.keras.__version__.split('.')[0]) >= 3:
+    pytest.skip('TrainingProfiler wraps the Keras 2 train function', allow_module_level=True)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from training_profiler import TrainingProfiler  # noqa: E402
+
+# Two logical CPUs for the mirrored case; only possible before TF initializes
+try:
+    tf.config.set_logical_device_configuration(
+        tf.config.list_physical_devices('CPU')[0],
+        [tf.config.LogicalDeviceConfiguration()] * 2
+    )
+except RuntimeError:
+    pass
+
+BATCH_SIZE = 8
+
+
+def make_data(seed):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(64, 6)).astype(np.float32)
+    y = rng.integers(0, 3, size=64)
+    return tf.data.Dataset.from_tensor_slices((x, y)).batch(BATCH_SIZE)
+
+
+def fit(strategy, profiler=None):
+    tf.keras.utils.set_random_seed(0)
+    with strategy.scope():
+        model = tf.keras.Sequential([
+            tf.keras.layers.Input(shape=(6,)),
+            tf.keras.layers.Dense(16, activation='relu'),
+            tf.keras.layers.Dense(3, activation='softmax')
+        ])
+        model.compile(optimizer=tf.keras.optimizers.SGD(0.1),
+                      loss='sparse_categorical_crossentropy', metrics=['accuracy'])
+    history = model.fit(make_data(0), validation_data=make_data(1), epochs=3, verbose=0,
+                        callbacks=[profiler] if profiler else [])
+    return history.history
+
+
+@pytest.mark.parametrize('replicas', [1, 2])
+def test_logs_match_unwrapped_fit(replicas):
+    devices = [d.name for d in tf.config.list_logical_devices('CPU')]
+    if len(devices) < replicas:
+        pytest.skip(f'needs {replicas} logical CPUs')
+    strategy = tf.distribute.MirroredStrategy(devices[:replicas]) if replicas > 1 \
+        else tf.distribute.get_strategy()
+
+    expected = fit(strategy)
+    profiler = TrainingProfiler(BATCH_SIZE, verbose=False)
+    actual = fit(strategy, profiler)
+
+    for name, values in expected.items():
+        np.testing.assert_allclose(actual[name], values, rtol=1e-5, atol=1e-6, err_msg=name)
+    # An unwrapped train function leaves every fetch time at 0
+    assert all(epoch['data_wait_ms']['max'] > 0 for epoch in profiler.epochs)
@@ -0,0 +1,92 @@
+/**
+ * Export Heuristic Classifier Fixture
+ * Runs aiClassificationService's tensor-feature fallback (extractTensorFeatures,
+ * calculateDarkPixelRatio, calculateCategoryConfidence) on a set of small
+ * synthetic images and writes the pixels with the results to
+ * ai/tests/fixtures/heuristic_js.json, which the NumPy port is checked against.
+ *
+ * Usage: node scripts/exportHeuristicFixture.js
+ */
+
+const fs = require('fs');
+const path = require('path');
+const Module = require('module');
+
+// sharp only decodes uploads (preprocessImage), which this script replaces with
+// fixed pixel tensors, so the service can load without it installed
+const originalLoad = Module._load;
+Module._load = function (request, ...rest) {
+  if (request === 'sharp') {
+    return () => { throw new Error('sharp is not used by exportHeuristicFixture'); };
+  }
+  return originalLoad.call(this, request, ...rest);
+};
+
+const tfLoader = require('../utils/tfLoader');
+const aiService = require('../services/aiClassificationService');
+
+const SIZE = 24;
+const OUTPUT_PATH = path.join(__dirname, '../../ai/tests/fixtures/heuristic_js.json');
+const LABELS_PATH = path.join(__dirname, '../../ai/model/labels.json');
+
+// Deterministic pseudo-random numbers in [0, 1)
+function lcg(seed) {
+  let state = seed >>> 0;
+  return () => {
+    state = (Math.imul(state, 1664525) + 1013904223) >>> 0;
+    return state / 4294967296;
+  };
+}
+
+// name -> (x, y, rand) => [r, g, b] in 0..255
+const PATTERNS = {
+  dark_asphalt: (x, y, rand) => { const v = 40 + rand() * 60; return [v, v, v + 5]; },
+  bright_concrete: (x, y, rand) => { const v = 190 + rand() * 50; return [v, v, v - 4]; },
+  red_sign: (x, y) => ((x - 12) ** 2 + (y - 12) ** 2 < 64 ? [220, 30, 30] : [235, 235, 235]),
+  dark_water: (x, y, rand) => [20 + rand() * 20, 50 + rand() * 30, 90 + rand() * 60],
+  colour_noise: (x, y, rand) => [rand() * 255, rand() * 255, rand() * 255],
+  checkerboard: (x, y) => (((x >> 2) + (y >> 2)) % 2 ? [20, 20, 20] : [200, 200, 200]),
+  orange_barrier: (x, y) => (((x + y) >> 3) % 2 ? [240, 130, 20] : [250, 250, 250]),
+  green_grass: (x, y, rand) => [40 + rand() * 40, 120 + rand() * 80, 30 + rand() * 30],
+  half_black: (x) => (x < SIZE / 2 ? [0, 0, 0] : [255, 255, 255]),
+  flat_grey: () => [128, 128, 128]
+};
+
+function makePixels(pattern, seed) {
+  const rand = lcg(seed);
+  const pixels = [];
+  for (let y = 0; y < SIZE; y++) {
+    for (let x = 0; x < SIZE; x++) {
+      pattern(x, y, rand).forEach(v => pixels.push(Math.max(0, Math.min(255, Math.round(v)))));
+    }
+  }
+  return pixels;
+}
+
+async function main() {
+  aiService.tf = await tfLoader.initialize();
+  aiService.labelsConfig = JSON.parse(fs.readFileSync(LABELS_PATH, 'utf8'));
+  const tf = aiService.tf;
+
+  const cases = [];
+  let seed = 1;
+  for (const [name, pattern] of Object.entries(PATTERNS)) {
+    const pixels = makePixels(pattern, seed++);
+    // Same scaling as tfLoader.createTensorFromImageBuffer
+    aiService.preprocessImage = async () =>
+      tf.tensor4d(pixels.map(v => v / 255.0), [1, SIZE, SIZE, 3], 'float32');
+
+    const result = await aiService.classifyWithTensorFlowFeatures(null);
+    delete result.processingTime;
+    cases.push({ name, shape: [SIZE, SIZE, 3], pixels, result });
+  }
+
+  fs.mkdirSync(path.dirname(OUTPUT_PATH), { recursive: true });
+  fs.writeFileSync(OUTPUT_PATH, JSON.stringify({ labels: path.basename(LABELS_PATH), cases }) + '\n');
+  console.log(`✅ Wrote ${cases.length} cases to ${OUTPUT_PATH}`);
+}
+
+main().catch(error => {
+  console.error('❌ Fixture export failed:', error);
+  process.exit(1);
+});
@@ -108,6 +108,26 @@ class AIClassificationService {
     }
   }
 
+  /**
+   * Input resolution expected by the loaded model
+   * Read from the inputResolution metadata written by convert.py, falling back
+   * to the model's input shape and then to 224x224
+   * @returns {number[]} - [height, width]
+   */
+  getInputResolution() {
+    if (this.model) {
+      const metadata = this.model.getUserDefinedMetadata ? this.model.getUserDefinedMetadata() : null;
+      if (metadata && Array.isArray(metadata.inputResolution)) {
+        return metadata.inputResolution;
+      }
+      const [, height, width] = this.model.inputs[0].shape;
+      if (height && width) {
+        return [height, width];
+      }
+    }
+    return [224, 224];
+  }
+
   /**
    * Preprocess image buffer for TensorFlow.js model
    * @param {Buffer} imageBuffer - Raw image buffer
@@ -116,7 +136,7 @@ class AIClassificationService {
   async preprocessImage(imageBuffer) {
     try {
       // Create tensor from image buffer using tfLoader utility
-      const imageTensor = await tfLoader.createTensorFromImageBuffer(imageBuffer, 224);
+      const imageTensor = await tfLoader.createTensorFromImageBuffer(imageBuffer, this.getInputResolution());
       
       console.log(`🖼️ Image preprocessed to tensor shape: ${JSON.stringify(imageTensor.shape)}`);
       return imageTensor;
@@ -308,7 +308,7 @@ class TensorFlowLoader {
   /**
    * Create a tensor from image buffer
    * @param {Buffer} imageBuffer - Image buffer
-   * @param {number} targetSize - Target size for resizing (default: 224)
+   * @param {number|number[]} targetSize - Square size or [height, width] for resizing (default: 224)
    * @returns {Promise<tf.Tensor>} - Image tensor
    */
   async createTensorFromImageBuffer(imageBuffer, targetSize = 224) {
@@ -317,11 +317,12 @@ class TensorFlowLoader {
     }
 
     const sharp = require('sharp');
+    const [height, width] = Array.isArray(targetSize) ? targetSize : [targetSize, targetSize];
     
     try {
       // Resize image to target size and convert to RGB
       const imageArray = await sharp(imageBuffer)
-        .resize(targetSize, targetSize, {
+        .resize(width, height, {
           fit: 'cover',
           position: 'center'
         })
@@ -329,7 +330,7 @@ class TensorFlowLoader {
         .raw()
         .toBuffer();
       
-      console.log(`🖼️ Image resized to ${targetSize}x${targetSize}, buffer size: ${imageArray.length}`);
+      console.log(`🖼️ Image resized to ${width}x${height}, buffer size: ${imageArray.length}`);
       
       // Convert Buffer to regular Array and normalize [0, 1]
       const normalizedPixels = [];
@@ -342,7 +343,7 @@ class TensorFlowLoader {
       // Create tensor as 3D then add batch dimension
       const img3d = this.tf.tensor3d(
         normalizedPixels,
-        [targetSize, targetSize, 3],
+        [height, width, 3],
         'float32'
       );
       const tensor = img3d.expandDims(0);